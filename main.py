@@ -4,37 +4,216 @@
 本地 AI 智能文献与图像管理助手
 统一入口文件，支持命令行参数调用
 """
+import time
+
+# 尽早记录启动时间，用于统计各命令的启动耗时
+_START_TIME = time.perf_counter()
+
 import click
 import sys
 from pathlib import Path
-from src.document_manager import DocumentManager
-from src.image_manager import ImageManager
 
+from src import config
+from src.filters import build_where
+from src.placement import PLACEMENT_MODES
 
-# 全局管理器实例
+
+# 全局管理器实例（按命令需要延迟创建）
 doc_manager = None
 img_manager = None
 
+# 命令所需资源就绪的时间点
+_ready_time = None
+
 
-def init_managers():
-    """初始化管理器"""
-    global doc_manager, img_manager
+def get_doc_manager(load_model: bool = False):
+    """获取文献管理器，仅在首次调用时导入并创建
+    
+    Args:
+        load_model: 是否立即加载文本嵌入模型（需要编码的命令传 True）
+    """
+    global doc_manager
     if doc_manager is None:
-        doc_manager = DocumentManager()
+        from src.document_manager import DocumentManager
+        doc_manager = DocumentManager(**_inference_options())
+    if load_model:
+        doc_manager.text_model
+    _mark_ready()
+    return doc_manager
+
+
+def get_img_manager(load_model: bool = False):
+    """获取图像管理器，仅在首次调用时导入并创建
+    
+    Args:
+        load_model: 是否立即加载CLIP模型
+    """
+    global img_manager
     if img_manager is None:
-        img_manager = ImageManager()
+        from src.image_manager import ImageManager
+        img_manager = ImageManager(**_inference_options())
+    if load_model:
+        img_manager.model
+    _mark_ready()
+    return img_manager
+
+
+def _inference_options() -> dict:
+    """命令行全局参数中的推理后端与线程数"""
+    ctx = click.get_current_context(silent=True)
+    obj = ctx.find_root().obj if ctx else None
+    if not obj:
+        return {}
+    return {key: obj[key] for key in ('backend', 'threads') if obj.get(key) is not None}
+
+
+def _mark_ready():
+    """记录命令所需的管理器和模型全部就绪的时间"""
+    global _ready_time
+    _ready_time = time.perf_counter()
+
+
+def _report_startup(budget_key: str):
+    """输出启动耗时并与配置中的预算对比"""
+    ready = _ready_time if _ready_time is not None else time.perf_counter()
+    elapsed = ready - _START_TIME
+    budget = config.STARTUP_BUDGETS.get(budget_key)
+    
+    message = f"启动耗时: {elapsed:.2f}s"
+    if budget is not None:
+        status = "✓" if elapsed <= budget else "✗ 超出预算"
+        message += f" (预算 {budget:.1f}s) {status}"
+    click.echo(message, err=True)
+
+
+def forward_to_daemon(ctx, command: str, payload: dict):
+    """查询服务运行时将命令转发给服务，返回 None 表示需要本地处理"""
+    if ctx.obj.get('no_daemon'):
+        return None
+    from src.client import forward
+    return forward(command, payload)
+
+
+def _print_papers(results):
+    """输出论文搜索结果"""
+    if not results:
+        click.echo("未找到相关论文")
+        return
+    
+    click.echo(f"\n找到 {len(results)} 篇相关论文:\n")
+    for i, doc in enumerate(results, 1):
+        click.echo(f"{i}. {doc['file_name']}")
+        click.echo(f"   路径: {doc['file_path']}")
+        if doc.get('topics'):
+            click.echo(f"   主题: {doc['topics']}")
+        if doc.get('distance') is not None:
+            click.echo(f"   相似度: {1 - doc['distance']:.3f}")
+        elif doc.get('score') is not None:
+            click.echo(f"   得分: {doc['score']:.3f}")
+        if doc.get('page'):
+            click.echo(f"   页码: {doc['page']}")
+        click.echo(f"   摘要: {doc.get('snippet', '')[:100]}...")
+        click.echo()
+
+
+def _print_images(results):
+    """输出图像搜索结果"""
+    if not results:
+        click.echo("未找到相关图像")
+        return
+    
+    click.echo(f"\n找到 {len(results)} 张相关图像:\n")
+    for i, img in enumerate(results, 1):
+        click.echo(f"{i}. {img['file_name']}")
+        click.echo(f"   路径: {img['file_path']}")
+        if img.get('source_paper'):
+            click.echo(f"   来自论文: {img['source_paper']} 第 {img.get('source_page')} 页")
+        if img.get('distance') is not None:
+            click.echo(f"   相似度: {1 - img['distance']:.3f}")
+        click.echo()
+
+
+def _print_unified(results):
+    """输出统一检索结果"""
+    if not results:
+        click.echo("未找到相关论文或图像")
+        return
+    
+    click.echo(f"\n找到 {len(results)} 个相关结果:\n")
+    for i, item in enumerate(results, 1):
+        label = "论文" if item['type'] == 'paper' else "图像"
+        click.echo(f"{i}. [{label}] {item['file_name']}")
+        click.echo(f"   路径: {item['file_path']}")
+        if item.get('source_paper'):
+            click.echo(f"   来自论文: {item['source_paper']} 第 {item.get('source_page')} 页")
+        if item.get('page'):
+            click.echo(f"   页码: {item['page']}")
+        click.echo(f"   得分: {item['score']:.2f}（相似度 {item['similarity']:.3f}）")
+        if item.get('snippet'):
+            click.echo(f"   摘要: {item['snippet'][:100]}...")
+        click.echo()
 
 
 @click.group()
-def cli():
+@click.option('--timing', is_flag=True, envvar='AGENT_TIMING',
+              help='输出命令启动耗时（也可设置环境变量 AGENT_TIMING=1）')
+@click.option('--no-daemon', is_flag=True, envvar='AGENT_NO_DAEMON',
+              help='不转发给查询服务，始终在本进程内处理')
+@click.option('--backend', type=click.Choice(['torch', 'int8', 'onnx']), default=config.INFERENCE_BACKEND,
+              show_default=True, help='模型推理后端：torch（fp32）/ int8（动态量化）/ onnx（ONNX Runtime）')
+@click.option('--threads', type=int, default=config.INFERENCE_THREADS or None,
+              help='推理时算子内并行线程数（默认由推理库决定）')
+@click.option('--profile', is_flag=True, envvar='AGENT_PROFILE',
+              help='收集各阶段耗时与计数，命令结束时输出汇总表（也可设置环境变量 AGENT_PROFILE=1）')
+@click.pass_context
+def cli(ctx, timing, no_daemon, backend, threads, profile):
     """本地 AI 智能文献与图像管理助手"""
-    pass
+    ctx.ensure_object(dict)
+    ctx.obj['timing'] = timing
+    ctx.obj['no_daemon'] = no_daemon
+    ctx.obj['backend'] = backend
+    ctx.obj['threads'] = threads
+    if timing and ctx.invoked_subcommand:
+        ctx.call_on_close(lambda: _report_startup(ctx.obj.get('budget_key', ctx.invoked_subcommand)))
+    if profile and ctx.invoked_subcommand:
+        from src import metrics
+        metrics.enable()
+        ctx.call_on_close(lambda: click.echo(f"\n[性能分析]\n{metrics.format_table()}", err=True))
+
+
+def extract_mode_option(func):
+    """论文命令共用的 --extract-mode 参数"""
+    return click.option('--extract-mode', type=click.Choice(['fast', 'precise']),
+                        default=config.PDF_EXTRACT_MODE, show_default=True,
+                        help='PDF文本提取模式：fast 速度快，precise 版面分析更准确')(func)
+
+
+def topic_options(func):
+    """论文命令共用的主题分类与放置参数"""
+    func = click.option('--placement', type=click.Choice(PLACEMENT_MODES), default=config.PLACEMENT_MODE,
+                        show_default=True,
+                        help='放入主题目录的方式：auto/reflink/hardlink/symlink/copy，virtual 只记录主题')(func)
+    func = click.option('--top-n', type=int, default=config.TOPIC_TOP_N, show_default=True,
+                        help='每篇论文最多归入的主题数（0 表示不限）')(func)
+    func = click.option('--threshold', type=float, default=config.TOPIC_THRESHOLD, show_default=True,
+                        help='论文与主题的相似度阈值，均未达到时归入最相近的主题')(func)
+    return func
+
+
+def filter_options(func):
+    """检索命令共用的元数据过滤参数（在向量数据库内部过滤）"""
+    func = click.option('--where', 'where', multiple=True,
+                        help='元数据过滤条件，可重复，如 "year>=2020"、"page_count<20"、"width>=1024"')(func)
+    func = click.option('--dir', 'directory', help='只保留该目录前缀下的文件，如 "papers/2024"')(func)
+    return func
 
 
 @cli.command()
 @click.argument('path', type=click.Path(exists=True))
 @click.option('--topics', '-t', help='主题列表，用逗号分隔，如: "CV,NLP,RL"')
-def add_paper(path, topics):
+@topic_options
+@extract_mode_option
+def add_paper(path, topics, placement, threshold, top_n, extract_mode):
     """添加并分类论文文件
     
     PATH: PDF文件路径
@@ -42,7 +221,11 @@ def add_paper(path, topics):
     示例:
         python main.py add-paper paper.pdf --topics "CV,NLP"
     """
-    init_managers()
+    doc_manager = get_doc_manager(load_model=True)
+    doc_manager.extract_mode = extract_mode
+    doc_manager.topic_threshold = threshold
+    doc_manager.topic_top_n = top_n
+    doc_manager.placement_mode = placement
     
     topics_list = None
     if topics:
@@ -61,33 +244,39 @@ def add_paper(path, topics):
 @cli.command()
 @click.argument('query')
 @click.option('--top-k', '-k', default=5, help='返回最相关的k个结果')
-def search_paper(query, top_k):
-    """语义搜索论文
+@click.option('--mode', '-m', type=click.Choice(['vector', 'lexical', 'hybrid']), default='vector',
+              show_default=True, help='vector 语义检索 / lexical 关键词检索（不加载模型）/ hybrid 两者融合')
+@click.option('--topic', '-t', help='只搜索该主题下的论文')
+@filter_options
+@click.pass_context
+def search_paper(ctx, query, top_k, mode, topic, directory, where):
+    """搜索论文
     
-    QUERY: 搜索查询（自然语言）
+    QUERY: 搜索查询（自然语言或关键词）
     
     示例:
         python main.py search-paper "Transformer的核心架构是什么"
+        python main.py search-paper "ResNet-50" --mode lexical
+        python main.py search-paper "Vaswani attention" --mode hybrid
+        python main.py search-paper "注意力机制" --topic NLP --where "year>=2020"
     """
-    init_managers()
-    
     try:
-        results = doc_manager.search_documents(query, top_k=top_k)
-        
-        if not results:
-            click.echo("未找到相关论文")
-            return
+        where = build_where(topic=topic, directory=directory, expressions=where)
+        if mode == 'lexical':
+            # 词法检索只读取本地 SQLite 倒排索引，直接在本进程处理
+            ctx.obj['budget_key'] = 'search-paper --mode lexical'
+            response = None
+        else:
+            response = forward_to_daemon(ctx, 'search-paper',
+                                         {'query': query, 'top_k': top_k, 'mode': mode, 'where': where})
+        if response is not None:
+            results = response['results']
+        else:
+            # 模型仅在查询向量缓存未命中时才加载
+            doc_manager = get_doc_manager()
+            results = doc_manager.search_documents(query, top_k=top_k, mode=mode, where=where)
         
-        click.echo(f"\n找到 {len(results)} 篇相关论文:\n")
-        for i, doc in enumerate(results, 1):
-            click.echo(f"{i}. {doc['file_name']}")
-            click.echo(f"   路径: {doc['file_path']}")
-            if doc.get('topics'):
-                click.echo(f"   主题: {doc['topics']}")
-            if doc.get('distance') is not None:
-                click.echo(f"   相似度: {1 - doc['distance']:.3f}")
-            click.echo(f"   摘要: {doc.get('snippet', '')[:100]}...")
-            click.echo()
+        _print_papers(results)
     except Exception as e:
         click.echo(f"✗ 错误: {e}", err=True)
         sys.exit(1)
@@ -96,21 +285,36 @@ def search_paper(query, top_k):
 @cli.command()
 @click.argument('source_dir', type=click.Path(exists=True, file_okay=False))
 @click.option('--topics', '-t', required=True, help='主题列表，用逗号分隔，如: "CV,NLP,RL"')
-def organize_papers(source_dir, topics):
+@click.option('--workers', '-w', type=int, default=None, help='并行提取PDF文本的进程数（默认CPU核数）')
+@click.option('--batch-size', '-b', type=int, default=config.ENCODE_BATCH_SIZE, show_default=True,
+              help='模型批量编码的批大小')
+@click.option('--skip-unchanged-dirs', is_flag=True,
+              help='目录修改时间与上次扫描相同时跳过（不检测原地修改的文件）')
+@topic_options
+@extract_mode_option
+def organize_papers(source_dir, topics, workers, batch_size, skip_unchanged_dirs, placement, threshold,
+                    top_n, extract_mode):
     """批量整理文件夹中的PDF文件
     
     SOURCE_DIR: 源文件夹路径
     
     示例:
         python main.py organize-papers ./papers --topics "CV,NLP,RL"
+        python main.py organize-papers ./papers --topics "CV,NLP" --workers 8
+        python main.py organize-papers ./papers --topics "CV,NLP" --extract-mode precise
     """
-    init_managers()
+    doc_manager = get_doc_manager(load_model=True)
+    doc_manager.extract_mode = extract_mode
+    doc_manager.topic_threshold = threshold
+    doc_manager.topic_top_n = top_n
+    doc_manager.placement_mode = placement
     
     topics_list = [t.strip() for t in topics.split(',')]
     
     try:
         click.echo(f"开始批量整理文件夹: {source_dir}")
-        doc_manager.batch_organize(source_dir, topics_list)
+        doc_manager.batch_organize(source_dir, topics_list, workers=workers, batch_size=batch_size,
+                                   skip_unchanged_dirs=skip_unchanged_dirs)
         click.echo("✓ 批量整理完成")
     except Exception as e:
         click.echo(f"✗ 错误: {e}", err=True)
@@ -119,23 +323,55 @@ def organize_papers(source_dir, topics):
 
 @cli.command()
 @click.option('--query', '-q', help='可选的搜索查询')
-def list_papers(query):
+@click.option('--topic', '-t', help='只列出该主题下的文件')
+@click.option('--limit', '-n', type=int, default=None, help='最多列出的文件数（不带查询时有效）')
+@click.option('--offset', type=int, default=0, help='跳过的文件数，与 --limit 配合分页（不带查询时有效）')
+@filter_options
+@click.pass_context
+def list_papers(ctx, query, topic, limit, offset, directory, where):
     """列出论文文件（仅返回文件列表）
     
+    不带查询和过滤条件时只读取路径索引，不会加载嵌入模型，也不会读取向量数据库
+    
     示例:
         python main.py list-papers
+        python main.py list-papers --topic NLP --limit 20 --offset 40
         python main.py list-papers --query "深度学习"
+        python main.py list-papers --dir papers/2024 --where "page_count>=10"
     """
-    init_managers()
-    
     try:
-        files = doc_manager.list_files(query)
+        # 只按主题列出时走路径索引，其余条件下推到向量数据库
+        filters = build_where(topic=topic if query or directory or where else None,
+                              directory=directory, expressions=where)
+        if query:
+            ctx.obj['budget_key'] = 'list-papers --query'
+            response = forward_to_daemon(ctx, 'list-papers', {'query': query, 'where': filters})
+            if response is not None:
+                files = response['files']
+            else:
+                # 模型仅在查询向量缓存未命中时才加载
+                doc_manager = get_doc_manager()
+                files = doc_manager.list_files(query, where=filters)
+            total = len(files)
+        elif filters:
+            doc_manager = get_doc_manager()
+            files = doc_manager.list_files(limit=limit, offset=offset, where=filters)
+            total = len(files)
+        else:
+            # 路径索引为本地 SQLite，直接流式读取，无需经过查询服务
+            doc_manager = get_doc_manager()
+            total = doc_manager.count_files(topic=topic)
+            files = doc_manager.iter_files(topic=topic, limit=limit, offset=offset)
         
-        if not files:
+        if not total:
             click.echo("未找到论文文件")
             return
         
-        click.echo(f"\n找到 {len(files)} 个文件:\n")
+        if query or filters or (limit is None and not offset):
+            click.echo(f"\n找到 {total} 个文件:\n")
+        else:
+            shown = max(0, min(total - offset, limit if limit is not None else total))
+            click.echo(f"\n共 {total} 个文件，显示第 {offset + 1}-{offset + shown} 个:\n")
         for file_path in files:
             click.echo(f"  {file_path}")
     except Exception as e:
@@ -143,33 +379,266 @@ def list_papers(query):
         sys.exit(1)
 
 
+@cli.command()
+@click.option('--mode', type=click.Choice([m for m in PLACEMENT_MODES if m != 'virtual']), default='symlink',
+              show_default=True, help='生成目录视图时的放置方式')
+@click.option('--topic', '-t', help='只生成该主题的目录')
+def materialize_topics(mode, topic):
+    """按索引中记录的主题生成主题目录视图
+    
+    使用 virtual 放置方式时主题只记录在索引中，需要浏览目录时用该命令生成；
+    已是最新的文件会被跳过，可以重复执行
+    
+    示例:
+        python main.py materialize-topics
+        python main.py materialize-topics --topic NLP --mode hardlink
+    """
+    doc_manager = get_doc_manager()
+    
+    try:
+        counts = doc_manager.materialize_topics(mode=mode, topic=topic)
+        if not counts:
+            click.echo("索引中没有带主题的论文")
+            return
+        summary = "，".join(f"{action} {count} 个" for action, count in sorted(counts.items()))
+        click.echo(f"✓ 主题目录已生成: {summary}")
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+
+
 @cli.command()
 @click.argument('query')
 @click.option('--top-k', '-k', default=5, help='返回最相关的k个结果')
-def search_image(query, top_k):
+@filter_options
+@click.pass_context
+def search_image(ctx, query, top_k, directory, where):
     """以文搜图：通过自然语言描述搜索图像
     
     QUERY: 文本查询（自然语言描述）
     
     示例:
         python main.py search-image "海边的日落"
+        python main.py search-image "海边的日落" --dir images/2024 --where "width>=1920"
+    """
+    try:
+        where = build_where(directory=directory, expressions=where)
+        response = forward_to_daemon(ctx, 'search-image', {'query': query, 'top_k': top_k, 'where': where})
+        if response is not None:
+            results = response['results']
+        else:
+            # 模型仅在查询向量缓存未命中时才加载
+            img_manager = get_img_manager()
+            results = img_manager.search_images(query, top_k=top_k, where=where)
+        
+        _print_images(results)
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('image_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--top-k', '-k', default=5, help='返回最相似的k个结果')
+@filter_options
+@click.pass_context
+def search_similar(ctx, image_path, top_k, directory, where):
+    """以图搜图：查找与指定图像相似的已索引图像
+    
+    IMAGE_PATH: 图像文件路径（已索引的图像直接使用库中的向量，无需加载模型）
+    
+    示例:
+        python main.py search-similar ./images/beach.jpg
+        python main.py search-similar ./photo.jpg -k 10 --dir images/2024
+    """
+    try:
+        where = build_where(directory=directory, expressions=where)
+        image_path = str(Path(image_path).resolve())
+        response = forward_to_daemon(ctx, 'search-similar', {'path': image_path, 'top_k': top_k, 'where': where})
+        if response is not None:
+            results = response['results']
+        else:
+            img_manager = get_img_manager()
+            results = img_manager.search_similar(image_path, top_k=top_k, where=where)
+        
+        _print_images(results)
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--threshold', default=config.DUPLICATE_THRESHOLD, show_default=True,
+              help='CLIP 向量余弦相似度阈值，不低于该值视为重复')
+@click.option('--hash-distance', default=config.DUPLICATE_HASH_DISTANCE, show_default=True,
+              help='感知哈希的最大汉明距离，不超过该值直接视为重复')
+@click.option('--no-phash', is_flag=True, help='不使用感知哈希预过滤，只比较 CLIP 向量')
+@click.option('--block-size', default=config.DUPLICATE_BLOCK_SIZE, show_default=True,
+              help='分块比较时每块的向量数（决定内存占用）')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='将重复组以 JSON 格式写入文件')
+@filter_options
+def find_duplicates(threshold, hash_distance, no_phash, block_size, output, directory, where):
+    """查找已索引图像中的近似重复图像
+    
+    先用感知哈希合并几乎相同的副本，再分块比较 CLIP 向量，不需要加载模型。
+    每组中分辨率最高的图像排在最前。
+    
+    示例:
+        python main.py find-duplicates
+        python main.py find-duplicates --threshold 0.98 --dir images/2024 -o duplicates.json
     """
-    init_managers()
+    import json
     
     try:
-        results = img_manager.search_images(query, top_k=top_k)
+        where = build_where(directory=directory, expressions=where)
+        img_manager = get_img_manager()
+        groups = img_manager.find_duplicates(threshold=threshold,
+                                             hash_distance=None if no_phash else hash_distance,
+                                             block_size=block_size, where=where)
+        if output:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+            Path(output).write_text(json.dumps(groups, ensure_ascii=False, indent=2), encoding='utf-8')
         
-        if not results:
-            click.echo("未找到相关图像")
+        if not groups:
+            click.echo("未找到重复图像")
             return
         
-        click.echo(f"\n找到 {len(results)} 张相关图像:\n")
-        for i, img in enumerate(results, 1):
-            click.echo(f"{i}. {img['file_name']}")
-            click.echo(f"   路径: {img['file_path']}")
-            if img.get('distance') is not None:
-                click.echo(f"   相似度: {1 - img['distance']:.3f}")
+        click.echo(f"\n找到 {len(groups)} 组重复图像，共 {sum(len(group) for group in groups)} 张:\n")
+        for i, group in enumerate(groups, 1):
+            click.echo(f"{i}. {len(group)} 张")
+            for img in group:
+                size = f"{img['width']}x{img['height']}" if img.get('width') else "未知尺寸"
+                click.echo(f"   {img['file_path']}  ({size}，相似度 {img['similarity']:.3f})")
             click.echo()
+        if output:
+            click.echo(f"✓ 结果已保存: {output}")
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('query')
+@click.option('--top-k', '-k', default=10, show_default=True, help='合并后返回的结果数')
+@click.option('--type', 'kind', type=click.Choice(['all', 'paper', 'image']), default='all', show_default=True,
+              help='检索的类型')
+@filter_options
+@click.pass_context
+def search(ctx, query, top_k, kind, directory, where):
+    """统一检索：同时搜索论文和图像，合并为一个排序列表
+    
+    两个集合并发检索；文本模型与 CLIP 的相似度不可直接比较，
+    按各集合的背景相似度分布校准为标准分（高出均值的标准差数）后再排序
+    
+    QUERY: 搜索查询（自然语言）
+    
+    示例:
+        python main.py search "注意力热力图"
+        python main.py search "attention heatmap" -k 20 --dir papers/2024
+    """
+    from src import unified_search
+    
+    try:
+        types = list(unified_search.SEARCH_TYPES) if kind == 'all' else [kind]
+        where = build_where(directory=directory, expressions=where)
+        response = forward_to_daemon(ctx, 'search', {'query': query, 'top_k': top_k, 'types': types,
+                                                     'where': where})
+        if response is not None:
+            results = response['results']
+        else:
+            # 模型仅在查询向量缓存未命中时才加载
+            results = unified_search.search(
+                query, top_k=top_k, where=where,
+                doc_manager=get_doc_manager() if 'paper' in types else None,
+                img_manager=get_img_manager() if 'image' in types else None
+            )
+        
+        _print_unified(results)
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+
+
+def _read_batch_queries(input_file):
+    """逐行读取 JSONL 查询，每行为 {"query": ..., "id": ..., "top_k": ...} 或一个 JSON 字符串"""
+    import json
+    
+    for line_number, line in enumerate(input_file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"第 {line_number} 行不是合法的 JSON: {e}")
+        if isinstance(item, str):
+            item = {"query": item}
+        if not isinstance(item, dict) or not item.get("query"):
+            raise ValueError(f"第 {line_number} 行缺少 query 字段")
+        item.setdefault("id", line_number)
+        yield item
+
+
+def _chunked(items, size):
+    """将可迭代对象按 size 分组"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@cli.command()
+@click.argument('input_file', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--type', 'kind', type=click.Choice(['paper', 'image']), default='paper', show_default=True,
+              help='搜索论文或图像')
+@click.option('--top-k', '-k', default=5, help='每个查询默认返回的结果数（可被行内 top_k 覆盖）')
+@click.option('--mode', '-m', type=click.Choice(['vector', 'lexical', 'hybrid']), default='vector',
+              show_default=True, help='论文搜索模式')
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-', help='结果输出文件（默认标准输出）')
+@click.option('--topic', '-t', help='只搜索该主题下的论文')
+@filter_options
+@click.pass_context
+def search_batch(ctx, input_file, kind, top_k, mode, output, topic, directory, where):
+    """批量搜索：从 JSONL 读取查询，结果以 JSONL 流式输出
+    
+    INPUT_FILE: 查询文件，每行一个 {"query": "...", "id": ..., "top_k": ...}，省略或 "-" 时读取标准输入
+    
+    每批查询只做一次批量编码和一次多向量检索；输出每行为
+    {"id": ..., "query": "...", "results": [...]}，结果格式与 search-paper / search-image 相同
+    
+    示例:
+        python main.py search-batch queries.jsonl > results.jsonl
+        cat queries.jsonl | python main.py search-batch --type image --top-k 10
+    """
+    import contextlib
+    import json
+    
+    try:
+        where = build_where(topic=topic if kind == 'paper' else None, directory=directory, expressions=where)
+        for chunk in _chunked(_read_batch_queries(input_file), config.SEARCH_BATCH_SIZE):
+            # 同一批使用最大的 top_k 检索，再按各行的 top_k 截断
+            depth = max(int(item.get("top_k", top_k)) for item in chunk)
+            queries = [item["query"] for item in chunk]
+            payload = {'type': kind, 'queries': queries, 'top_k': depth, 'mode': mode, 'where': where}
+            response = forward_to_daemon(ctx, 'search-batch', payload)
+            if response is not None:
+                batch_results = response['results']
+            else:
+                # 管理器的进度信息输出到标准错误，标准输出只保留 JSONL 结果
+                with contextlib.redirect_stdout(sys.stderr):
+                    if kind == 'image':
+                        batch_results = get_img_manager().search_batch(queries, top_k=depth, where=where)
+                    else:
+                        batch_results = get_doc_manager().search_batch(queries, top_k=depth, mode=mode, where=where)
+            
+            for item, results in zip(chunk, batch_results):
+                record = {"id": item["id"], "query": item["query"], "results": results[:int(item.get("top_k", top_k))]}
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
     except Exception as e:
         click.echo(f"✗ 错误: {e}", err=True)
         sys.exit(1)
@@ -185,7 +654,7 @@ def add_image(image_path):
     示例:
         python main.py add-image photo.jpg
     """
-    init_managers()
+    img_manager = get_img_manager(load_model=True)
     
     try:
         result = img_manager.add_image(image_path)
@@ -195,21 +664,35 @@ def add_image(image_path):
         sys.exit(1)
 
 
+def image_batch_options(func):
+    """图像批量索引命令共用的 --batch-size / --workers / --skip-unchanged-dirs 参数"""
+    func = click.option('--skip-unchanged-dirs', is_flag=True,
+                        help='跳过修改时间与上次扫描相同的目录（不检测原地修改的文件）')(func)
+    func = click.option('--workers', '-w', type=int, default=None,
+                        help='解码图像的线程数（默认CPU核数）')(func)
+    func = click.option('--batch-size', '-b', type=int, default=config.IMAGE_BATCH_SIZE, show_default=True,
+                        help='每批编码的图像数')(func)
+    return func
+
+
 @cli.command()
 @click.argument('source_dir', type=click.Path(exists=True, file_okay=False))
-def index_images(source_dir):
+@image_batch_options
+def index_images(source_dir, batch_size, workers, skip_unchanged_dirs):
     """批量索引文件夹中的所有图像
     
     SOURCE_DIR: 源文件夹路径
     
     示例:
         python main.py index-images ./photos
+        python main.py index-images ./photos --batch-size 64 --workers 8
     """
-    init_managers()
+    img_manager = get_img_manager(load_model=True)
     
     try:
         click.echo(f"开始批量索引文件夹: {source_dir}")
-        img_manager.batch_index(source_dir)
+        img_manager.batch_index(source_dir, batch_size=batch_size, workers=workers,
+                                skip_unchanged_dirs=skip_unchanged_dirs)
         click.echo("✓ 批量索引完成")
     except Exception as e:
         click.echo(f"✗ 错误: {e}", err=True)
@@ -218,7 +701,8 @@ def index_images(source_dir):
 
 @cli.command()
 @click.option('--recursive/--no-recursive', '-r', default=True, help='是否递归处理子目录（默认递归）')
-def process_images(recursive):
+@image_batch_options
+def process_images(recursive, batch_size, workers, skip_unchanged_dirs):
     """批量处理 ./images 目录中的所有图像
     
     该命令会自动扫描 ./images 目录下的所有图像文件（包括子目录），
@@ -227,8 +711,9 @@ def process_images(recursive):
     示例:
         python main.py process-images
         python main.py process-images --no-recursive  # 只处理根目录，不递归子目录
+        python main.py process-images --skip-unchanged-dirs  # 跳过未变化的目录
     """
-    init_managers()
+    img_manager = get_img_manager(load_model=True)
     
     try:
         click.echo(f"开始批量处理 ./images 目录中的图像...")
@@ -236,13 +721,364 @@ def process_images(recursive):
             click.echo("  模式: 递归处理所有子目录")
         else:
             click.echo("  模式: 仅处理根目录")
-        img_manager.batch_process_images_dir(recursive=recursive)
+        img_manager.batch_process_images_dir(recursive=recursive, batch_size=batch_size, workers=workers,
+                                             skip_unchanged_dirs=skip_unchanged_dirs)
         click.echo("✓ 批量处理完成")
     except Exception as e:
         click.echo(f"✗ 错误: {e}", err=True)
         sys.exit(1)
 
 
+@cli.command()
+@click.argument('source_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--batch-size', '-b', type=int, default=config.IMAGE_BATCH_SIZE, show_default=True,
+              help='每批编码的图像数')
+@click.option('--workers', '-w', type=int, default=None, help='并行提取插图的进程数（默认CPU核数）')
+@click.option('--min-side', type=int, default=config.FIGURE_MIN_SIDE, show_default=True,
+              help='短边小于该像素数的插图（图标、公式等）不提取')
+def index_figures(source_dir, batch_size, workers, min_side):
+    """提取论文PDF中的插图并建立图像索引
+    
+    插图保存在 data/figures 中，与图片一起参与以文搜图、以图搜图和 search 统一检索，
+    结果中显示来源论文和页码；已提取过的PDF不会重复提取
+    
+    SOURCE_DIR: 论文文件夹路径（递归扫描）
+    
+    示例:
+        python main.py index-figures ./data/documents
+    """
+    img_manager = get_img_manager()
+    
+    try:
+        img_manager.index_paper_figures(source_dir, batch_size=batch_size, workers=workers, min_side=min_side)
+        click.echo("✓ 插图索引完成")
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--papers', type=click.Path(exists=True, file_okay=False), help='监听的论文文件夹（不含子目录）')
+@click.option('--topics', '-t', help='论文主题列表，用逗号分隔，监听论文时必填')
+@click.option('--images', type=click.Path(exists=True, file_okay=False), help='监听的图像文件夹（含子目录）')
+@click.option('--poll', is_flag=True, help='使用轮询代替 inotify（网络文件系统等不支持 inotify 的场景）')
+@click.option('--debounce', type=float, default=config.WATCH_DEBOUNCE_SECONDS, show_default=True,
+              help='最后一次变化后等待多少秒再处理（合并连续的变化）')
+@click.option('--no-initial-scan', is_flag=True, help='启动时不扫描未监听期间的变化')
+@click.option('--workers', '-w', type=int, default=None, help='提取PDF文本的进程数/解码图像的线程数（默认CPU核数）')
+@click.option('--batch-size', '-b', type=int, default=None,
+              help='每批编码的论文或图像数（默认分别为 ENCODE_BATCH_SIZE 和 IMAGE_BATCH_SIZE）')
+@topic_options
+@extract_mode_option
+def watch(papers, topics, images, poll, debounce, no_initial_scan, workers, batch_size, placement, threshold,
+          top_n, extract_mode):
+    """监听文件夹，新增、修改、移动和删除的文件自动增量索引
+    
+    只处理变化涉及的文件，不重新扫描整个目录；按 Ctrl+C 停止
+    
+    示例:
+        python main.py watch --papers ./papers --topics "CV,NLP,RL"
+        python main.py watch --images ./images
+        python main.py watch --papers ./papers -t "CV,NLP" --images ./images --poll
+    """
+    from src.image_manager import VALID_EXTENSIONS
+    from src.watcher import WatchTarget, watch as watch_directories
+    
+    if not papers and not images:
+        click.echo("✗ 错误: 至少需要指定 --papers 或 --images", err=True)
+        sys.exit(1)
+    if papers and not topics:
+        click.echo("✗ 错误: 监听论文时需要指定 --topics", err=True)
+        sys.exit(1)
+    
+    def report(kind, stats):
+        if any(stats.values()):
+            click.echo(f"[{kind}] 新增或变化 {stats['new']} 个，移动 {stats['moved']} 个，删除 {stats['deleted']} 个")
+    
+    targets = []
+    if papers:
+        doc_manager = get_doc_manager(load_model=True)
+        doc_manager.extract_mode = extract_mode
+        doc_manager.topic_threshold = threshold
+        doc_manager.topic_top_n = top_n
+        doc_manager.placement_mode = placement
+        topics_list = [t.strip() for t in topics.split(',')]
+        paper_batch = batch_size or config.ENCODE_BATCH_SIZE
+        targets.append(WatchTarget(
+            "论文", Path(papers), {".pdf"}, False,
+            lambda files, checked: report("论文", doc_manager.apply_changes(
+                files, checked, topics_list, workers=workers, batch_size=paper_batch)),
+            lambda: doc_manager.batch_organize(papers, topics_list, workers=workers, batch_size=paper_batch)
+        ))
+    if images:
+        img_manager = get_img_manager(load_model=True)
+        image_batch = batch_size or config.IMAGE_BATCH_SIZE
+        targets.append(WatchTarget(
+            "图像", Path(images), VALID_EXTENSIONS, True,
+            lambda files, checked: report("图像", img_manager.apply_changes(
+                files, checked, batch_size=image_batch, workers=workers)),
+            lambda: img_manager.batch_process_images_dir(source_dir=images, batch_size=image_batch,
+                                                         workers=workers)
+        ))
+    
+    try:
+        watch_directories(targets, use_polling=poll, debounce=debounce, initial_scan=not no_initial_scan)
+    except KeyboardInterrupt:
+        click.echo("\n已停止监听")
+
+
+@cli.command()
+@click.option('--type', 'kind', type=click.Choice(['text', 'image']), default='text', show_default=True,
+              help='测试文本嵌入模型或 CLIP 模型')
+@click.option('--backends', default=','.join(['torch', 'int8', 'onnx']), show_default=True,
+              help='待测试的后端，用逗号分隔')
+@click.option('--batch-size', '-b', type=int, default=config.ENCODE_BATCH_SIZE, show_default=True,
+              help='吞吐量测试的批大小')
+@click.option('--threshold', type=float, default=config.INFERENCE_PARITY_THRESHOLD, show_default=True,
+              help='与 fp32 向量的最小余弦相似度')
+@click.pass_context
+def benchmark_backends(ctx, kind, backends, batch_size, threshold):
+    """对比各推理后端的延迟、吞吐量与 fp32 一致性
+    
+    文本模型使用固定的中英文句子样本，CLIP 模型使用固定的合成图像样本；
+    任一后端一致性检查未通过时以非零状态退出
+    
+    示例:
+        python main.py benchmark-backends
+        python main.py --threads 4 benchmark-backends --type image --backends torch,int8
+    """
+    from src.inference import PARITY_TEXTS, benchmark_backends as run_benchmark, parity_images
+    
+    model_name = config.TEXT_MODEL_NAME if kind == 'text' else config.IMAGE_MODEL_NAME
+    samples = PARITY_TEXTS if kind == 'text' else parity_images()
+    names = [name.strip() for name in backends.split(',') if name.strip()]
+    
+    try:
+        report = run_benchmark(model_name, names, samples, threads=ctx.obj.get('threads'),
+                               batch_size=batch_size, threshold=threshold)
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+    
+    click.echo(f"\n模型: {model_name}，样本数: {len(samples)}\n")
+    click.echo(f"{'后端':<8}{'加载(s)':>10}{'单条延迟(ms)':>14}{'吞吐量(条/s)':>14}{'最小相似度':>12}{'平均相似度':>12}")
+    failed = False
+    for row in report:
+        if 'error' in row:
+            click.echo(f"{row['backend']:<8}✗ 加载失败: {row['error']}")
+            continue
+        status = "✓" if row['passed'] else "✗"
+        failed = failed or not row['passed']
+        click.echo(f"{row['backend']:<8}{row['load_s']:>10.2f}{row['latency_ms']:>14.1f}{row['throughput']:>14.1f}"
+                   f"{row['parity_min']:>12.4f}{row['parity_mean']:>12.4f} {status}")
+    if failed:
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--kind', type=click.Choice(['papers', 'images']), multiple=True,
+              help='测试论文或图像，可重复（默认两者都测）')
+@click.option('--sizes', default='1000', show_default=True, help='语料规模，用逗号分隔，如 "1000,10000,100000"')
+@click.option('--queries', type=int, default=200, show_default=True, help='测量搜索延迟的查询数')
+@click.option('--workers', '-w', type=int, default=None, help='提取/解码的并行数（默认CPU核数）')
+@click.option('--pages', type=int, default=4, show_default=True, help='每个合成PDF的页数')
+@click.option('--words-per-page', type=int, default=300, show_default=True, help='合成PDF每页的单词数')
+@click.option('--image-size', type=int, default=512, show_default=True, help='合成图像的边长（像素）')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None,
+              help='结果 JSON 路径（默认 data/benchmarks/<时间>.json）')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='与该基线结果对比，退化超过阈值时以非零状态退出')
+@click.option('--threshold', type=float, default=config.BENCHMARK_REGRESSION_THRESHOLD, show_default=True,
+              help='允许的相对退化比例')
+@click.option('--workdir', type=click.Path(file_okay=False), default=None,
+              help='生成语料和索引的目录（默认使用临时目录）')
+@click.option('--keep', is_flag=True, help='保留生成的语料和索引')
+@click.option('--vector-store', type=click.Choice(['chroma', 'numpy']), multiple=True,
+              help='向量存储后端，可重复以对比多个后端（默认使用配置的后端）')
+@click.pass_context
+def benchmark(ctx, kind, sizes, queries, workers, pages, words_per_page, image_size, output, baseline,
+              threshold, workdir, keep, vector_store):
+    """性能基准：合成语料上的索引吞吐量、阶段耗时、搜索延迟、峰值内存和索引大小
+    
+    每个 (类型, 规模, 向量存储后端) 在独立进程中从空索引开始运行，结果保存为 JSON
+    
+    示例:
+        python main.py benchmark --sizes 1000,10000
+        python main.py benchmark --kind images --vector-store chroma --vector-store numpy
+        python main.py benchmark --kind papers -o baseline.json
+        python main.py benchmark --kind papers --baseline baseline.json --threshold 0.1
+    """
+    from src import benchmark as bench
+    
+    try:
+        size_list = [int(size) for size in sizes.split(',') if size.strip()]
+        result = bench.run_suite(
+            list(kind) or ['papers', 'images'], size_list, workdir=workdir, keep=keep,
+            vector_stores=list(vector_store) or None, queries=queries, workers=workers, pages=pages, words_per_page=words_per_page, size=image_size,
+            backend=ctx.obj.get('backend', config.INFERENCE_BACKEND), threads=ctx.obj.get('threads') or 0
+        )
+        output = output or f"data/benchmarks/{time.strftime('%Y%m%d-%H%M%S')}.json"
+        bench.save(result, output)
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+    
+    click.echo(f"\n{'类型':<8}{'规模':>8}{'向量存储':>10}{'吞吐量(条/s)':>14}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+               f"{'峰值内存(MB)':>14}{'索引(MB)':>10}{'每条(KB)':>10}")
+    for run in result['runs']:
+        search = run['search']
+        click.echo(f"{run['kind']:<8}{run['items']:>8}{run['vector_store']:>10}{run['ingest']['items_per_s']:>14.1f}"
+                   f"{search.get('p50_ms', 0):>10.1f}{search.get('p95_ms', 0):>10.1f}{search.get('p99_ms', 0):>10.1f}"
+                   f"{run['peak_rss_mb'].get('self', 0):>14.0f}{run['index_size_mb']:>10.1f}"
+                   f"{run.get('bytes_per_item', 0) / 1024:>10.1f}")
+        stages = "，".join(f"{stage} {seconds:.2f}s" for stage, seconds in run['stages'].items())
+        click.echo(f"{'':<8}阶段耗时: {stages}")
+    click.echo(f"\n✓ 结果已保存: {output}")
+    
+    if baseline:
+        regressions = bench.compare(result, bench.load(baseline), threshold=threshold)
+        if not regressions:
+            click.echo(f"✓ 与基线相比没有超过 {threshold:.0%} 的退化")
+            return
+        click.echo(f"✗ 与基线相比有 {len(regressions)} 项指标退化超过 {threshold:.0%}:")
+        for item in regressions:
+            click.echo(f"  {item['kind']} × {item['items']}（{item['vector_store']}）{item['metric']}: "
+                       f"{item['baseline']:.3f} → {item['current']:.3f} ({item['change']:+.1%})")
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--host', default=config.DAEMON_HOST, show_default=True, help='监听地址')
+@click.option('--port', default=config.DAEMON_PORT, show_default=True, help='监听端口')
+@click.option('--papers/--no-papers', default=True, help='是否加载文献管理器')
+@click.option('--images/--no-images', default=True, help='是否加载图像管理器')
+def serve(host, port, papers, images):
+    """启动常驻查询服务
+    
+    服务常驻模型与向量数据库，search / search-paper / search-image / list-papers
+    在服务运行时会自动转发给服务处理，并发查询会合并为批量编码。
+    开启 --profile 时可通过 GET /metrics（Prometheus 文本格式）或
+    GET /metrics.json 查看服务内各阶段的累计耗时。
+    
+    示例:
+        python main.py serve
+        python main.py serve --no-images --port 9000
+        python main.py --profile serve
+    """
+    from src.server import QueryService, serve as run_server
+    
+    if not papers and not images:
+        click.echo("✗ 错误: 至少需要加载一个管理器", err=True)
+        sys.exit(1)
+    
+    try:
+        service = QueryService(
+            doc_manager=get_doc_manager(load_model=True) if papers else None,
+            img_manager=get_img_manager(load_model=True) if images else None
+        )
+        run_server(service, host=host, port=port)
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--collection', '-c', 'collections', multiple=True,
+              help='只重建指定集合（documents / document_chunks / images），默认全部')
+def compact(collections):
+    """重建向量索引并回收磁盘空间
+    
+    大量删除或移动文件后，HNSW 索引中残留的已删除节点会拖慢搜索、占用磁盘。
+    该命令按当前的 HNSW 参数（见 src/config.py）重建各集合，清理遗留的索引文件，
+    并整理数据库目录中的 SQLite 文件；NumPy 向量存储的集合同时转换为 AGENT_VECTOR_STORE_DTYPE 指定的精度。
+    运行期间不能有查询服务或其他命令在使用数据库。
+    
+    示例:
+        python main.py compact
+        AGENT_HNSW_M=32 python main.py compact -c images
+    """
+    from src import storage
+    from src.client import is_running
+    
+    try:
+        if not Path(config.DB_PATH).exists():
+            click.echo("向量数据库不存在，无需整理")
+            return
+        if is_running():
+            raise ValueError("查询服务正在运行，请先停止服务再整理数据库")
+        
+        start = time.perf_counter()
+        before = storage.directory_size(config.DB_PATH)
+        click.echo(f"正在重建向量索引: {config.DB_PATH}")
+        for item in storage.compact(config.DB_PATH, list(collections) or None):
+            click.echo(f"  {item['name']}: {item['count']} 条记录，耗时 {item['seconds']:.1f}s")
+        after = storage.directory_size(config.DB_PATH)
+        click.echo(f"✓ 整理完成: {before / (1 << 20):.1f} MB → {after / (1 << 20):.1f} MB，"
+                   f"耗时 {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        click.echo(f"✗ 错误: {e}", err=True)
+        sys.exit(1)
+
+
+def _format_bytes(size: float) -> str:
+    """将字节数格式化为 B / KB / MB / GB"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size:.0f} B"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+@cli.command()
+@click.option('--json', 'as_json', is_flag=True, help='以 JSON 格式输出，便于记录占用的变化')
+def stats(as_json):
+    """统计向量数据库的磁盘占用与每条记录的平均字节数
+    
+    按集合和数据库目录中的文件分别列出大小；Chroma 集合的 chroma.sqlite3 按记录数分摊。
+    论文的占用包括文档集合、文本块集合、词法索引和文本存储，按论文数计算每篇的平均值
+    
+    示例:
+        python main.py stats
+        python main.py stats --json >> data/footprint.jsonl
+    """
+    import json
+    from src import storage
+    
+    if not Path(config.DB_PATH).exists():
+        click.echo("向量数据库不存在")
+        return
+    
+    items = storage.footprint(config.DB_PATH)
+    counts = {item['name']: item['count'] for item in items if item['backend']}
+    groups = {
+        'papers': ({'documents', 'document_chunks', config.LEXICAL_INDEX_FILE, config.TEXT_STORE_FILE},
+                   counts.get('documents', 0)),
+        'images': ({'images'}, counts.get('images', 0)),
+    }
+    summary = {'total_bytes': sum(item['bytes'] for item in items)}
+    for group, (names, count) in groups.items():
+        size = sum(item['bytes'] for item in items if item['name'] in names)
+        summary[group] = {'count': count, 'bytes': size, 'bytes_per_item': size / count if count else None}
+    
+    if as_json:
+        click.echo(json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'db_path': config.DB_PATH,
+                               'items': items, **summary}, ensure_ascii=False))
+        return
+    
+    click.echo(f"{'组成部分':<24}{'后端':>8}{'精度':>9}{'记录数':>10}{'大小':>12}{'每条':>12}")
+    for item in items:
+        count = item['count']
+        per_item = _format_bytes(item['bytes'] / count) if count else '-'
+        click.echo(f"{item['name']:<24}{item['backend'] or '-':>8}{item['dtype'] or '-':>9}"
+                   f"{'-' if count is None else count:>10}{_format_bytes(item['bytes']):>12}{per_item:>12}")
+    click.echo(f"\n合计: {_format_bytes(summary['total_bytes'])}")
+    for group, label, unit in (('papers', '论文', '篇'), ('images', '图像', '张')):
+        entry = summary[group]
+        if entry['count']:
+            click.echo(f"{label}: {entry['count']} {unit}，共 {_format_bytes(entry['bytes'])}，"
+                       f"每{unit} {_format_bytes(entry['bytes_per_item'])}")
+
+
 if __name__ == '__main__':
-    cli()
+    cli(obj={})
 
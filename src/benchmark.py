@@ -0,0 +1,444 @@
+"""
+性能基准测试模块
+在本地生成指定数量和大小的合成PDF与图像，测量端到端索引吞吐量、各阶段耗时
+（提取/解码、编码、写入数据库）、搜索延迟分位数、峰值内存和磁盘索引大小；
+结果保存为 JSON，可与保存的基线对比并按阈值判断是否退化
+"""
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import config, metrics
+
+
+# 合成文本的词表：每个主题一组词，使搜索和主题分类有可区分的信号
+_VOCABULARY = {
+    "CV": ["image", "convolution", "pixel", "segmentation", "detection", "vision", "resnet", "camera"],
+    "NLP": ["language", "token", "translation", "attention", "transformer", "syntax", "corpus", "bert"],
+    "RL": ["policy", "reward", "agent", "environment", "value", "exploration", "bandit", "trajectory"],
+}
+_COMMON_WORDS = ["the", "model", "method", "results", "training", "data", "network", "learning",
+                 "we", "propose", "evaluate", "performance", "baseline", "experiment", "analysis"]
+
+# 对比基线时数值越大越好的指标，其余指标越小越好
+_HIGHER_IS_BETTER = {"items_per_s"}
+
+
+def _words(rng: random.Random, topic: str, count: int) -> List[str]:
+    """按主题词约占三成的比例生成单词序列"""
+    topic_words = _VOCABULARY[topic]
+    return [rng.choice(topic_words) if rng.random() < 0.3 else rng.choice(_COMMON_WORDS) for _ in range(count)]
+
+
+def write_pdf(path: Path, pages: List[List[str]]):
+    """
+    写入只包含文本层的最小PDF（每页若干行，使用内置 Helvetica 字体）
+    
+    Args:
+        path: 输出路径
+        pages: 每页的文本行列表（只应包含 ASCII 字母、数字和空格）
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for index, lines in enumerate(pages):
+        stream = "BT /F1 10 Tf 12 TL 56 740 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * index} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    
+    output, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    path.write_bytes(output.encode("latin-1"))
+
+
+def generate_pdfs(directory: Path, count: int, pages: int = 4, words_per_page: int = 300,
+                  seed: int = 0) -> List[Path]:
+    """
+    生成合成PDF语料
+    
+    Args:
+        directory: 输出目录
+        count: 文件数
+        pages: 每个文件的页数
+        words_per_page: 每页的单词数
+        seed: 随机种子（相同参数生成的语料完全相同）
+    
+    Returns:
+        生成的文件路径列表
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    topics = list(_VOCABULARY)
+    paths = []
+    for index in range(count):
+        topic = topics[index % len(topics)]
+        content = []
+        for _ in range(pages):
+            words = _words(rng, topic, words_per_page)
+            content.append([" ".join(words[i:i + 12]) for i in range(0, len(words), 12)])
+        path = directory / f"paper_{index:06d}.pdf"
+        write_pdf(path, content)
+        paths.append(path)
+    return paths
+
+
+def generate_images(directory: Path, count: int, size: int = 512, seed: int = 0) -> List[Path]:
+    """
+    生成合成图像语料（随机颜色的渐变背景加色块，JPEG 格式）
+    
+    Args:
+        directory: 输出目录
+        count: 图像数
+        size: 图像边长（像素）
+        seed: 随机种子
+    
+    Returns:
+        生成的文件路径列表
+    """
+    from PIL import Image
+    
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0.0, 1.0, size, dtype=np.float32)
+    paths = []
+    for index in range(count):
+        start, end = rng.integers(0, 256, size=(2, 3))
+        array = start + np.outer(ramp, np.ones(size))[..., None] * (end - start)
+        x, y = rng.integers(0, size // 2, size=2)
+        array[y:y + size // 4, x:x + size // 4] = rng.integers(0, 256, size=3)
+        path = directory / f"image_{index:06d}.jpg"
+        Image.fromarray(array.astype(np.uint8)).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def generate_queries(count: int, seed: int = 1) -> List[str]:
+    """生成互不相同的合成查询（保证每个查询都需要编码，不命中查询向量缓存）"""
+    rng = random.Random(seed)
+    topics = list(_VOCABULARY)
+    return [" ".join(_words(rng, topics[i % len(topics)], 5)) + f" {i}" for i in range(count)]
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """延迟分位数（毫秒）"""
+    if not latencies:
+        return {}
+    values = np.asarray(latencies) * 1000
+    return {f"p{q}_ms": float(np.percentile(values, q)) for q in (50, 95, 99)}
+
+
+def directory_size(path) -> int:
+    """目录中所有文件的总字节数"""
+    return sum(entry.stat().st_size for entry in Path(path).rglob("*") if entry.is_file())
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """本进程与已回收子进程的峰值常驻内存（MB），无法获取时返回空字典"""
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块：安装了 psutil 时取本进程的峰值工作集，子进程无法统计
+        try:
+            import psutil
+        except ImportError:
+            return {}
+        peak = getattr(psutil.Process().memory_info(), "peak_wset", None)
+        return {"self": peak / (1 << 20)} if peak else {}
+    
+    # Linux 上 ru_maxrss 的单位为 KB，macOS 上为字节
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / (1 << 20),
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / (1 << 20),
+    }
+
+
+def _stages(encode: str, **separate: float) -> Dict[str, float]:
+    """
+    汇总索引各阶段耗时
+    
+    提取/解码与编码在流水线中重叠，由调用方单独计时一遍后传入；
+    编码和写入数据库取索引过程中 metrics 收集的累计耗时
+    """
+    timers = metrics.snapshot()["timers"]
+    return {
+        **separate,
+        "encode": timers.get(encode, {}).get("total_s", 0.0),
+        "db_write": timers.get("db.write", {}).get("total_s", 0.0),
+    }
+
+
+def run_papers(workdir: str, count: int, queries: int = 200, workers: Optional[int] = None,
+               pages: int = 4, words_per_page: int = 300, backend: str = config.INFERENCE_BACKEND,
+               threads: int = config.INFERENCE_THREADS, vector_store: str = config.VECTOR_STORE) -> Dict:
+    """
+    论文基准：生成PDF语料，测量 batch_organize 的端到端吞吐量与各阶段耗时，以及搜索延迟
+    
+    提取阶段单独计时一遍（与索引时相同的进程数），编码和写入数据库取索引过程中的 metrics 指标；
+    vector_store 指定所有集合使用的向量存储后端
+    """
+    from .document_manager import DocumentManager
+    from .pdf_extract import extract_pages
+    from .query_cache import QueryCache
+    from .text_cache import TextCache
+    
+    config.VECTOR_STORE, config.VECTOR_STORES = vector_store, {}
+    root = Path(workdir)
+    start = time.perf_counter()
+    files = generate_pdfs(root / "papers", count, pages=pages, words_per_page=words_per_page)
+    generate_s = time.perf_counter() - start
+    workers = workers or os.cpu_count() or 1
+    
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(extract_pages, [str(path) for path in files], chunksize=16))
+    extract_s = time.perf_counter() - start
+    
+    manager = DocumentManager(data_dir=str(root / "organized"), db_path=str(root / "db"),
+                              backend=backend, threads=threads)
+    manager.placement_mode = "virtual"
+    # 使用独立的缓存，避免读到或写入用户数据目录中的缓存
+    manager._text_cache = TextCache(str(root / "text_cache.sqlite3"))
+    manager._query_cache = QueryCache(manager.model_key, disk_path=None)
+    start = time.perf_counter()
+    manager.text_model
+    load_s = time.perf_counter() - start
+    
+    metrics.enable()
+    metrics.reset()
+    start = time.perf_counter()
+    manager.batch_organize(str(root / "papers"), list(_VOCABULARY), workers=workers)
+    ingest_s = time.perf_counter() - start
+    stages = _stages("text.encode", extract=extract_s)
+    
+    latencies = []
+    for query in generate_queries(queries):
+        start = time.perf_counter()
+        manager.search_documents(query, top_k=5)
+        latencies.append(time.perf_counter() - start)
+    
+    return {
+        "kind": "papers",
+        "items": count,
+        "vector_store": vector_store,
+        "generate_s": generate_s,
+        "model_load_s": load_s,
+        "ingest": {"seconds": ingest_s, "items_per_s": count / ingest_s if ingest_s > 0 else 0.0},
+        "stages": stages,
+        "search": {"queries": len(latencies), **percentiles(latencies)},
+        "peak_rss_mb": peak_rss_mb(),
+        "index_size_mb": directory_size(root / "db") / (1 << 20),
+        "bytes_per_item": directory_size(root / "db") / max(count, 1),
+    }
+
+
+def run_images(workdir: str, count: int, queries: int = 200, workers: Optional[int] = None,
+               size: int = 512, backend: str = config.INFERENCE_BACKEND,
+               threads: int = config.INFERENCE_THREADS, vector_store: str = config.VECTOR_STORE) -> Dict:
+    """
+    图像基准：生成图像语料，测量 batch_index 的端到端吞吐量与各阶段耗时，以及以文搜图延迟
+    
+    解码阶段单独计时一遍（与索引时相同的线程数），编码和写入数据库取索引过程中的 metrics 指标；
+    vector_store 指定所有集合使用的向量存储后端
+    """
+    from .image_manager import ImageManager, decode_image
+    from .query_cache import QueryCache
+    
+    config.VECTOR_STORE, config.VECTOR_STORES = vector_store, {}
+    root = Path(workdir)
+    start = time.perf_counter()
+    files = generate_images(root / "images", count, size=size)
+    generate_s = time.perf_counter() - start
+    workers = workers or os.cpu_count() or 1
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for image in executor.map(decode_image, [str(path) for path in files]):
+            image.close()
+    decode_s = time.perf_counter() - start
+    
+    manager = ImageManager(image_dir=str(root / "indexed"), db_path=str(root / "db"),
+                           backend=backend, threads=threads)
+    manager._query_cache = QueryCache(manager.model_key, disk_path=None)
+    start = time.perf_counter()
+    manager.model
+    load_s = time.perf_counter() - start
+    
+    metrics.enable()
+    metrics.reset()
+    start = time.perf_counter()
+    manager.batch_index(str(root / "images"), workers=workers)
+    ingest_s = time.perf_counter() - start
+    stages = _stages("image.encode", decode=decode_s)
+    
+    latencies = []
+    for query in generate_queries(queries):
+        start = time.perf_counter()
+        manager.search_images(query, top_k=5)
+        latencies.append(time.perf_counter() - start)
+    
+    return {
+        "kind": "images",
+        "items": count,
+        "vector_store": vector_store,
+        "generate_s": generate_s,
+        "model_load_s": load_s,
+        "ingest": {"seconds": ingest_s, "items_per_s": count / ingest_s if ingest_s > 0 else 0.0},
+        "stages": stages,
+        "search": {"queries": len(latencies), **percentiles(latencies)},
+        "peak_rss_mb": peak_rss_mb(),
+        "index_size_mb": directory_size(root / "db") / (1 << 20),
+        "bytes_per_item": directory_size(root / "db") / max(count, 1),
+    }
+
+
+_RUNNERS = {"papers": run_papers, "images": run_images}
+
+
+def _run_quietly(runner, *args, **kwargs) -> Dict:
+    """在子进程中运行基准，管理器的进度输出改写到标准错误，标准输出只保留汇总"""
+    import contextlib
+    
+    with contextlib.redirect_stdout(sys.stderr):
+        return runner(*args, **kwargs)
+
+
+def run_suite(kinds: List[str], sizes: List[int], workdir: Optional[str] = None, keep: bool = False,
+              vector_stores: Optional[List[str]] = None, **options) -> Dict:
+    """
+    运行基准测试套件
+    
+    每个 (类型, 规模, 向量存储后端) 在独立的子进程中运行，使峰值内存互不影响，
+    且每次都从空的向量数据库开始
+    
+    Args:
+        kinds: "papers" 和/或 "images"
+        sizes: 语料规模列表，如 [1000, 10000, 100000]
+        workdir: 生成语料和索引的目录（默认使用临时目录）
+        keep: 运行结束后是否保留语料和索引
+        vector_stores: 要对比的向量存储后端（默认只测 config.VECTOR_STORE）
+        **options: 传给 run_papers / run_images 的参数（queries、workers、backend、threads 等）
+    
+    Returns:
+        {"meta": 运行环境信息, "runs": 每个 (类型, 规模, 向量存储后端) 的结果}
+    """
+    import inspect
+    import multiprocessing
+    
+    base = Path(workdir) if workdir else Path(tempfile.mkdtemp(prefix="agent_bench_"))
+    runs = []
+    try:
+        for kind in kinds:
+            for size in sizes:
+                for store in vector_stores or [config.VECTOR_STORE]:
+                    run_dir = base / f"{kind}_{size}_{store}"
+                    if run_dir.exists():
+                        shutil.rmtree(run_dir)
+                    run_dir.mkdir(parents=True)
+                    print(f"运行基准: {kind} × {size}（{store}）", file=sys.stderr)
+                    runner = _RUNNERS[kind]
+                    run_options = {key: value for key, value in options.items()
+                                   if key in inspect.signature(runner).parameters}
+                    with ProcessPoolExecutor(max_workers=1,
+                                             mp_context=multiprocessing.get_context("spawn")) as executor:
+                        runs.append(executor.submit(_run_quietly, runner, str(run_dir), size,
+                                                    vector_store=store, **run_options).result())
+                    if not keep:
+                        shutil.rmtree(run_dir, ignore_errors=True)
+    finally:
+        if not keep and not workdir:
+            shutil.rmtree(base, ignore_errors=True)
+    
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": options,
+        },
+        "runs": runs,
+    }
+
+
+def _flatten(run: Dict, prefix: str = "") -> Dict[str, float]:
+    """将嵌套的结果展开为 "ingest.seconds" 形式的数值指标"""
+    metrics = {}
+    for key, value in run.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key not in ("items", "queries"):
+            metrics[name] = float(value)
+    return metrics
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = config.BENCHMARK_REGRESSION_THRESHOLD,
+            metrics: Optional[List[str]] = None) -> List[Dict]:
+    """
+    与基线对比，找出退化超过阈值的指标
+    
+    Args:
+        current: 本次结果（run_suite 的返回值）
+        baseline: 基线结果
+        threshold: 允许的相对退化比例（0.1 表示 10%）
+        metrics: 参与对比的指标名（默认为吞吐量、各阶段耗时、搜索延迟、峰值内存、索引大小和每条记录的平均占用）
+    
+    Returns:
+        退化的指标列表，每项包含 kind、items、vector_store、metric、baseline、current、change
+    """
+    metrics = metrics or config.BENCHMARK_COMPARE_METRICS
+    baseline_runs = {_run_key(run): _flatten(run) for run in baseline.get("runs", [])}
+    regressions = []
+    for run in current.get("runs", []):
+        previous = baseline_runs.get(_run_key(run))
+        if previous is None:
+            continue
+        for name, value in _flatten(run).items():
+            if not any(name == metric or name.startswith(metric + ".") for metric in metrics):
+                continue
+            old = previous.get(name)
+            if not old:
+                continue
+            change = (value - old) / old
+            worse = -change if name.rsplit(".", 1)[-1] in _HIGHER_IS_BETTER else change
+            if worse > threshold:
+                regressions.append({"kind": run["kind"], "items": run["items"], "vector_store": _run_key(run)[2],
+                                    "metric": name, "baseline": old, "current": value, "change": change})
+    return regressions
+
+
+def _run_key(run: Dict) -> tuple:
+    """结果的对比键；未记录向量存储后端的旧结果视为 chroma"""
+    return run["kind"], run["items"], run.get("vector_store", "chroma")
+
+
+def save(result: Dict, path: str):
+    """保存结果 JSON"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def load(path: str) -> Dict:
+    """读取结果 JSON"""
+    return json.loads(Path(path).read_text(encoding="utf-8"))
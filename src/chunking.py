@@ -0,0 +1,112 @@
+"""
+文本分块模块
+将PDF逐页文本切分为带重叠的段落块，用于块级语义索引
+"""
+from typing import Dict, List
+
+from . import config
+
+
+# 切分时优先在这些位置断开（按优先级排列）
+_BREAKS = ("\n\n", "\n", "。", ". ", "；", "; ", "，", ", ", " ")
+
+
+def chunk_pages(pages: List[str], chunk_size: int = config.CHUNK_SIZE,
+                overlap: int = config.CHUNK_OVERLAP,
+                max_chunks: int = config.CHUNK_MAX_PER_DOC) -> List[Dict]:
+    """
+    将逐页文本切分为带重叠的文本块
+    
+    块不会跨页，每个块记录其所在页码；过短的页会与下一页合并。
+    当块数量超过 max_chunks 时，在全文范围内均匀保留 max_chunks 个块，
+    保证每篇文档的索引大小有上限。
+    
+    Args:
+        pages: 每页的文本列表
+        chunk_size: 每个块的最大字符数
+        overlap: 相邻块之间重叠的字符数
+        max_chunks: 每篇文档最多保留的块数
+    
+    Returns:
+        文本块列表，每项包含 text、page（从1开始的页码）和 chunk_index
+    """
+    chunks = []
+    pending, pending_page = "", None
+    for page_number, page_text in enumerate(pages, 1):
+        page_text = page_text.strip()
+        if not page_text:
+            continue
+        if pending:
+            page_text = pending + "\n" + page_text
+        else:
+            pending_page = page_number
+        
+        # 过短的页与下一页合并，避免产生大量碎片块
+        if len(page_text) < chunk_size // 4 and page_number < len(pages):
+            pending = page_text
+            continue
+        
+        for text in split_text(page_text, chunk_size, overlap):
+            chunks.append({"text": text, "page": pending_page})
+        pending, pending_page = "", None
+    
+    if pending:
+        for text in split_text(pending, chunk_size, overlap):
+            chunks.append({"text": text, "page": pending_page})
+    
+    if len(chunks) > max_chunks > 0:
+        step = len(chunks) / max_chunks
+        chunks = [chunks[int(i * step)] for i in range(max_chunks)]
+    
+    for index, chunk in enumerate(chunks):
+        chunk["chunk_index"] = index
+    return chunks
+
+
+def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    在自然断点处将文本切分为带重叠的块
+    
+    Args:
+        text: 待切分文本
+        chunk_size: 每个块的最大字符数
+        overlap: 相邻块之间重叠的字符数
+    
+    Returns:
+        文本块列表
+    """
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
+    
+    overlap = min(overlap, chunk_size // 2)
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            end = _find_break(text, start + chunk_size // 2, end)
+        piece = text[start:end].strip()
+        if piece:
+            pieces.append(piece)
+        if end >= len(text):
+            break
+        start = _snap_start(text, max(end - overlap, start + 1), end)
+    return pieces
+
+
+def _snap_start(text: str, start: int, end: int) -> int:
+    """将块的起点后移到最近的空白处，避免从单词中间开始"""
+    for pos in range(start, end):
+        if text[pos].isspace():
+            return pos + 1
+    return start
+
+
+def _find_break(text: str, lower: int, upper: int) -> int:
+    """在 [lower, upper] 范围内从后往前寻找最合适的断点位置"""
+    for sep in _BREAKS:
+        pos = text.rfind(sep, lower, upper)
+        if pos != -1:
+            return pos + len(sep)
+    return upper
@@ -0,0 +1,58 @@
+"""
+查询服务客户端模块
+CLI 命令在查询服务运行时将请求转发给服务，未运行时返回 None 由本地处理
+"""
+import json
+import urllib.error
+import urllib.request
+from typing import Dict, Optional
+
+from . import config
+
+
+# 本地服务不应经过系统代理
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def forward(command: str, payload: Dict, host: str = config.DAEMON_HOST,
+            port: int = config.DAEMON_PORT, timeout: float = 60.0) -> Optional[Dict]:
+    """
+    将命令转发给查询服务
+    
+    Args:
+        command: 命令名（如 "search-paper"）
+        payload: 命令参数
+        host: 服务地址
+        port: 服务端口
+        timeout: 请求超时（秒）
+    
+    Returns:
+        服务的响应；服务未运行或不支持该命令时返回 None
+    """
+    request = urllib.request.Request(
+        f"http://{host}:{port}/{command}",
+        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with _opener.open(request, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            # 服务未加载该命令所需的管理器，回退到本地处理
+            return None
+        body = json.loads(e.read().decode("utf-8") or "{}")
+        raise RuntimeError(f"查询服务出错: {body.get('error', e.reason)}")
+    except urllib.error.URLError:
+        # 服务未运行（连接被拒绝）
+        return None
+
+
+def is_running(host: str = config.DAEMON_HOST, port: int = config.DAEMON_PORT, timeout: float = 1.0) -> bool:
+    """查询服务是否正在运行"""
+    try:
+        with _opener.open(f"http://{host}:{port}/health", timeout=timeout):
+            return True
+    except (urllib.error.URLError, OSError):
+        return False
@@ -0,0 +1,178 @@
+"""
+全局配置模块
+集中管理模型名称、数据路径和各命令的性能预算，支持通过环境变量覆盖
+"""
+import os
+
+
+# 模型配置
+TEXT_MODEL_NAME = os.environ.get("AGENT_TEXT_MODEL", "all-MiniLM-L6-v2")
+IMAGE_MODEL_NAME = os.environ.get("AGENT_IMAGE_MODEL", "clip-ViT-B-32")
+IMAGE_MODEL_FALLBACK = "sentence-transformers/clip-ViT-B-32"
+# 推理后端：torch（fp32）/ int8（动态量化）/ onnx（ONNX Runtime），见 src/inference.py
+INFERENCE_BACKEND = os.environ.get("AGENT_INFERENCE_BACKEND", "torch")
+# 推理时算子内并行线程数（0 表示使用库的默认值）
+INFERENCE_THREADS = int(os.environ.get("AGENT_INFERENCE_THREADS", "0"))
+# 非 fp32 后端与 fp32 向量的最小余弦相似度，低于该值视为一致性检查失败
+INFERENCE_PARITY_THRESHOLD = float(os.environ.get("AGENT_INFERENCE_PARITY_THRESHOLD", "0.99"))
+
+# 数据路径配置
+DOCUMENTS_DIR = os.environ.get("AGENT_DOCUMENTS_DIR", "data/documents")
+IMAGES_DIR = os.environ.get("AGENT_IMAGES_DIR", "data/images")
+DB_PATH = os.environ.get("AGENT_DB_PATH", "data/chroma_db")
+
+# 向量索引（HNSW）参数，见 src/storage.py
+# M（每个节点的最大邻居数）与构建时的 ef 只在创建集合时生效，修改后运行 compact 命令重建；
+# 查询时的 ef 与同步到磁盘的阈值对已有集合同样生效
+HNSW_M = int(os.environ.get("AGENT_HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.environ.get("AGENT_HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.environ.get("AGENT_HNSW_SEARCH_EF", "100"))
+HNSW_BATCH_SIZE = int(os.environ.get("AGENT_HNSW_BATCH_SIZE", "100"))
+HNSW_SYNC_THRESHOLD = int(os.environ.get("AGENT_HNSW_SYNC_THRESHOLD", "1000"))
+
+# 向量存储后端，见 src/vector_store.py
+# chroma: Chroma 的 HNSW 近似索引；numpy: 内存映射矩阵上的精确检索（适合数万条以内的库，打开只需毫秒级）
+VECTOR_STORE = os.environ.get("AGENT_VECTOR_STORE", "chroma")
+# 按集合单独指定后端，如 "images=numpy,document_chunks=numpy"，未列出的集合使用 VECTOR_STORE
+VECTOR_STORES = dict(
+    item.split("=", 1) for item in os.environ.get("AGENT_VECTOR_STORES", "").replace(" ", "").split(",") if "=" in item
+)
+# numpy 后端新建集合时的向量精度（已有集合在 compact 时转换）：
+# float32；float16（体积减半，分数误差约 1e-3）；
+# int8（逐行标量量化，检索时扫描的数据只有 float32 的 1/4，另存 float16 副本对候选重新打分）
+VECTOR_STORE_DTYPE = os.environ.get("AGENT_VECTOR_STORE_DTYPE", "float32")
+# int8 集合先取 top_k 的多少倍作为候选再重新打分
+VECTOR_RESCORE_OVERSAMPLE = int(os.environ.get("AGENT_VECTOR_RESCORE_OVERSAMPLE", "4"))
+# 论文正文与文本块的存放位置：separate 压缩后单独存放在 TEXT_STORE_FILE 中，向量数据库只保存向量和元数据；
+# inline 按旧方式内联存放在向量数据库中
+DOCUMENT_TEXT_STORE = os.environ.get("AGENT_DOCUMENT_TEXT_STORE", "separate")
+
+# 各命令的启动耗时预算（秒）
+# 不需要嵌入模型的命令应在预算内完成，加载模型的命令预算包含模型加载时间
+STARTUP_BUDGETS = {
+    "list-papers": 1.5,
+    "list-papers --query": 8.0,
+    "add-paper": 8.0,
+    "search-paper": 8.0,
+    "search-paper --mode lexical": 1.5,
+    "organize-papers": 8.0,
+    "add-image": 10.0,
+    "search-image": 10.0,
+    "search-similar": 10.0,
+    "search": 12.0,
+    "index-images": 10.0,
+    "process-images": 10.0,
+}
+
+# 查询服务（serve 命令）配置
+DAEMON_HOST = os.environ.get("AGENT_DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.environ.get("AGENT_DAEMON_PORT", "8765"))
+# 合并并发查询时的最大批大小与最长等待时间（毫秒）
+DAEMON_MAX_BATCH = int(os.environ.get("AGENT_DAEMON_MAX_BATCH", "32"))
+DAEMON_MAX_WAIT_MS = float(os.environ.get("AGENT_DAEMON_MAX_WAIT_MS", "5"))
+# search-batch 每次合并编码、合并查询的最大查询数（结果按此粒度流式输出）
+SEARCH_BATCH_SIZE = int(os.environ.get("AGENT_SEARCH_BATCH_SIZE", "256"))
+
+# 文献索引配置
+# chunk: 按页切分为带重叠的文本块分别嵌入；document: 整篇文档一个向量
+INDEX_MODE = os.environ.get("AGENT_INDEX_MODE", "chunk")
+CHUNK_SIZE = int(os.environ.get("AGENT_CHUNK_SIZE", "800"))
+CHUNK_OVERLAP = int(os.environ.get("AGENT_CHUNK_OVERLAP", "150"))
+# 每篇文档最多保留的块数，保证索引大小可预测
+CHUNK_MAX_PER_DOC = int(os.environ.get("AGENT_CHUNK_MAX_PER_DOC", "128"))
+# 块级检索时每个返回结果预取的块数
+CHUNK_OVERSAMPLE = 8
+# PDF文本提取模式：fast（PDFium，速度快）或 precise（pdfplumber 版面分析，较慢）
+PDF_EXTRACT_MODE = os.environ.get("AGENT_PDF_EXTRACT_MODE", "fast")
+# 页数超过该值的PDF按页段拆分到多个进程并行提取
+PDF_PAGES_PER_TASK = int(os.environ.get("AGENT_PDF_PAGES_PER_TASK", "16"))
+# 提取文本的缓存文件（按内容哈希缓存，设为空字符串关闭）
+TEXT_CACHE_PATH = os.environ.get("AGENT_TEXT_CACHE_PATH", "data/text_cache.sqlite3")
+# 主题分类：文档与主题描述的余弦相似度阈值，以及每篇文档最多归入的主题数（0 表示不限）
+TOPIC_THRESHOLD = float(os.environ.get("AGENT_TOPIC_THRESHOLD", "0.3"))
+TOPIC_TOP_N = int(os.environ.get("AGENT_TOPIC_TOP_N", "2"))
+# 嵌入主题标签时使用的描述模板与常见缩写的全称
+TOPIC_LABEL_TEMPLATE = "A research paper about {topic}"
+TOPIC_ALIASES = {
+    "AI": "artificial intelligence",
+    "CL": "computational linguistics",
+    "CV": "computer vision",
+    "DL": "deep learning",
+    "IR": "information retrieval",
+    "ML": "machine learning",
+    "NLP": "natural language processing",
+    "RL": "reinforcement learning",
+}
+# 论文放入主题目录的方式：auto / reflink / hardlink / symlink / copy / virtual（见 src/placement.py）
+PLACEMENT_MODE = os.environ.get("AGENT_PLACEMENT_MODE", "auto")
+# 批量编码时的批大小
+ENCODE_BATCH_SIZE = int(os.environ.get("AGENT_ENCODE_BATCH_SIZE", "32"))
+# 批量整理时每批合并编码的文档数
+INGEST_DOCS_PER_BATCH = int(os.environ.get("AGENT_INGEST_DOCS_PER_BATCH", "16"))
+# 单次写入向量数据库的最大记录数
+DB_WRITE_BATCH_SIZE = int(os.environ.get("AGENT_DB_WRITE_BATCH_SIZE", "1000"))
+# 批量索引时写缓冲累计的记录数，达到后合并写入数据库
+WRITE_BUFFER_RECORDS = int(os.environ.get("AGENT_WRITE_BUFFER_RECORDS", "4000"))
+
+# 图像索引配置
+# 每批编码的图像数
+IMAGE_BATCH_SIZE = int(os.environ.get("AGENT_IMAGE_BATCH_SIZE", "32"))
+# 解码后图像最短边的像素数（CLIP 输入为 224）
+IMAGE_DECODE_SIZE = 224
+# 并行解码时全尺寸像素缓冲区的总内存上限（MB），大图超出上限时排队解码
+IMAGE_DECODE_MEMORY_MB = int(os.environ.get("AGENT_IMAGE_DECODE_MEMORY_MB", "512"))
+# 重复图像检测（find-duplicates 命令）
+# CLIP 向量余弦相似度阈值、感知哈希的最大汉明距离，以及分块比较时每块的向量数
+DUPLICATE_THRESHOLD = float(os.environ.get("AGENT_DUPLICATE_THRESHOLD", "0.95"))
+DUPLICATE_HASH_DISTANCE = int(os.environ.get("AGENT_DUPLICATE_HASH_DISTANCE", "4"))
+DUPLICATE_BLOCK_SIZE = int(os.environ.get("AGENT_DUPLICATE_BLOCK_SIZE", "4096"))
+# 论文插图（index-figures 命令）：提取后的插图目录，以及短边小于该像素数的图像（图标、公式等）不提取
+FIGURES_DIR = os.environ.get("AGENT_FIGURES_DIR", "data/figures")
+FIGURE_MIN_SIDE = int(os.environ.get("AGENT_FIGURE_MIN_SIDE", "128"))
+
+# 跨模态统一检索（search 命令，见 src/unified_search.py）
+# 分数校准时每个集合抽样的向量数；记录数相对校准时的变化超过该比例时重新校准
+SEARCH_CALIBRATION_SAMPLE = int(os.environ.get("AGENT_SEARCH_CALIBRATION_SAMPLE", "2000"))
+SEARCH_CALIBRATION_DRIFT = float(os.environ.get("AGENT_SEARCH_CALIBRATION_DRIFT", "0.5"))
+
+# 目录监听（watch 命令，见 src/watcher.py）
+# 最后一个事件之后静默多久才处理一批变化、连续有事件时最长的等待时间，以及轮询模式的扫描间隔（秒）
+WATCH_DEBOUNCE_SECONDS = float(os.environ.get("AGENT_WATCH_DEBOUNCE", "2.0"))
+WATCH_MAX_DELAY_SECONDS = float(os.environ.get("AGENT_WATCH_MAX_DELAY", "30.0"))
+WATCH_POLL_INTERVAL = float(os.environ.get("AGENT_WATCH_POLL_INTERVAL", "5.0"))
+
+# 查询向量缓存
+# 内存中最多缓存的查询数
+QUERY_CACHE_SIZE = int(os.environ.get("AGENT_QUERY_CACHE_SIZE", "1024"))
+# 磁盘缓存文件（设为空字符串可关闭磁盘层）与每个模型最多缓存的查询数
+QUERY_CACHE_PATH = os.environ.get("AGENT_QUERY_CACHE_PATH", "data/query_cache.sqlite3")
+QUERY_CACHE_DISK_SIZE = int(os.environ.get("AGENT_QUERY_CACHE_DISK_SIZE", "100000"))
+
+# 索引清单（记录已索引文件的大小、修改时间、内容哈希和模型）与路径索引的文件名，
+# 二者都存放在向量数据库目录中，删除该目录即可一并清除
+MANIFEST_FILE = "manifest.sqlite3"
+PATH_INDEX_FILE = "path_index.sqlite3"
+# 论文 BM25 词法索引的文件名（同样存放在向量数据库目录中）
+LEXICAL_INDEX_FILE = "lexical_index.sqlite3"
+# 各集合分数校准结果的文件名（同样存放在向量数据库目录中）
+CALIBRATION_FILE = "score_calibration.json"
+# 论文正文与文本块的压缩文本存储的文件名（同样存放在向量数据库目录中）
+TEXT_STORE_FILE = "text_store.sqlite3"
+# 词法检索时跳过出现在超过该比例文本块中的词项（如 "the"、"model"，几乎不区分文档却要读取整张倒排表）；
+# 文本块数少于 LEXICAL_DF_MIN_UNITS 时不跳过，全部查询词都超过比例时只保留最少见的一个
+LEXICAL_MAX_DF_RATIO = float(os.environ.get("AGENT_LEXICAL_MAX_DF_RATIO", "0.5"))
+LEXICAL_DF_MIN_UNITS = 1000
+# 混合检索时倒数排名融合（RRF）的平滑常数，以及每路检索预取的结果倍数
+RRF_K = 60
+HYBRID_OVERSAMPLE = 4
+
+# 元数据过滤：记录中保存的目录前缀层数（dir1..dirN 字段，用于 --dir 过滤）
+METADATA_DIR_DEPTH = int(os.environ.get("AGENT_METADATA_DIR_DEPTH", "4"))
+# 目录前缀的基准目录：文件路径与 --dir 参数都先转为绝对路径，再取相对该目录的各层（默认当前工作目录）
+METADATA_DIR_ROOT = os.environ.get("AGENT_METADATA_DIR_ROOT", ".")
+
+# 基准测试（benchmark 命令）
+# 与基线对比时允许的相对退化比例，以及参与对比的指标（前缀匹配）
+BENCHMARK_REGRESSION_THRESHOLD = float(os.environ.get("AGENT_BENCHMARK_THRESHOLD", "0.1"))
+BENCHMARK_COMPARE_METRICS = ["ingest.items_per_s", "stages", "search", "peak_rss_mb.self", "index_size_mb",
+                             "bytes_per_item"]
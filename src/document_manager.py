@@ -3,48 +3,188 @@
 支持PDF文件的语义搜索、自动分类和整理
 """
 import os
-import shutil
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
-import PyPDF2
-import pdfplumber
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+from typing import List, Dict, Iterator, Optional
+
 import numpy as np
 
+from . import config, metrics, storage
+from .chunking import chunk_pages
+from .filters import dir_metadata, topic_metadata
+from .inference import INFERENCE_BACKENDS, load_model
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion, sync_from_collections
+from .manifest import Manifest, file_digest
+from .path_index import PathIndex, sync_from_collection
+from .placement import place_file
+from .query_cache import QueryCache
+from .pdf_extract import (BACKENDS, extract_pages, extract_pages_parallel, join_pages, page_count,
+                          page_ranges, pdf_year)
+from .scanner import DirectoryScanner
+from .text_cache import TextCache
+from .text_store import TextStore, fill_documents
+from .topic_classifier import TopicClassifier
+
+
+# 论文搜索模式
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
 
 class DocumentManager:
     """文献管理器"""
     
-    def __init__(self, data_dir: str = "data/documents", db_path: str = "data/chroma_db"):
+    def __init__(self, data_dir: str = config.DOCUMENTS_DIR, db_path: str = config.DB_PATH,
+                 model_name: str = config.TEXT_MODEL_NAME, index_mode: str = config.INDEX_MODE,
+                 manifest_path: Optional[str] = None, extract_mode: str = config.PDF_EXTRACT_MODE,
+                 backend: str = config.INFERENCE_BACKEND, threads: int = config.INFERENCE_THREADS):
         """
         初始化文献管理器
         
+        模型和向量数据库均为延迟加载：只有在命令真正需要时才会导入
+        sentence_transformers / chromadb 并完成初始化
+        
         Args:
             data_dir: 文献存储目录
             db_path: 向量数据库路径
+            model_name: 文本嵌入模型名称
+            index_mode: 索引模式，"chunk" 为块级索引，"document" 为整篇文档一个向量
+            manifest_path: 索引清单路径（默认存放在向量数据库目录中）
+            extract_mode: PDF文本提取模式，"fast" 或 "precise"
+            backend: 推理后端，"torch"、"int8" 或 "onnx"
+            threads: 推理时算子内并行线程数（0 表示默认）
         """
+        if index_mode not in ("chunk", "document"):
+            raise ValueError(f"不支持的索引模式: {index_mode}")
+        if extract_mode not in BACKENDS:
+            raise ValueError(f"不支持的PDF提取模式: {extract_mode}")
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"不支持的推理后端: {backend}")
+        
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.model_name = model_name
+        self.index_mode = index_mode
+        self.extract_mode = extract_mode
+        self.backend = backend
+        self.threads = threads
+        self.topic_threshold = config.TOPIC_THRESHOLD
+        self.topic_top_n = config.TOPIC_TOP_N
+        self.placement_mode = config.PLACEMENT_MODE
+        self.manifest_path = manifest_path or os.path.join(db_path, config.MANIFEST_FILE)
         
-        # 初始化文本嵌入模型
-        print("正在加载文本嵌入模型...")
-        self.text_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # 初始化向量数据库
-        self.client = chromadb.PersistentClient(
-            path=db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        
-        # 获取或创建集合
-        self.collection = self.client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
+        self._text_model = None
+        self._collection = None
+        self._chunk_collection = None
+        self._manifest = None
+        self._path_index = None
+        self._query_cache = None
+        self._text_cache = None
+        self._text_store = None
+        self._topic_classifier = None
+        self._lexical_index = None
+        # batch_organize 期间的写缓冲，为 None 时直接写入
+        self._write_buffer = None
+    
+    @property
+    def text_model(self):
+        """文本嵌入模型（首次访问时加载）"""
+        if self._text_model is None:
+            print(f"正在加载文本嵌入模型（{self.backend}）...")
+            self._text_model = load_model(self.model_name, self.backend, self.threads or None)
+            print("文本嵌入模型加载完成")
+        return self._text_model
+    
+    @property
+    def client(self):
+        """向量数据库客户端（进程内与图像管理器共享，首次访问时打开数据库）"""
+        return storage.get_client(self.db_path)
+    
+    @property
+    def collection(self):
+        """文献向量集合，每篇文档一条记录"""
+        if self._collection is None:
+            self._collection = storage.get_collection(self.db_path, "documents")
+        return self._collection
+    
+    @property
+    def chunk_collection(self):
+        """文本块向量集合，每个文本块一条记录，通过 doc_id 关联所属文档"""
+        if self._chunk_collection is None:
+            self._chunk_collection = storage.get_collection(self.db_path, "document_chunks")
+        return self._chunk_collection
+    
+    @property
+    def manifest(self) -> Manifest:
+        """索引清单（首次访问时打开）"""
+        if self._manifest is None:
+            self._manifest = Manifest(self.manifest_path)
+        return self._manifest
+    
+    @property
+    def path_index(self) -> PathIndex:
+        """路径索引（首次访问时打开，旧索引会从向量数据库回填一次）"""
+        if self._path_index is None:
+            path_index = PathIndex(os.path.join(self.db_path, config.PATH_INDEX_FILE))
+            if not path_index.is_synced("document"):
+                sync_from_collection(path_index, "document", self.collection)
+            self._path_index = path_index
+        return self._path_index
+    
+    @property
+    def lexical_index(self) -> LexicalIndex:
+        """BM25 词法索引（首次访问时打开，旧索引会从向量数据库回填一次）"""
+        if self._lexical_index is None:
+            lexical_index = LexicalIndex(os.path.join(self.db_path, config.LEXICAL_INDEX_FILE), self.text_store)
+            if not lexical_index.is_synced():
+                sync_from_collections(lexical_index, self.collection, self.chunk_collection, self.text_store)
+            self._lexical_index = lexical_index
+        return self._lexical_index
+    
+    @property
+    def query_cache(self) -> QueryCache:
+        """查询向量缓存（首次访问时打开）"""
+        if self._query_cache is None:
+            self._query_cache = QueryCache(self.model_key)
+        return self._query_cache
+    
+    @property
+    def text_cache(self) -> Optional[TextCache]:
+        """PDF文本缓存（首次访问时打开，未配置缓存文件时为 None）"""
+        if self._text_cache is None and config.TEXT_CACHE_PATH:
+            self._text_cache = TextCache(config.TEXT_CACHE_PATH)
+        return self._text_cache
+    
+    @property
+    def text_store(self) -> TextStore:
+        """论文正文与文本块的压缩文本存储（首次访问时打开）"""
+        if self._text_store is None:
+            self._text_store = TextStore(os.path.join(self.db_path, config.TEXT_STORE_FILE))
+        return self._text_store
+    
+    @property
+    def topic_classifier(self) -> TopicClassifier:
+        """主题分类器（标签向量经查询向量缓存，只编码一次）"""
+        if self._topic_classifier is None:
+            self._topic_classifier = TopicClassifier(self.encode_queries)
+        return self._topic_classifier
+    
+    @property
+    def model_key(self) -> str:
+        """
+        向量来源标识（模型名称加推理后端），用作查询缓存的键
         
-        print("文献管理器初始化完成")
+        不同后端的向量略有差异，fp32（torch）沿用模型名称本身，与旧的缓存和清单兼容
+        """
+        return self.model_name if self.backend == "torch" else f"{self.model_name}@{self.backend}"
+    
+    @property
+    def manifest_model(self) -> str:
+        """清单中记录的模型标识，模型、推理后端或索引模式变化时需要重新嵌入"""
+        return f"{self.model_key}:{self.index_mode}"
     
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """
@@ -56,27 +196,41 @@ class DocumentManager:
         Returns:
             提取的文本内容
         """
-        text = ""
-        try:
-            # 使用pdfplumber提取文本（更准确）
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-        except Exception as e:
-            print(f"使用pdfplumber提取失败，尝试PyPDF2: {e}")
-            # 备用方案：使用PyPDF2
-            try:
-                with open(pdf_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page in pdf_reader.pages:
-                        text += page.extract_text() + "\n"
-            except Exception as e2:
-                print(f"PDF文本提取失败: {e2}")
-                return ""
+        return join_pages(self.extract_pages_from_pdf(pdf_path))
+    
+    def extract_pages_from_pdf(self, pdf_path: str, content_hash: Optional[str] = None,
+                               workers: Optional[int] = None) -> List[str]:
+        """
+        从PDF文件中逐页提取文本
+        
+        优先读取按内容哈希缓存的文本；未命中时提取，页数较多的PDF按页段并行提取
+        
+        Args:
+            pdf_path: PDF文件路径
+            content_hash: 文件内容哈希（未提供时计算）
+            workers: 并行提取的进程数（默认CPU核数）
+            
+        Returns:
+            每页的文本列表
+        """
+        if self.text_cache is None:
+            with metrics.timer("pdf.extract"):
+                return extract_pages_parallel(pdf_path, self.extract_mode, workers or os.cpu_count() or 1)
         
-        return text.strip()
+        content_hash = content_hash or file_digest(pdf_path)
+        pages = self.text_cache.get(content_hash, self.extract_mode)
+        if pages is None:
+            with metrics.timer("pdf.extract"):
+                pages = extract_pages_parallel(pdf_path, self.extract_mode, workers or os.cpu_count() or 1)
+            self._cache_pages(content_hash, pages)
+        else:
+            metrics.incr("pdf.text_cache_hits")
+        return pages
+    
+    def _cache_pages(self, content_hash: str, pages: List[str]):
+        """缓存提取成功的逐页文本（提取失败的空结果不缓存，便于下次重试）"""
+        if pages and self.text_cache is not None:
+            self.text_cache.put(content_hash, self.extract_mode, pages)
     
     def add_document(self, pdf_path: str, topics: Optional[List[str]] = None) -> Dict:
         """
@@ -99,147 +253,854 @@ class DocumentManager:
         print(f"正在处理文档: {pdf_path.name}")
         
         # 提取文本
-        text = self.extract_text_from_pdf(str(pdf_path))
+        content_hash = file_digest(str(pdf_path))
+        pages = self.extract_pages_from_pdf(str(pdf_path), content_hash)
+        text = join_pages(pages)
         if not text:
             raise ValueError(f"无法从PDF中提取文本: {pdf_path}")
         
-        # 生成嵌入向量
-        embedding = self.text_model.encode(text).tolist()
-        
-        # 生成文档ID
-        doc_id = f"doc_{pdf_path.stem}_{hash(str(pdf_path))}"
-        
-        # 存储到向量数据库
-        self.collection.add(
-            embeddings=[embedding],
-            documents=[text[:10000]],  # ChromaDB有长度限制，截取前10000字符
-            metadatas=[{
-                "file_path": str(pdf_path),
-                "file_name": pdf_path.name,
-                "topics": ",".join(topics) if topics else ""
-            }],
-            ids=[doc_id]
-        )
+        doc = self._prepare_document(pdf_path, pages, text, topics, content_hash)
+        self._index_documents([doc], topics=topics)
         
-        # 如果指定了主题，进行自动分类
+        # 如果指定了主题，按分类结果放入主题目录
         if topics:
-            self._classify_and_move(pdf_path, topics, text)
+            self._place_document(pdf_path, doc["matched_topics"])
         
         print(f"文档已添加: {pdf_path.name}")
         return {
-            "doc_id": doc_id,
+            "doc_id": doc["doc_id"],
             "file_name": pdf_path.name,
             "file_path": str(pdf_path),
             "text_length": len(text)
         }
     
-    def _classify_and_move(self, pdf_path: Path, topics: List[str], text: str):
+    def _prepare_document(self, pdf_path: Path, pages: List[str], text: str,
+                          topics: Optional[List[str]], content_hash: str) -> Dict:
         """
-        根据主题分类并移动文件
+        生成待索引文档的ID和元数据
         
         Args:
             pdf_path: PDF文件路径
+            pages: 每页的文本列表
+            text: 完整文本
             topics: 主题列表
-            text: 文档文本内容
+            content_hash: 文件内容哈希
+            
+        Returns:
+            待索引文档信息
+        """
+        # 文档ID由文件内容决定，同一文件在不同进程中重复添加不会产生重复向量
+        doc_id = f"doc_{content_hash}"
+        
+        # 结构化元数据用于 where 过滤：页数、年份、目录前缀（dir1..dirN）和主题布尔字段
+        metadata = {
+            "file_path": str(pdf_path),
+            "file_name": pdf_path.name,
+            "topics": ",".join(topics) if topics else "",
+            "page_count": len(pages),
+            **dir_metadata(pdf_path),
+            **topic_metadata(topics or [])
+        }
+        year = pdf_year(str(pdf_path))
+        if year:
+            metadata["year"] = year
+        
+        return {
+            "doc_id": doc_id,
+            "content_hash": content_hash,
+            "pages": pages,
+            "text": text,
+            "metadata": metadata
+        }
+    
+    def _index_documents(self, docs: List[Dict], batch_size: int = config.ENCODE_BATCH_SIZE,
+                         topics: Optional[List[str]] = None):
         """
-        # 使用简单的关键词匹配进行分类（可以改进为使用LLM）
-        text_lower = text.lower()
-        matched_topics = []
+        批量嵌入并写入多篇文档
         
+        所有文档（块级模式下为所有文本块）合并为一次批量 encode 调用，
+        再以多条记录一次 add 的方式写入向量数据库
+        
+        Args:
+            docs: _prepare_document 生成的文档信息列表
+            batch_size: 模型前向计算的批大小
+            topics: 候选主题列表，提供时按文档向量分类，结果写入 doc["matched_topics"] 和元数据
+        """
+        # 同一批中内容相同的文件只嵌入一次
+        unique = {}
+        for doc in docs:
+            unique.setdefault(doc["doc_id"], doc)
+        all_docs, docs = docs, list(unique.values())
+        
+        # 清理这些路径上的旧记录：内容已变化的文件按清单删除旧ID，
+        # 清单中没有的文件按路径删除旧版本（基于 hash() 的ID）生成的记录
+        stale, legacy = [], []
+        for doc in all_docs:
+            path = doc["metadata"]["file_path"]
+            entry = self.manifest.get("document", path)
+            if entry is None:
+                legacy.append(path)
+            elif entry.item_id != doc["doc_id"]:
+                stale.append(path)
+        if stale:
+            self.remove_documents(stale)
+        if legacy:
+            self._delete_records(where={"file_path": {"$in": legacy}})
+            self.path_index.remove_paths("document", legacy)
+            self.lexical_index.remove_paths(legacy)
+        
+        self._write_documents(docs, batch_size, topics)
+        for doc in all_docs:
+            doc["matched_topics"] = unique[doc["doc_id"]].get("matched_topics", [])
+        
+        def record():
+            for doc in docs:
+                chunks = doc.get("chunks")
+                if chunks and config.DOCUMENT_TEXT_STORE == "separate":
+                    # 块文本已在文本存储中，词法索引只记录块ID
+                    chunks = [{**chunk, "item_id": f"{doc['doc_id']}#{chunk['chunk_index']}"} for chunk in chunks]
+                self.lexical_index.upsert(doc["doc_id"], doc["metadata"], chunks or chunk_pages(doc["pages"]))
+            self.path_index.upsert("document", [
+                {"item_id": doc["doc_id"], "path": doc["metadata"]["file_path"], "topics": doc["metadata"]["topics"]}
+                for doc in docs
+            ])
+            self.manifest.record_many(
+                "document",
+                [(doc["metadata"]["file_path"], doc["content_hash"], doc["doc_id"]) for doc in all_docs],
+                self.manifest_model
+            )
+        
+        # 使用写缓冲时，词法索引、路径索引和清单在向量记录真正写入后再更新
+        if self._write_buffer is not None:
+            self._write_buffer.after_flush(record)
+        else:
+            record()
+    
+    def _write_documents(self, docs: List[Dict], batch_size: int, topics: Optional[List[str]] = None):
+        """嵌入、分类并写入一批ID互不相同的文档"""
+        # upsert 会合并元数据，先删除旧记录，避免重新分类后残留旧的主题字段
+        self.collection.delete(ids=[doc["doc_id"] for doc in docs])
+        # 重新嵌入时块数可能变少，一并删除旧的文本
+        self.text_store.remove_docs([doc["doc_id"] for doc in docs])
+        if self.index_mode == "document":
+            # 生成嵌入向量
+            embeddings = self._encode_texts([doc["text"] for doc in docs], batch_size=batch_size)
+            self._classify_documents(docs, embeddings, topics)
+            
+            # 存储到向量数据库
+            self._bulk_upsert(
+                self.collection,
+                ids=[doc["doc_id"] for doc in docs],
+                embeddings=np.asarray(embeddings, dtype=np.float32),
+                documents=[doc["text"][:10000] for doc in docs],  # ChromaDB有长度限制，截取前10000字符
+                metadatas=[doc["metadata"] for doc in docs]
+            )
+            return
+        
+        # 块级模式：切分所有文档后统一编码
+        doc_chunks = [chunk_pages(doc["pages"]) for doc in docs]
+        chunk_texts = [chunk["text"] for chunks in doc_chunks for chunk in chunks]
+        chunk_embeddings = np.asarray(
+            self._encode_texts(chunk_texts, batch_size=batch_size),
+            dtype=np.float32
+        )
+        
+        doc_embeddings = []
+        offset = 0
+        for doc, chunks in zip(docs, doc_chunks):
+            doc["chunks"] = chunks
+            # 文档级向量取所有块向量的归一化均值，用于文档列表、主题分类和兼容整篇检索
+            doc_embedding = chunk_embeddings[offset:offset + len(chunks)].mean(axis=0)
+            norm = np.linalg.norm(doc_embedding)
+            doc_embeddings.append(doc_embedding / norm if norm > 0 else doc_embedding)
+            offset += len(chunks)
+        doc_embeddings = np.asarray(doc_embeddings, dtype=np.float32)
+        self._classify_documents(docs, doc_embeddings, topics)
+        
+        chunk_ids, chunk_metadatas = [], []
+        for doc, chunks in zip(docs, doc_chunks):
+            for chunk in chunks:
+                chunk_ids.append(f"{doc['doc_id']}#{chunk['chunk_index']}")
+                chunk_metadatas.append({
+                    **doc["metadata"],
+                    "doc_id": doc["doc_id"],
+                    "page": chunk["page"],
+                    "chunk_index": chunk["chunk_index"]
+                })
+        
+        self._bulk_upsert(
+            self.collection,
+            ids=[doc["doc_id"] for doc in docs],
+            embeddings=doc_embeddings,
+            documents=[doc["text"][:10000] for doc in docs],
+            metadatas=[{**doc["metadata"], "chunk_count": len(chunks)}
+                       for doc, chunks in zip(docs, doc_chunks)]
+        )
+        # 重新嵌入时块数可能变少，先删除这些文档的旧文本块
+        self.chunk_collection.delete(where={"doc_id": {"$in": [doc["doc_id"] for doc in docs]}})
+        self._bulk_upsert(
+            self.chunk_collection,
+            ids=chunk_ids,
+            embeddings=chunk_embeddings,
+            documents=chunk_texts,
+            metadatas=chunk_metadatas
+        )
+    
+    def _encode_texts(self, texts: List[str], batch_size: int = config.ENCODE_BATCH_SIZE):
+        """批量编码文本（记录编码耗时与条数）"""
+        metrics.incr("text.encode_items", len(texts))
+        with metrics.timer("text.encode"):
+            return self.text_model.encode(texts, batch_size=batch_size)
+    
+    def _bulk_upsert(self, collection, ids: List[str], embeddings, documents: List[str],
+                     metadatas: List[Dict]):
+        """
+        写入多条记录；batch_organize 期间先放入写缓冲，攒够后批量写入
+        
+        文本单独存放时（DOCUMENT_TEXT_STORE=separate），文本直接写入文本存储，向量数据库中不保存文本
+        """
+        if config.DOCUMENT_TEXT_STORE == "separate":
+            self.text_store.put(
+                (item_id, metadata.get("doc_id", item_id), text)
+                for item_id, text, metadata in zip(ids, documents, metadatas)
+            )
+            documents = None
+        if self._write_buffer is not None:
+            self._write_buffer.upsert(collection, ids, embeddings, documents, metadatas)
+        else:
+            storage.bulk_upsert(collection, ids, embeddings, documents, metadatas)
+    
+    def _delete_records(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        """从文档集合和文本块集合中删除记录"""
+        if self._write_buffer is not None:
+            # 先写入缓冲中的记录，避免删除后又被写回
+            self._write_buffer.flush()
+        if ids:
+            self.collection.delete(ids=ids)
+            self.chunk_collection.delete(where={"doc_id": {"$in": ids}})
+            self.path_index.remove_ids("document", ids)
+            self.lexical_index.remove(ids)
+            self.text_store.remove_docs(ids)
+        if where:
+            self.text_store.remove_docs(self.collection.get(where=where, include=[])["ids"])
+            self.collection.delete(where=where)
+            self.chunk_collection.delete(where=where)
+    
+    def remove_documents(self, paths: List[str]) -> int:
+        """
+        从索引中删除文件（文件已被删除或不再需要索引）
+        
+        内容相同的其他路径仍引用同一文档ID时保留向量，并把记录中的路径改为仍存在的路径
+        
+        Args:
+            paths: 文件路径列表
+            
+        Returns:
+            删除的文档数
+        """
+        entries = [self.manifest.get("document", path) for path in paths]
+        self.manifest.remove("document", paths)
+        
+        orphan_ids = []
+        for item_id in sorted({entry.item_id for entry in entries if entry}):
+            remaining = self.manifest.find_by_item("document", item_id)
+            if remaining:
+                self._update_record_paths(item_id, Path(remaining[0].path))
+            else:
+                orphan_ids.append(item_id)
+        self._delete_records(ids=orphan_ids)
+        return len(orphan_ids)
+    
+    def _move_document(self, entry, new_path: Path):
+        """
+        文件内容未变但路径变化时，只更新记录中的路径而不重新嵌入
+        
+        Args:
+            entry: 清单中的旧记录
+            new_path: 新路径
+        """
+        self._update_record_paths(entry.item_id, new_path)
+        self.manifest.remove("document", [entry.path])
+        self.manifest.record("document", new_path, entry.content_hash, entry.model, entry.item_id)
+    
+    def _update_record_paths(self, doc_id: str, new_path: Path):
+        """更新文档及其文本块记录中的文件路径"""
+        updates = {"file_path": str(new_path), "file_name": new_path.name, **dir_metadata(new_path)}
+        self.path_index.update_path("document", doc_id, new_path)
+        self.lexical_index.update_path(doc_id, new_path)
+        
+        for collection, ids, where in ((self.collection, [doc_id], None),
+                                       (self.chunk_collection, None, {"doc_id": doc_id})):
+            records = collection.get(ids=ids, where=where, include=["metadatas"])
+            if records["ids"]:
+                collection.update(
+                    ids=records["ids"],
+                    metadatas=[{**metadata, **updates} for metadata in records["metadatas"]]
+                )
+    
+    @metrics.timed("classify")
+    def _classify_documents(self, docs: List[Dict], embeddings, topics: Optional[List[str]]):
+        """
+        用文档向量批量分类（一次矩阵乘法），结果写入 doc["matched_topics"] 和元数据中的 topics
+        
+        Args:
+            docs: 文档信息列表
+            embeddings: 与 docs 对应的文档向量
+            topics: 候选主题列表，为空时不分类
+        """
+        if not topics:
+            return
+        matched = self.topic_classifier.classify(
+            embeddings, topics, threshold=self.topic_threshold, top_n=self.topic_top_n
+        )
+        for doc, doc_topics in zip(docs, matched):
+            doc["matched_topics"] = doc_topics
+            for key in [key for key in doc["metadata"] if key.startswith("topic_")]:
+                del doc["metadata"][key]
+            doc["metadata"]["topics"] = ",".join(doc_topics)
+            doc["metadata"].update(topic_metadata(doc_topics))
+    
+    @metrics.timed("place")
+    def _place_document(self, pdf_path: Path, topics: List[str]):
+        """
+        将文件放入分类得到的主题目录（放置方式由 placement_mode 决定）
+        
+        Args:
+            pdf_path: PDF文件路径
+            topics: 分类得到的主题列表
+        """
         for topic in topics:
-            if topic.lower() in text_lower:
-                matched_topics.append(topic)
+            dest_path = self.data_dir / topic.strip() / pdf_path.name
+            if pdf_path.resolve() == dest_path.resolve():  # 避免放置到自身
+                continue
+            action = place_file(pdf_path, dest_path, self.placement_mode)
+            if action == "virtual":
+                print(f"文件已分类到: {topic}（仅记录主题）")
+            elif action != "exists":
+                print(f"文件已分类到: {topic}/{pdf_path.name}（{action}）")
+    
+    def materialize_topics(self, mode: str = "symlink", topic: Optional[str] = None) -> Dict[str, int]:
+        """
+        按索引中记录的主题生成主题目录视图（用于 virtual 放置方式）
+        
+        Args:
+            mode: 放置方式（不能为 virtual）
+            topic: 只生成该主题的目录
         
-        # 如果没有匹配，使用第一个主题作为默认
-        if not matched_topics:
-            matched_topics = [topics[0]]
+        Returns:
+            各操作的文件数
+        """
+        if mode == "virtual":
+            raise ValueError("生成目录视图时不能使用 virtual 放置方式")
+        counts: Dict[str, int] = {}
+        for doc_topic, path in self.path_index.iter_topic_paths("document", topic):
+            source = Path(path)
+            if not source.exists():
+                counts["missing"] = counts.get("missing", 0) + 1
+                continue
+            dest_path = self.data_dir / doc_topic / source.name
+            if source.resolve() == dest_path.resolve():
+                action = "exists"
+            else:
+                action = place_file(source, dest_path, mode)
+            counts[action] = counts.get(action, 0) + 1
+        return counts
+    
+    def encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        批量生成查询向量（命中缓存的查询不再编码，其余合并为一次前向计算）
         
-        # 创建主题目录并移动文件
-        for topic in matched_topics:
-            topic_dir = self.data_dir / topic.strip()
-            topic_dir.mkdir(parents=True, exist_ok=True)
+        Args:
+            queries: 查询文本列表
             
-            # 移动文件到对应主题目录
-            dest_path = topic_dir / pdf_path.name
-            if pdf_path != dest_path:  # 避免移动到自身
-                shutil.copy2(pdf_path, dest_path)
-                print(f"文件已分类到: {topic}/{pdf_path.name}")
+        Returns:
+            查询向量列表
+        """
+        return self.query_cache.encode(queries, lambda texts: self._encode_texts(texts).tolist())
     
-    def search_documents(self, query: str, top_k: int = 5) -> List[Dict]:
+    def search_documents(self, query: str, top_k: int = 5, mode: str = "vector",
+                         where: Optional[Dict] = None) -> List[Dict]:
         """
-        语义搜索文档
+        搜索文档
         
         Args:
-            query: 搜索查询（自然语言）
+            query: 搜索查询（自然语言或关键词）
             top_k: 返回最相关的k个结果
+            mode: "vector" 语义检索，"lexical" BM25 词法检索（不加载模型），
+                "hybrid" 两者以倒数排名融合
+            where: 元数据过滤条件（Chroma where 子句，见 src/filters.py），在数据库内部过滤
             
         Returns:
             相关文档列表
         """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"不支持的搜索模式: {mode}")
         print(f"正在搜索: {query}")
         
+        if mode == "lexical":
+            return self.lexical_index.search(query, top_k=top_k, where=where)
+        
         # 生成查询向量
-        query_embedding = self.text_model.encode(query).tolist()
+        query_embedding = self.encode_queries([query])[0]
+        if mode == "hybrid":
+            return self.search_hybrid(query, query_embedding, top_k=top_k, where=where)
+        return self.search_by_embedding(query_embedding, top_k=top_k, where=where)
+    
+    def search_batch(self, queries: List[str], top_k: int = 5, mode: str = "vector",
+                     where: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        批量搜索文档：所有查询合并为一次批量编码和一次多向量 query
         
-        # 在向量数据库中搜索
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
+        Args:
+            queries: 查询列表
+            top_k: 每个查询返回的结果数
+            mode: 搜索模式，同 search_documents
+            where: 元数据过滤条件（对所有查询生效）
+            
+        Returns:
+            与 queries 一一对应的结果列表
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"不支持的搜索模式: {mode}")
+        if not queries:
+            return []
+        if mode == "lexical":
+            return [self.lexical_index.search(query, top_k=top_k, where=where) for query in queries]
+        
+        embeddings = self.encode_queries(queries)
+        if mode == "vector":
+            return self.search_by_embeddings(embeddings, top_k=top_k, where=where)
+        depth = top_k * config.HYBRID_OVERSAMPLE
+        vector_results = self.search_by_embeddings(embeddings, top_k=depth, where=where)
+        return [
+            reciprocal_rank_fusion([results, self.lexical_index.search(query, top_k=depth, where=where)], top_k)
+            for query, results in zip(queries, vector_results)
+        ]
+    
+    def search_hybrid(self, query: str, query_embedding: List[float], top_k: int = 5,
+                      where: Optional[Dict] = None) -> List[Dict]:
+        """
+        混合检索：向量检索与 BM25 检索各取 top_k 的若干倍，再以倒数排名融合
+        
+        Args:
+            query: 查询文本（用于词法检索）
+            query_embedding: 查询向量
+            top_k: 返回最相关的k个结果
+            where: 元数据过滤条件，两路检索都在融合前过滤
+        """
+        depth = top_k * config.HYBRID_OVERSAMPLE
+        return reciprocal_rank_fusion(
+            [self.search_by_embedding(query_embedding, top_k=depth, where=where),
+             self.lexical_index.search(query, top_k=depth, where=where)],
+            top_k
         )
+    
+    def search_by_embedding(self, query_embedding: List[float], top_k: int = 5,
+                            where: Optional[Dict] = None) -> List[Dict]:
+        """
+        使用已生成的查询向量搜索文档
+        
+        块级索引模式下检索文本块，并按文档聚合，取最匹配的段落作为摘要；
+        块集合为空（例如旧索引）时回退到文档级检索
+        
+        Args:
+            query_embedding: 查询向量
+            top_k: 返回最相关的k个结果
+            where: 元数据过滤条件（文本块记录带有所属文档的元数据，可直接过滤）
+            
+        Returns:
+            相关文档列表
+        """
+        return self.search_by_embeddings([query_embedding], top_k=top_k, where=where)[0]
+    
+    def search_collection(self):
+        """向量检索实际查询的集合：块级索引模式下为块集合，块集合为空时为文档集合"""
+        if self.index_mode == "chunk" and self.chunk_collection.count() > 0:
+            return self.chunk_collection
+        return self.collection
+    
+    def search_by_embeddings(self, query_embeddings: List[List[float]], top_k: int = 5,
+                             where: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        使用多个查询向量搜索文档，所有向量以一次 query 调用提交给向量数据库
+        
+        Args:
+            query_embeddings: 查询向量列表
+            top_k: 每个查询返回的结果数
+            where: 元数据过滤条件
+            
+        Returns:
+            与 query_embeddings 一一对应的结果列表
+        """
+        query_embeddings = [list(embedding) for embedding in query_embeddings]
+        if self.index_mode == "chunk":
+            chunk_count = self.chunk_collection.count()
+            if chunk_count > 0:
+                return self._search_chunks(query_embeddings, top_k, where, chunk_count)
+        
+        # 在向量数据库中搜索
+        with metrics.timer("db.query"):
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=top_k,
+                where=where
+            )
+        fill_documents(results, self.text_store)
+        return [self._format_results(results, i) for i in range(len(query_embeddings))]
+    
+    def _search_chunks(self, query_embeddings: List[List[float]], top_k: int, where: Optional[Dict],
+                       chunk_count: int) -> List[List[Dict]]:
+        """
+        检索文本块并按文档聚合
+        
+        先取 top_k * CHUNK_OVERSAMPLE 个块；长文档的块可能占满这些名额，
+        聚合后不足 top_k 篇且还有未取回的块时，对这些查询按 CHUNK_OVERSAMPLE 倍扩大块数重新检索
+        
+        Args:
+            query_embeddings: 查询向量列表
+            top_k: 每个查询返回的文档数
+            where: 元数据过滤条件
+            chunk_count: 块集合中的块数
+            
+        Returns:
+            与 query_embeddings 一一对应的结果列表
+        """
+        outputs: List[List[Dict]] = [[] for _ in query_embeddings]
+        pending = list(range(len(query_embeddings)))
+        n_results = min(top_k * config.CHUNK_OVERSAMPLE, chunk_count)
+        while pending:
+            with metrics.timer("db.query"):
+                results = self.chunk_collection.query(
+                    query_embeddings=[query_embeddings[i] for i in pending],
+                    n_results=n_results,
+                    where=where
+                )
+            fill_documents(results, self.text_store)
+            retry = []
+            for position, index in enumerate(pending):
+                outputs[index] = self._aggregate_chunks(results, position, top_k)
+                # 返回的块数少于 n_results 说明满足过滤条件的块已全部取回
+                if (len(outputs[index]) < top_k and n_results < chunk_count
+                        and len(results['ids'][position]) == n_results):
+                    retry.append(index)
+            pending = retry
+            n_results = min(n_results * config.CHUNK_OVERSAMPLE, chunk_count)
+        return outputs
+    
+    def _aggregate_chunks(self, results: Dict, index: int, top_k: int) -> List[Dict]:
+        """
+        将文本块的查询结果聚合为文档结果
+        
+        每篇文档取距离最小的块作为得分和摘要，结果按距离升序排列
+        
+        Args:
+            results: 块集合 query 的返回值
+            index: 第几个查询向量的结果
+            top_k: 返回的文档数
+            
+        Returns:
+            文档信息列表
+        """
+        best = {}
+        for i, metadata in enumerate(results['metadatas'][index]):
+            distance = results['distances'][index][i]
+            doc_id = metadata['doc_id']
+            if doc_id not in best or distance < best[doc_id][0]:
+                best[doc_id] = (distance, metadata, results['documents'][index][i])
         
-        # 格式化结果
         documents = []
-        if results['ids'] and len(results['ids'][0]) > 0:
-            for i in range(len(results['ids'][0])):
+        for distance, metadata, text in sorted(best.values(), key=lambda item: item[0])[:top_k]:
+            documents.append({
+                "file_name": metadata['file_name'],
+                "file_path": metadata['file_path'],
+                "topics": metadata.get('topics', ''),
+                "distance": distance,
+                "page": metadata.get('page'),
+                "snippet": text[:200] + "..." if len(text) > 200 else text
+            })
+        return documents
+    
+    def _format_results(self, results: Dict, index: int) -> List[Dict]:
+        """
+        格式化向量数据库的查询结果
+        
+        Args:
+            results: collection.query 的返回值
+            index: 第几个查询向量的结果
+            
+        Returns:
+            文档信息列表
+        """
+        documents = []
+        if results['ids'] and len(results['ids'][index]) > 0:
+            for i in range(len(results['ids'][index])):
+                metadata = results['metadatas'][index][i]
+                text = results['documents'][index][i]
                 doc = {
-                    "file_name": results['metadatas'][0][i]['file_name'],
-                    "file_path": results['metadatas'][0][i]['file_path'],
-                    "topics": results['metadatas'][0][i].get('topics', ''),
-                    "distance": results['distances'][0][i] if 'distances' in results else None,
-                    "snippet": results['documents'][0][i][:200] + "..." if len(results['documents'][0][i]) > 200 else results['documents'][0][i]
+                    "file_name": metadata['file_name'],
+                    "file_path": metadata['file_path'],
+                    "topics": metadata.get('topics', ''),
+                    "distance": results['distances'][index][i] if 'distances' in results else None,
+                    "snippet": text[:200] + "..." if len(text) > 200 else text
                 }
                 documents.append(doc)
         
         return documents
     
-    def batch_organize(self, source_dir: str, topics: List[str]):
+    def batch_organize(self, source_dir: str, topics: List[str], workers: Optional[int] = None,
+                       batch_size: int = config.ENCODE_BATCH_SIZE, skip_unchanged_dirs: bool = False):
         """
         批量整理文件夹中的PDF文件
         
+        采用分阶段流水线：进程池并行提取PDF文本，经有界队列交给主线程，
+        主线程攒够一批文档后统一批量编码并批量写入数据库，最后进行分类
+        
         Args:
             source_dir: 源文件夹路径
             topics: 主题列表
+            workers: 提取文本的进程数（默认为CPU核数，1表示不使用进程池）
+            batch_size: 模型前向计算的批大小
+            skip_unchanged_dirs: 目录修改时间与上次扫描相同时跳过
         """
         source_path = Path(source_dir)
         if not source_path.exists():
             raise FileNotFoundError(f"目录不存在: {source_dir}")
         
-        pdf_files = list(source_path.glob("*.pdf"))
-        print(f"找到 {len(pdf_files)} 个PDF文件")
+        # 单遍扫描并对比索引清单，只处理新增或内容变化的文件
+        previous = self.manifest.load_dir_state("document", source_path) if skip_unchanged_dirs else None
+        scanner = DirectoryScanner({".pdf"}, recursive=False, previous_state=previous)
+        plan = self.manifest.plan("document", scanner.scan(source_path), self.manifest_model,
+                                  root=source_path, recursive=False, skipped_dirs=scanner.skipped_dirs)
+        print(f"找到 {plan.scanned} 个PDF文件")
+        for entry, new_path in plan.moved:
+            self._move_document(entry, new_path)
+        if plan.deleted:
+            self.remove_documents([entry.path for entry in plan.deleted])
+        print(f"新增或变化 {len(plan.new)} 个，未变化 {plan.unchanged} 个，"
+              f"移动 {len(plan.moved)} 个，删除 {len(plan.deleted)} 个")
+        
+        hashes = {path: content_hash for path, content_hash in plan.new}
+        pdf_files = list(hashes)
+        if not pdf_files:
+            self.manifest.save_dir_state("document", source_path, scanner.state)
+            print("所有文件已索引，无需处理")
+            return
+        
+        self._ingest(pdf_files, hashes, topics, workers, batch_size)
+        self.manifest.save_dir_state("document", source_path, scanner.state)
+    
+    def apply_changes(self, files: List[Path], checked: List, topics: List[str], workers: Optional[int] = None,
+                      batch_size: int = config.ENCODE_BATCH_SIZE) -> Dict[str, int]:
+        """
+        按文件变化事件增量更新索引（watch 命令使用）
+        
+        Args:
+            files: 新增、修改或移入的PDF文件
+            checked: 需要检测删除的文件或目录，见 Manifest.plan_changes
+            topics: 主题列表
+            workers: 提取文本的进程数
+            batch_size: 模型前向计算的批大小
+            
+        Returns:
+            {"new": 新索引的文件数, "moved": 移动数, "deleted": 删除数}
+        """
+        plan = self.manifest.plan_changes("document", files, checked, self.manifest_model)
+        for entry, new_path in plan.moved:
+            self._move_document(entry, new_path)
+        if plan.deleted:
+            self.remove_documents([entry.path for entry in plan.deleted])
+        hashes = dict(plan.new)
+        success_count = self._ingest(list(hashes), hashes, topics, workers, batch_size) if hashes else 0
+        return {"new": success_count, "moved": len(plan.moved), "deleted": len(plan.deleted)}
+    
+    def _ingest(self, pdf_files: List[Path], hashes: Dict[Path, str], topics: List[str],
+                workers: Optional[int], batch_size: int) -> int:
+        """
+        提取、编码、写入并分类一组PDF文件
+        
+        Returns:
+            成功处理的文件数
+        """
+        workers = workers or os.cpu_count() or 1
+        extracted = queue.Queue(maxsize=config.INGEST_DOCS_PER_BATCH * 2)
+        producer = threading.Thread(
+            target=self._extract_stage, args=(pdf_files, workers, extracted, hashes), daemon=True
+        )
+        start_time = time.perf_counter()
+        producer.start()
+        
+        success_count = 0
+        pending = []
+        done = 0
+        # 多批文档的向量记录在写缓冲中合并，攒够后以大批量写入数据库
+        self._write_buffer = storage.WriteBuffer()
+        try:
+            while done < len(pdf_files):
+                pdf_file, pages, error = extracted.get()
+                done += 1
+                text = join_pages(pages) if pages else ""
+                if error or not text:
+                    print(f"处理文件 {pdf_file.name} 时出错: {error or '无法从PDF中提取文本'}")
+                else:
+                    pending.append(self._prepare_document(pdf_file, pages, text, topics, hashes[pdf_file]))
+                
+                if pending and (len(pending) >= config.INGEST_DOCS_PER_BATCH or done == len(pdf_files)):
+                    success_count += self._flush_organized(pending, topics, batch_size)
+                    pending = []
+                    elapsed = time.perf_counter() - start_time
+                    print(f"已处理 {done}/{len(pdf_files)} 个文件 ({done / elapsed:.2f} docs/s)")
+            self._write_buffer.flush()
+        finally:
+            self._write_buffer = None
         
-        for pdf_file in pdf_files:
+        producer.join()
+        elapsed = time.perf_counter() - start_time
+        print(f"批量整理完成，共处理 {success_count}/{len(pdf_files)} 个文件，"
+              f"耗时 {elapsed:.1f}s，吞吐量 {len(pdf_files) / elapsed:.2f} docs/s")
+        return success_count
+    
+    def _extract_stage(self, pdf_files: List[Path], workers: int, output: queue.Queue,
+                       hashes: Dict[Path, str]):
+        """
+        流水线第一阶段：并行提取PDF文本，结果按完成顺序放入有界队列
+        
+        命中文本缓存的文件直接输出；页数较多的PDF按页段拆分为多个任务，
+        全部页段完成后按页码顺序拼接。同时提交的任务数不超过 workers 的两倍，
+        避免提取结果在内存中堆积
+        
+        Args:
+            pdf_files: PDF文件列表
+            workers: 进程数
+            output: 输出队列，元素为 (文件路径, 逐页文本, 错误)
+            hashes: 文件内容哈希
+        """
+        if workers <= 1:
+            for pdf_file in pdf_files:
+                try:
+                    output.put((pdf_file, self.extract_pages_from_pdf(str(pdf_file), hashes[pdf_file], 1), None))
+                except Exception as e:
+                    output.put((pdf_file, None, e))
+            return
+        
+        in_flight = threading.Semaphore(workers * 2)
+        lock = threading.Lock()
+        
+        def on_done(future, pdf_file, state, index):
             try:
-                self.add_document(str(pdf_file), topics)
-            except Exception as e:
-                print(f"处理文件 {pdf_file.name} 时出错: {e}")
+                try:
+                    state["parts"][index], elapsed = future.result()
+                    metrics.record("pdf.extract", elapsed)
+                except Exception as e:
+                    state["error"] = e
+                with lock:
+                    state["remaining"] -= 1
+                    if state["remaining"]:
+                        return
+                if state["error"] is not None:
+                    output.put((pdf_file, None, state["error"]))
+                else:
+                    pages = [page for part in state["parts"] for page in part]
+                    self._cache_pages(hashes[pdf_file], pages)
+                    output.put((pdf_file, pages, None))
+            finally:
+                in_flight.release()
         
-        print(f"批量整理完成，共处理 {len(pdf_files)} 个文件")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for pdf_file in pdf_files:
+                state, submitted = None, 0
+                try:
+                    cached = self.text_cache.get(hashes[pdf_file], self.extract_mode) if self.text_cache else None
+                    if cached is not None:
+                        metrics.incr("pdf.text_cache_hits")
+                        output.put((pdf_file, cached, None))
+                        continue
+                    
+                    ranges = page_ranges(page_count(str(pdf_file)))
+                    state = {"parts": [None] * len(ranges), "remaining": len(ranges), "error": None}
+                    for index, (start, end) in enumerate(ranges):
+                        in_flight.acquire()
+                        try:
+                            # 在子进程中计时，耗时随结果返回后记录
+                            future = executor.submit(metrics.call_timed, extract_pages, str(pdf_file),
+                                                     self.extract_mode, start, end)
+                        except BaseException:
+                            in_flight.release()
+                            raise
+                        future.add_done_callback(
+                            lambda f, p=pdf_file, st=state, i=index: on_done(f, p, st, i)
+                        )
+                        submitted += 1
+                except Exception as e:
+                    # 读取缓存或页数失败、进程池损坏（如子进程被 OOM 终止后 submit 抛出 BrokenProcessPool）时，
+                    # 该文件以错误输出，消费者按文件数计数，不能少输出；进程池损坏后其余文件同样逐个出错
+                    if state is None:
+                        output.put((pdf_file, None, e))
+                        continue
+                    with lock:
+                        # 未提交的页段不会回调，由这里代为计数；已提交的页段全部完成时由最后一个回调输出
+                        state["error"] = e
+                        state["remaining"] -= len(state["parts"]) - submitted
+                        finished = state["remaining"] == 0
+                    if finished:
+                        output.put((pdf_file, None, e))
     
-    def list_files(self, query: Optional[str] = None) -> List[str]:
+    def _flush_organized(self, docs: List[Dict], topics: List[str], batch_size: int) -> int:
+        """
+        批量索引一批已提取的文档并分类
+        
+        Returns:
+            成功处理的文档数
+        """
+        try:
+            self._index_documents(docs, batch_size=batch_size, topics=topics)
+        except Exception as e:
+            print(f"批量写入 {len(docs)} 个文件时出错: {e}")
+            return 0
+        
+        for doc in docs:
+            pdf_path = Path(doc["metadata"]["file_path"])
+            try:
+                self._place_document(pdf_path, doc["matched_topics"])
+            except Exception as e:
+                print(f"分类文件 {pdf_path.name} 时出错: {e}")
+        return len(docs)
+    
+    def list_files(self, query: Optional[str] = None, topic: Optional[str] = None,
+                   limit: Optional[int] = None, offset: int = 0, where: Optional[Dict] = None) -> List[str]:
         """
         列出相关文件（仅返回文件列表）
         
         Args:
             query: 可选的搜索查询，如果提供则返回相关文件
+            topic: 只列出该主题下的文件（无查询时有效）
+            limit: 最多返回的条数（无查询时有效）
+            offset: 跳过的条数（无查询时有效）
+            where: 元数据过滤条件；无查询时由向量数据库按条件分页读取
             
         Returns:
             文件路径列表
         """
         if query:
-            results = self.search_documents(query, top_k=10)
+            results = self.search_documents(query, top_k=10, where=where)
             return [doc['file_path'] for doc in results]
-        else:
-            # 返回所有已索引的文件
-            all_docs = self.collection.get()
-            return [meta['file_path'] for meta in all_docs['metadatas']]
-
+        if where:
+            records = self.collection.get(where=where, limit=limit, offset=offset or None, include=["metadatas"])
+            return [metadata['file_path'] for metadata in records['metadatas']]
+        # 返回所有已索引的文件
+        return list(self.iter_files(topic=topic, limit=limit, offset=offset))
+    
+    def iter_files(self, topic: Optional[str] = None, limit: Optional[int] = None,
+                   offset: int = 0) -> Iterator[str]:
+        """
+        从路径索引流式列出已索引的文件，不读取向量数据库
+        
+        Args:
+            topic: 只列出该主题下的文件
+            limit: 最多返回的条数
+            offset: 跳过的条数（用于分页）
+        """
+        return self.path_index.iter_paths("document", topic=topic, limit=limit, offset=offset)
+    
+    def count_files(self, topic: Optional[str] = None) -> int:
+        """统计已索引的文件数"""
+        return self.path_index.count("document", topic=topic)
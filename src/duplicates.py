@@ -0,0 +1,140 @@
+"""
+重复图像检测模块
+提供感知哈希（dHash）与分块向量相似度计算，用于在已建立的 CLIP 索引上查找近似重复图像：
+先按感知哈希合并几乎一模一样的图像（重新压缩、缩放过的副本），
+再对每组的代表向量做分块矩阵乘法，找出 CLIP 向量高度相似的图像
+"""
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+HASH_BITS = 64
+
+
+def perceptual_hash(image) -> str:
+    """
+    差值哈希（dHash）
+    
+    将图像缩小为 9x8 的灰度图，逐行比较相邻像素的明暗得到 64 位指纹；
+    缩放、重新压缩后的副本指纹相同或只差几位
+    
+    Args:
+        image: PIL 图像（可以是已缩小的图像）
+    
+    Returns:
+        16 位十六进制字符串
+    """
+    from PIL import Image
+    
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    return np.packbits(pixels[:, 1:] > pixels[:, :-1]).tobytes().hex()
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class DisjointSet:
+    """并查集：把两两相似的图像合并为重复组"""
+    
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+    
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+    
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+    
+    def representatives(self) -> List[int]:
+        """每个集合一个代表（升序）"""
+        return [item for item in range(len(self.parent)) if self.find(item) == item]
+    
+    def groups(self, min_size: int = 2) -> List[List[int]]:
+        """成员数不少于 min_size 的集合"""
+        members = defaultdict(list)
+        for item in range(len(self.parent)):
+            members[self.find(item)].append(item)
+        return [group for group in members.values() if len(group) >= min_size]
+
+
+def hash_pairs(hashes: Sequence[Optional[str]], max_distance: int) -> Iterator[Tuple[int, int]]:
+    """
+    找出感知哈希汉明距离不超过 max_distance 的图像对
+    
+    指纹相同的图像直接成对；其余按分段（max_distance + 1 段）分桶，
+    距离不超过 max_distance 的两个指纹至少有一段完全相同，只需比较同桶的指纹
+    
+    Args:
+        hashes: 每张图像的指纹，缺失的为 None
+        max_distance: 最大汉明距离
+    
+    Yields:
+        (行号, 行号)
+    """
+    by_value: Dict[int, List[int]] = defaultdict(list)
+    for index, value in enumerate(hashes):
+        if value:
+            by_value[int(value, 16)].append(index)
+    for members in by_value.values():
+        for other in members[1:]:
+            yield members[0], other
+    if max_distance <= 0 or len(by_value) < 2:
+        return
+    
+    values = list(by_value)
+    bands = min(max_distance + 1, HASH_BITS)
+    edges = np.linspace(0, HASH_BITS, bands + 1).astype(int)
+    seen = set()
+    for low, high in zip(edges[:-1], edges[1:]):
+        mask = ((1 << int(high - low)) - 1) << int(low)
+        buckets: Dict[int, List[int]] = defaultdict(list)
+        for value in values:
+            buckets[value & mask].append(value)
+        for bucket in buckets.values():
+            for i, a in enumerate(bucket):
+                for b in bucket[i + 1:]:
+                    if (a, b) not in seen and hamming(a, b) <= max_distance:
+                        seen.add((a, b))
+                        yield by_value[a][0], by_value[b][0]
+
+
+def similar_pairs(vectors, rows: Sequence[int], threshold: float,
+                  block_size: int) -> Iterator[Tuple[int, int, float]]:
+    """
+    分块计算余弦相似度，找出相似度不低于 threshold 的向量对
+    
+    每次只把两块（各 block_size 行）读入内存做矩阵乘法，vectors 可以是磁盘上的 memmap，
+    内存占用与向量总数无关
+    
+    Args:
+        vectors: 已归一化的向量矩阵（numpy 数组或 memmap）
+        rows: 参与比较的行号（升序）
+        threshold: 余弦相似度阈值
+        block_size: 每块的行数
+    
+    Yields:
+        (行号, 行号, 相似度)
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    for start in range(0, len(rows), block_size):
+        left_rows = rows[start:start + block_size]
+        left = np.asarray(vectors[left_rows], dtype=np.float32)
+        for other in range(start, len(rows), block_size):
+            right_rows = rows[other:other + block_size]
+            right = left if other == start else np.asarray(vectors[right_rows], dtype=np.float32)
+            scores = left @ right.T
+            hits = np.argwhere(scores >= threshold)
+            if other == start:
+                hits = hits[hits[:, 0] < hits[:, 1]]
+            for i, j in hits:
+                yield int(left_rows[i]), int(right_rows[j]), float(scores[i, j])
@@ -0,0 +1,162 @@
+"""
+元数据过滤模块
+生成结构化元数据字段（主题布尔字段、目录前缀），并把命令行的 --topic / --dir / --where
+条件转换为 Chroma 的 where 子句，使过滤在向量数据库内部完成
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from . import config
+
+
+# 目录前缀字段：dir1 为第一层目录，依次类推
+DIR_KEYS = [f"dir{level}" for level in range(1, config.METADATA_DIR_DEPTH + 1)]
+
+_EXPRESSION = re.compile(r"^\s*([A-Za-z_][\w.-]*)\s*(>=|<=|!=|==|=|>|<)\s*(.*?)\s*$")
+_OPERATORS = {"=": "$eq", "==": "$eq", "!=": "$ne", ">": "$gt", ">=": "$gte", "<": "$lt", "<=": "$lte"}
+_SIZE_UNITS = {"kb": 1 << 10, "mb": 1 << 20, "gb": 1 << 30}
+
+
+def topic_key(topic: str) -> str:
+    """主题对应的布尔字段名"""
+    return f"topic_{topic.strip()}"
+
+
+def topic_metadata(topics: Iterable[str]) -> Dict[str, bool]:
+    """主题布尔字段，如 {"topic_NLP": True}"""
+    return {topic_key(topic): True for topic in topics if topic.strip()}
+
+
+def dir_parts(path) -> List[str]:
+    """
+    路径相对 METADATA_DIR_ROOT 的各层名称
+    
+    相对路径和绝对路径写法不同但指向同一位置时结果相同；
+    不在基准目录下的路径按去掉根（盘符）后的绝对路径拆分
+    """
+    path = Path(os.path.abspath(path))
+    root = Path(os.path.abspath(config.METADATA_DIR_ROOT))
+    try:
+        return list(path.relative_to(root).parts)
+    except ValueError:
+        return [part for part in path.parts if part != path.anchor]
+
+
+def dir_metadata(path) -> Dict[str, str]:
+    """
+    目录前缀字段
+    
+    按文件所在目录相对 METADATA_DIR_ROOT 的各层拆分，超出 METADATA_DIR_DEPTH 的层级忽略；
+    不足的层级填空字符串，保证更新路径时旧的层级会被覆盖
+    """
+    parts = dir_parts(Path(path).parent)
+    return {key: parts[level] if level < len(parts) else "" for level, key in enumerate(DIR_KEYS)}
+
+
+def parse_expression(expression: str) -> Dict:
+    """
+    解析单个过滤条件
+    
+    支持 "字段 运算符 值"（运算符为 = == != > >= < <=）或 Chroma 的 JSON where 子句；
+    数值可带 KB/MB/GB 单位，true/false 解析为布尔值
+    
+    示例: "year>=2020"、"file_size>1MB"、'{"page_count": {"$lt": 20}}'
+    """
+    if expression.strip().startswith("{"):
+        return json.loads(expression)
+    match = _EXPRESSION.match(expression)
+    if not match:
+        raise ValueError(f"无法解析过滤条件: {expression}（格式如 year>=2020）")
+    key, operator, value = match.groups()
+    return {key: {_OPERATORS[operator]: _parse_value(value)}}
+
+
+def _parse_value(value: str):
+    """将字符串值转换为数值、布尔值或去掉引号的字符串"""
+    lowered = value.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    unit = _SIZE_UNITS.get(lowered[-2:]) if len(lowered) > 2 else None
+    number = value[:-2] if unit else value
+    for cast in (int, float):
+        try:
+            parsed = cast(number)
+            return parsed * unit if unit else parsed
+        except ValueError:
+            continue
+    return value.strip("'\"")
+
+
+def dir_filter(prefix: str) -> List[Dict]:
+    """
+    目录前缀条件，如 "images/2024" -> [{"dir1": "images"}, {"dir2": "2024"}]
+    
+    与 dir_metadata 一样按相对 METADATA_DIR_ROOT 的路径拆分，相对路径与绝对路径写法等价
+    """
+    parts = dir_parts(prefix)
+    if not parts:
+        return []
+    if len(parts) > len(DIR_KEYS):
+        raise ValueError(f"目录前缀最多支持 {len(DIR_KEYS)} 层: {prefix}")
+    return [{DIR_KEYS[level]: part} for level, part in enumerate(parts)]
+
+
+def build_where(topic: Optional[str] = None, directory: Optional[str] = None,
+                expressions: Iterable[str] = ()) -> Optional[Dict]:
+    """
+    组合过滤条件为 Chroma where 子句
+    
+    Args:
+        topic: 只保留该主题
+        directory: 只保留该目录前缀下的文件
+        expressions: --where 过滤条件列表
+    
+    Returns:
+        where 子句，没有条件时返回 None
+    """
+    clauses = []
+    if topic:
+        clauses.append({topic_key(topic): True})
+    if directory:
+        clauses.extend(dir_filter(directory))
+    clauses.extend(parse_expression(expression) for expression in expressions)
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    """在本地按 where 子句检查元数据（用于不经过向量数据库的词法检索）"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            if not all(_compare(metadata.get(key), op, value) for op, value in condition.items()):
+                return False
+    return True
+
+
+def _compare(actual, operator: str, expected) -> bool:
+    if operator == "$eq":
+        return actual == expected
+    if operator == "$ne":
+        return actual != expected
+    if operator == "$in":
+        return actual in expected
+    if operator == "$nin":
+        return actual not in expected
+    if actual is None or isinstance(actual, str) != isinstance(expected, str):
+        return False
+    return {"$gt": actual > expected, "$gte": actual >= expected,
+            "$lt": actual < expected, "$lte": actual <= expected}[operator]
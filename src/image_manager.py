@@ -2,56 +2,200 @@
 智能图像管理模块
 支持以文搜图功能
 """
+import json
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict
-from PIL import Image
-import torch
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
-import numpy as np
+from typing import List, Dict, Optional
+
+from . import config, metrics, storage
+from .duplicates import DisjointSet, hash_pairs, perceptual_hash, similar_pairs
+from .filters import dir_metadata
+from .inference import INFERENCE_BACKENDS, load_model
+from .manifest import Manifest, file_digest
+from .path_index import PathIndex, sync_from_collection
+from .query_cache import QueryCache
+from .scanner import DirectoryScanner, scan_files
+
+
+# 支持的图像格式
+VALID_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
+
+
+class _DecodeBudget:
+    """
+    解码内存额度：限制同时存在的全尺寸像素缓冲区总字节数
+
+    多个线程并行解码大图时，超出额度的解码会等待其他解码缩小并释放缓冲区后再开始，
+    使批量索引的峰值内存与图像分辨率、线程数无关
+    """
+    
+    def __init__(self, limit_bytes: int):
+        self.limit = max(1, limit_bytes)
+        self._used = 0
+        self._condition = threading.Condition()
+    
+    @contextmanager
+    def reserve(self, nbytes: int):
+        # 单张超过额度的图像独占全部额度
+        nbytes = min(nbytes, self.limit)
+        with self._condition:
+            while self._used + nbytes > self.limit:
+                self._condition.wait()
+            self._used += nbytes
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._used -= nbytes
+                self._condition.notify_all()
+
+
+_decode_budget = _DecodeBudget(config.IMAGE_DECODE_MEMORY_MB << 20)
+
+
+@metrics.timed("image.decode")
+def decode_image(image_path: str, min_side: int = config.IMAGE_DECODE_SIZE):
+    """
+    解码图像并缩小到模型所需尺寸
+    
+    CLIP 会把最短边缩放到 224 像素，因此解码时就把最短边缩小到 min_side：
+    JPEG 通过 draft 让解码器直接按 1/2、1/4、1/8 输出（不分配全分辨率缓冲区），
+    其他格式解码后先按整数倍快速缩小（reduce）再精细缩放，最后才转换为 RGB
+    
+    Args:
+        image_path: 图像文件路径
+        min_side: 缩放后最短边的像素数
+        
+    Returns:
+        RGB 模式的 PIL 图像，原始尺寸记录在 image.info["original_size"] 中
+    """
+    from PIL import Image
+    
+    with Image.open(image_path) as source:
+        width, height = source.size
+        scale = min_side / min(width, height)
+        if scale >= 1:
+            image = source.convert('RGB')
+        else:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            # 解码到不小于目标尺寸 2 倍的大小，保证后续缩放的质量
+            draft = source.draft('RGB', (size[0] * 2, size[1] * 2))
+            box = draft[1] if draft else None
+            # 按解码后的实际尺寸预留内存额度（每像素按 4 字节估算）
+            with _decode_budget.reserve(source.size[0] * source.size[1] * 4):
+                if source.mode in ('1', 'P'):
+                    # 调色板和二值图像缩放时只能用最近邻插值，先转换为 RGB
+                    source = source.convert('RGB')
+                image = source.resize(size, Image.BICUBIC, box=box, reducing_gap=2.0)
+                source.close()
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+    
+    image.info["original_size"] = (width, height)
+    return image
 
 
 class ImageManager:
     """图像管理器"""
     
-    def __init__(self, image_dir: str = "data/images", db_path: str = "data/chroma_db"):
+    def __init__(self, image_dir: str = config.IMAGES_DIR, db_path: str = config.DB_PATH,
+                 model_name: str = config.IMAGE_MODEL_NAME, manifest_path: Optional[str] = None,
+                 backend: str = config.INFERENCE_BACKEND, threads: int = config.INFERENCE_THREADS):
         """
         初始化图像管理器
         
+        CLIP模型和向量数据库均为延迟加载，首次使用时才会初始化
+        
         Args:
             image_dir: 图像存储目录
             db_path: 向量数据库路径
+            model_name: CLIP模型名称
+            manifest_path: 索引清单路径（默认存放在向量数据库目录中）
+            backend: 推理后端，"torch"、"int8" 或 "onnx"（CLIP 不支持 onnx 时回退到 torch）
+            threads: 推理时算子内并行线程数（0 表示默认）
         """
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"不支持的推理后端: {backend}")
+        
         self.image_dir = Path(image_dir)
         self.image_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.model_name = model_name
+        self.backend = backend
+        self.threads = threads
+        self.manifest_path = manifest_path or os.path.join(db_path, config.MANIFEST_FILE)
         
-        # 初始化CLIP模型
-        print("正在加载CLIP模型...")
-        try:
-            # 使用sentence-transformers的CLIP模型
-            self.model = SentenceTransformer('clip-ViT-B-32')
-            print("CLIP模型加载完成")
-        except Exception as e:
-            print(f"CLIP模型加载失败: {e}")
-            print("尝试使用备用模型...")
-            # 备用方案：使用中文CLIP或其他模型
-            self.model = SentenceTransformer('sentence-transformers/clip-ViT-B-32')
-        
-        # 初始化向量数据库
-        self.client = chromadb.PersistentClient(
-            path=db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        
-        # 获取或创建集合
-        self.collection = self.client.get_or_create_collection(
-            name="images",
-            metadata={"hnsw:space": "cosine"}
-        )
+        self._model = None
+        self._collection = None
+        self._manifest = None
+        self._path_index = None
+        self._query_cache = None
+        # index_images 期间的写缓冲，为 None 时直接写入
+        self._write_buffer = None
+    
+    @property
+    def model(self):
+        """CLIP模型（首次访问时加载）"""
+        if self._model is None:
+            print(f"正在加载CLIP模型（{self.backend}）...")
+            try:
+                # 使用sentence-transformers的CLIP模型
+                self._model = load_model(self.model_name, self.backend, self.threads or None)
+                print("CLIP模型加载完成")
+            except Exception as e:
+                print(f"CLIP模型加载失败: {e}")
+                if self.backend == "onnx":
+                    # CLIP 不是 Transformer 结构，sentence-transformers 的 onnx 后端无法加载
+                    print("尝试使用 torch 后端...")
+                    self._model = load_model(self.model_name, "torch", self.threads or None)
+                else:
+                    print("尝试使用备用模型...")
+                    # 备用方案：使用中文CLIP或其他模型
+                    self._model = load_model(config.IMAGE_MODEL_FALLBACK, self.backend, self.threads or None)
+        return self._model
+    
+    @property
+    def collection(self):
+        """图像向量集合（首次访问时打开数据库，进程内与文献管理器共享客户端）"""
+        if self._collection is None:
+            self._collection = storage.get_collection(self.db_path, "images")
+        return self._collection
+    
+    @property
+    def manifest(self) -> Manifest:
+        """索引清单（首次访问时打开）"""
+        if self._manifest is None:
+            self._manifest = Manifest(self.manifest_path)
+        return self._manifest
+    
+    @property
+    def path_index(self) -> PathIndex:
+        """路径索引（首次访问时打开，旧索引会从向量数据库回填一次）"""
+        if self._path_index is None:
+            path_index = PathIndex(os.path.join(self.db_path, config.PATH_INDEX_FILE))
+            if not path_index.is_synced("image"):
+                sync_from_collection(path_index, "image", self.collection)
+            self._path_index = path_index
+        return self._path_index
+    
+    @property
+    def query_cache(self) -> QueryCache:
+        """查询向量缓存（首次访问时打开）"""
+        if self._query_cache is None:
+            self._query_cache = QueryCache(self.model_key)
+        return self._query_cache
+    
+    @property
+    def model_key(self) -> str:
+        """
+        向量来源标识（模型名称加推理后端），用作查询缓存的键和清单中的模型标识，变化时需要重新嵌入
         
-        print("图像管理器初始化完成")
+        fp32（torch）沿用模型名称本身，与旧的缓存和清单兼容
+        """
+        return self.model_name if self.backend == "torch" else f"{self.model_name}@{self.backend}"
     
     def add_image(self, image_path: str) -> Dict:
         """
@@ -67,34 +211,18 @@ class ImageManager:
         if not image_path.exists():
             raise FileNotFoundError(f"文件不存在: {image_path}")
         
-        # 支持的图像格式
-        valid_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
-        if image_path.suffix.lower() not in valid_extensions:
+        if image_path.suffix.lower() not in VALID_EXTENSIONS:
             raise ValueError(f"不支持的图像格式: {image_path.suffix}")
         
         print(f"正在处理图像: {image_path.name}")
         
         try:
             # 加载图像
-            image = Image.open(image_path).convert('RGB')
-            
-            # 生成图像嵌入向量
-            image_embedding = self.model.encode(image).tolist()
-            
-            # 生成图像ID
-            img_id = f"img_{image_path.stem}_{hash(str(image_path))}"
-            
-            # 存储到向量数据库
-            self.collection.add(
-                embeddings=[image_embedding],
-                documents=[str(image_path)],  # 存储文件路径作为文档
-                metadatas=[{
-                    "file_path": str(image_path),
-                    "file_name": image_path.name,
-                    "file_size": os.path.getsize(image_path)
-                }],
-                ids=[img_id]
-            )
+            image = decode_image(str(image_path))
+            
+            # 生成图像嵌入向量并存储到向量数据库
+            img_id = self._write_images([image_path], [image], [file_digest(str(image_path))])[0]
+            image.close()
             
             print(f"图像已添加: {image_path.name}")
             return {
@@ -105,13 +233,273 @@ class ImageManager:
         except Exception as e:
             raise ValueError(f"处理图像时出错: {e}")
     
-    def search_images(self, query: str, top_k: int = 5) -> List[Dict]:
+    def _image_record(self, image_path: Path, content_hash: str, size: Optional[tuple] = None,
+                      phash: Optional[str] = None, extra: Optional[Dict] = None):
+        """
+        生成图像的ID和元数据
+        
+        Args:
+            image_path: 图像文件路径
+            content_hash: 文件内容哈希
+            size: 原始图像的 (宽, 高)
+            phash: 感知哈希（用于查找重复图像）
+            extra: 附加的元数据（如论文插图的来源论文和页码）
+            
+        Returns:
+            (图像ID, 元数据)
+        """
+        # 图像ID由文件内容决定，同一文件重复添加不会产生重复向量
+        img_id = f"img_{content_hash}"
+        metadata = {
+            "file_path": str(image_path),
+            "file_name": image_path.name,
+            "file_size": os.path.getsize(image_path),
+            **dir_metadata(image_path)
+        }
+        if size:
+            metadata["width"], metadata["height"] = size
+        if phash:
+            metadata["phash"] = phash
+        metadata.update(extra or {})
+        return img_id, metadata
+    
+    def index_images(self, image_files: List[Path], batch_size: int = config.IMAGE_BATCH_SIZE,
+                     workers: Optional[int] = None, show_progress: bool = True,
+                     hashes: Optional[Dict[Path, str]] = None,
+                     extra_metadata: Optional[Dict[Path, Dict]] = None) -> int:
+        """
+        批量索引图像
+        
+        解码和缩放在线程池中进行，并提前解码下一批图像，使解码与模型推理重叠；
+        每批图像一次批量 encode，向量记录经写缓冲合并后批量写入向量数据库
+        
+        Args:
+            image_files: 图像文件列表
+            batch_size: 每批编码的图像数
+            workers: 解码线程数（默认为CPU核数）
+            show_progress: 是否显示进度条
+            hashes: 已计算好的文件内容哈希（未提供的文件在解码线程中计算）
+            extra_metadata: 按文件附加的元数据
+            
+        Returns:
+            成功索引的图像数
+        """
+        from tqdm import tqdm
+        
+        image_files = [Path(f) for f in image_files]
+        hashes = hashes or {}
+        batches = [image_files[i:i + batch_size] for i in range(0, len(image_files), batch_size)]
+        workers = workers or os.cpu_count() or 1
+        success_count = 0
+        
+        # 多批图像的向量记录在写缓冲中合并，攒够后以大批量写入数据库
+        self._write_buffer = storage.WriteBuffer()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor, \
+                    tqdm(total=len(image_files), unit="img", desc="索引图像", disable=not show_progress) as progress:
+                
+                def load(path):
+                    content_hash = hashes.get(path) or file_digest(str(path))
+                    return decode_image(str(path)), content_hash
+                
+                def submit(batch):
+                    return [(path, executor.submit(load, path)) for path in batch]
+                
+                next_batch = submit(batches[0]) if batches else []
+                for index in range(len(batches)):
+                    current = next_batch
+                    # 提前提交下一批的解码任务，与当前批的编码并行
+                    next_batch = submit(batches[index + 1]) if index + 1 < len(batches) else []
+                    
+                    paths, images, content_hashes = [], [], []
+                    for path, future in current:
+                        try:
+                            image, content_hash = future.result()
+                            paths.append(path)
+                            images.append(image)
+                            content_hashes.append(content_hash)
+                        except Exception as e:
+                            progress.write(f"处理文件 {path.name} 时出错: {e}")
+                    
+                    if images:
+                        try:
+                            self._write_images(paths, images, content_hashes, batch_size, extra_metadata)
+                            success_count += len(paths)
+                        except Exception as e:
+                            progress.write(f"批量写入 {len(images)} 张图像时出错: {e}")
+                        finally:
+                            for image in images:
+                                image.close()
+                    progress.update(len(current))
+                self._write_buffer.flush()
+        finally:
+            self._write_buffer = None
+        
+        return success_count
+    
+    def _write_images(self, paths: List[Path], images: List, content_hashes: List[str],
+                      batch_size: int = config.IMAGE_BATCH_SIZE,
+                      extra_metadata: Optional[Dict[Path, Dict]] = None) -> List[str]:
+        """
+        批量编码一批已解码的图像，写入向量数据库并记录到索引清单
+        
+        Returns:
+            每张图像的ID
+        """
+        import numpy as np
+        
+        extra_metadata = extra_metadata or {}
+        records = [self._image_record(path, content_hash, image.info.get("original_size"), perceptual_hash(image),
+                                      extra_metadata.get(path))
+                   for path, image, content_hash in zip(paths, images, content_hashes)]
+        
+        # 清理这些路径上的旧记录：内容已变化的按清单删除旧ID，清单中没有的按路径删除旧版本记录
+        stale, legacy = [], []
+        for path, (img_id, _) in zip(paths, records):
+            entry = self.manifest.get("image", path)
+            if entry is None:
+                legacy.append(str(path))
+            elif entry.item_id != img_id:
+                stale.append(path)
+        if stale:
+            self.remove_images(stale)
+        if legacy:
+            self.collection.delete(where={"file_path": {"$in": legacy}})
+            self.path_index.remove_paths("image", legacy)
+        
+        # 同一批中内容相同的图像只写入一次
+        unique = {}
+        for index, (img_id, _) in enumerate(records):
+            unique.setdefault(img_id, index)
+        keep = list(unique.values())
+        
+        metrics.incr("image.encode_items", len(keep))
+        with metrics.timer("image.encode"):
+            embeddings = self.model.encode([images[i] for i in keep], batch_size=batch_size)
+        write = storage.bulk_upsert if self._write_buffer is None else self._write_buffer.upsert
+        write(
+            self.collection,
+            ids=[records[i][0] for i in keep],
+            embeddings=np.asarray(embeddings, dtype=np.float32),
+            documents=[str(paths[i]) for i in keep],  # 存储文件路径作为文档
+            metadatas=[records[i][1] for i in keep]
+        )
+        
+        def record():
+            self.path_index.upsert("image", [{"item_id": records[i][0], "path": paths[i]} for i in keep])
+            self.manifest.record_many(
+                "image",
+                [(path, content_hash, img_id)
+                 for path, content_hash, (img_id, _) in zip(paths, content_hashes, records)],
+                self.model_key
+            )
+        
+        # 使用写缓冲时，路径索引和清单在向量记录真正写入后再更新
+        if self._write_buffer is not None:
+            self._write_buffer.after_flush(record)
+        else:
+            record()
+        return [img_id for img_id, _ in records]
+    
+    def remove_images(self, paths: List) -> int:
+        """
+        从索引中删除图像（文件已被删除或不再需要索引）
+        
+        内容相同的其他路径仍引用同一图像ID时保留向量，并把记录中的路径改为仍存在的路径
+        
+        Args:
+            paths: 图像文件路径列表
+            
+        Returns:
+            删除的图像数
+        """
+        if self._write_buffer is not None:
+            # 先写入缓冲中的记录，避免删除后又被写回
+            self._write_buffer.flush()
+        entries = [self.manifest.get("image", path) for path in paths]
+        self.manifest.remove("image", paths)
+        
+        orphan_ids = []
+        for item_id in sorted({entry.item_id for entry in entries if entry}):
+            remaining = self.manifest.find_by_item("image", item_id)
+            if remaining:
+                self._update_record_path(item_id, Path(remaining[0].path))
+            else:
+                orphan_ids.append(item_id)
+        if orphan_ids:
+            self.collection.delete(ids=orphan_ids)
+            self.path_index.remove_ids("image", orphan_ids)
+        return len(orphan_ids)
+    
+    def _apply_plan(self, plan):
+        """执行增量计划中的移动和删除操作"""
+        for entry, new_path in plan.moved:
+            # 内容未变只更新路径，不重新嵌入
+            self._update_record_path(entry.item_id, new_path)
+            self.manifest.remove("image", [entry.path])
+            self.manifest.record("image", new_path, entry.content_hash, entry.model, entry.item_id)
+        if plan.deleted:
+            self.remove_images([entry.path for entry in plan.deleted])
+    
+    def apply_changes(self, files: List[Path], checked: List, batch_size: int = config.IMAGE_BATCH_SIZE,
+                      workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        按文件变化事件增量更新索引（watch 命令使用）
+        
+        Args:
+            files: 新增、修改或移入的图像文件
+            checked: 需要检测删除的文件或目录，见 Manifest.plan_changes
+            batch_size: 每批编码的图像数
+            workers: 解码线程数
+            
+        Returns:
+            {"new": 新索引的图像数, "moved": 移动数, "deleted": 删除数}
+        """
+        plan = self.manifest.plan_changes("image", files, checked, self.model_key)
+        self._apply_plan(plan)
+        hashes = dict(plan.new)
+        success_count = 0
+        if hashes:
+            success_count = self.index_images(list(hashes), batch_size=batch_size, workers=workers,
+                                              show_progress=False, hashes=hashes)
+        return {"new": success_count, "moved": len(plan.moved), "deleted": len(plan.deleted)}
+    
+    def _update_record_path(self, img_id: str, new_path: Path):
+        """更新图像记录中的文件路径"""
+        self.path_index.update_path("image", img_id, new_path)
+        records = self.collection.get(ids=[img_id], include=["metadatas"])
+        if records["ids"]:
+            self.collection.update(
+                ids=[img_id],
+                metadatas=[{**records["metadatas"][0], "file_path": str(new_path), "file_name": new_path.name,
+                            **dir_metadata(new_path)}]
+            )
+    
+    def encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        批量生成文本查询向量（命中缓存的查询不再编码，其余合并为一次前向计算）
+        
+        Args:
+            queries: 文本查询列表
+            
+        Returns:
+            查询向量列表
+        """
+        return self.query_cache.encode(queries, self._encode_texts)
+    
+    def _encode_texts(self, texts: List[str]) -> List[List[float]]:
+        """编码文本查询（记录编码耗时）"""
+        with metrics.timer("image.encode_text"):
+            return self.model.encode(texts).tolist()
+    
+    def search_images(self, query: str, top_k: int = 5, where: Optional[Dict] = None) -> List[Dict]:
         """
         以文搜图：通过自然语言描述搜索图像
         
         Args:
             query: 文本查询（自然语言描述）
             top_k: 返回最相关的k个结果
+            where: 元数据过滤条件（如 width、height、file_size、目录前缀），在数据库内部过滤
             
         Returns:
             相关图像列表
@@ -119,110 +507,400 @@ class ImageManager:
         print(f"正在搜索图像: {query}")
         
         # 生成文本查询的嵌入向量
-        query_embedding = self.model.encode(query).tolist()
+        query_embedding = self.encode_queries([query])[0]
+        return self.search_by_embedding(query_embedding, top_k=top_k, where=where)
+    
+    def search_batch(self, queries: List[str], top_k: int = 5, where: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        批量以文搜图：所有查询合并为一次批量编码和一次多向量 query
+        
+        Args:
+            queries: 文本查询列表
+            top_k: 每个查询返回的结果数
+            where: 元数据过滤条件（对所有查询生效）
+            
+        Returns:
+            与 queries 一一对应的结果列表
+        """
+        if not queries:
+            return []
+        return self.search_by_embeddings(self.encode_queries(queries), top_k=top_k, where=where)
+    
+    def search_by_embedding(self, query_embedding: List[float], top_k: int = 5,
+                            where: Optional[Dict] = None) -> List[Dict]:
+        """
+        使用已生成的查询向量搜索图像
+        
+        Args:
+            query_embedding: 查询向量
+            top_k: 返回最相关的k个结果
+            where: 元数据过滤条件
+            
+        Returns:
+            相关图像列表
+        """
+        return self.search_by_embeddings([query_embedding], top_k=top_k, where=where)[0]
+    
+    def search_collection(self):
+        """向量检索查询的集合（与文献管理器的同名方法对应）"""
+        return self.collection
+    
+    def search_by_embeddings(self, query_embeddings: List[List[float]], top_k: int = 5,
+                             where: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        使用多个查询向量搜索图像，所有向量以一次 query 调用提交给向量数据库
         
+        Args:
+            query_embeddings: 查询向量列表
+            top_k: 每个查询返回的结果数
+            where: 元数据过滤条件
+            
+        Returns:
+            与 query_embeddings 一一对应的结果列表
+        """
         # 在向量数据库中搜索
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
+        with metrics.timer("db.query"):
+            results = self.collection.query(
+                query_embeddings=[list(embedding) for embedding in query_embeddings],
+                n_results=top_k,
+                where=where
+            )
+        return [self._format_results(results, i) for i in range(len(query_embeddings))]
+    
+    def image_embedding(self, image_path) -> List[float]:
+        """
+        获取图像的 CLIP 向量
+        
+        图像已索引时直接读取向量数据库中存储的向量（未变化的文件只比较大小和修改时间，
+        不读取内容），否则解码并编码
+        
+        Args:
+            image_path: 图像文件路径
+            
+        Returns:
+            图像向量
+        """
+        image_path = Path(image_path)
+        stat = image_path.stat()
+        entry = self.manifest.get("image", image_path)
+        if (entry and entry.model == self.model_key and entry.size == stat.st_size
+                and entry.mtime == stat.st_mtime):
+            img_id = entry.item_id
+        else:
+            # 图像ID由内容决定，内容相同的副本已索引时同样可以复用
+            img_id = f"img_{file_digest(str(image_path))}"
+        stored = self.collection.get(ids=[img_id], include=["embeddings"])
+        if len(stored["ids"]) > 0:
+            return list(stored["embeddings"][0])
+        
+        image = decode_image(str(image_path))
+        try:
+            metrics.incr("image.encode_items")
+            with metrics.timer("image.encode"):
+                return self.model.encode([image])[0].tolist()
+        finally:
+            image.close()
+    
+    def search_similar(self, image_path: str, top_k: int = 5, where: Optional[Dict] = None) -> List[Dict]:
+        """
+        以图搜图：查找与指定图像相似的已索引图像
+        
+        Args:
+            image_path: 图像文件路径（可以未被索引）
+            top_k: 返回最相关的k个结果（不含图像本身）
+            where: 元数据过滤条件
+            
+        Returns:
+            相似图像列表
+        """
+        image_path = Path(image_path)
+        if not image_path.exists():
+            raise FileNotFoundError(f"文件不存在: {image_path}")
+        
+        print(f"正在搜索相似图像: {image_path.name}")
+        embedding = self.image_embedding(image_path)
+        # 多取一个结果，去掉图像本身
+        results = self.search_by_embedding(embedding, top_k=top_k + 1, where=where)
+        key = Manifest.normalize(image_path)
+        return [img for img in results if Manifest.normalize(img["file_path"]) != key][:top_k]
+    
+    def find_duplicates(self, threshold: float = config.DUPLICATE_THRESHOLD,
+                        hash_distance: Optional[int] = config.DUPLICATE_HASH_DISTANCE,
+                        block_size: int = config.DUPLICATE_BLOCK_SIZE, where: Optional[Dict] = None,
+                        workers: Optional[int] = None) -> List[List[Dict]]:
+        """
+        在已建立的索引中查找近似重复的图像
+        
+        1. 感知哈希预过滤：指纹汉明距离不超过 hash_distance 的图像直接归为一组
+           （旧索引中没有指纹的图像会补算并写回）
+        2. 每组取一个代表，对代表的 CLIP 向量分块计算余弦相似度，不低于 threshold 的合并为一组
+        
+        向量分页读出后写入临时的 memmap 文件，每次只有两块向量在内存中，可处理超出内存的索引
+        
+        Args:
+            threshold: CLIP 向量余弦相似度阈值
+            hash_distance: 感知哈希的最大汉明距离，为 None 时不使用感知哈希
+            block_size: 分页读取和分块计算的行数
+            where: 元数据过滤条件（只在符合条件的图像中查找）
+            workers: 补算感知哈希的线程数（默认为CPU核数）
+            
+        Returns:
+            重复组列表（按组大小降序），每组按分辨率和文件大小降序，
+            每张图像带有与组内第一张的相似度 similarity
+        """
+        import tempfile
+        
+        import numpy as np
+        
+        total = self.collection.count()
+        if total < 2:
+            return []
+        
+        print(f"正在读取 {total} 个图像向量...")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ids, metadatas, vectors = [], [], None
+            for offset in range(0, total, block_size):
+                page = self.collection.get(where=where, limit=block_size, offset=offset,
+                                           include=["embeddings", "metadatas"])
+                if len(page["ids"]) == 0:
+                    break
+                block = np.asarray(page["embeddings"], dtype=np.float32)
+                block /= np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(os.path.join(tmp_dir, "embeddings.npy"), mode="w+",
+                                                        dtype=np.float32, shape=(total, block.shape[1]))
+                vectors[len(ids):len(ids) + len(block)] = block
+                ids.extend(page["ids"])
+                metadatas.extend(page["metadatas"])
+            
+            groups = DisjointSet(len(ids))
+            if hash_distance is not None:
+                hashes = self._perceptual_hashes(ids, metadatas, workers)
+                for a, b in hash_pairs(hashes, hash_distance):
+                    groups.union(a, b)
+            
+            representatives = groups.representatives()
+            print(f"正在比较 {len(representatives)} 个图像向量...")
+            for a, b, _ in similar_pairs(vectors, representatives, threshold, block_size):
+                groups.union(a, b)
+            
+            duplicates = []
+            for members in groups.groups():
+                members.sort(key=lambda i: (metadatas[i].get("width", 0) * metadatas[i].get("height", 0),
+                                            metadatas[i].get("file_size", 0)), reverse=True)
+                similarities = np.asarray(vectors[members], dtype=np.float32) @ vectors[members[0]]
+                duplicates.append([{
+                    "file_name": metadatas[i]["file_name"],
+                    "file_path": metadatas[i]["file_path"],
+                    "width": metadatas[i].get("width"),
+                    "height": metadatas[i].get("height"),
+                    "file_size": metadatas[i].get("file_size"),
+                    "similarity": float(similarity),
+                } for i, similarity in zip(members, similarities)])
+            # 关闭 memmap 后才能删除临时文件（Windows）
+            del vectors
+        
+        duplicates.sort(key=len, reverse=True)
+        return duplicates
+    
+    def _perceptual_hashes(self, ids: List[str], metadatas: List[Dict],
+                           workers: Optional[int] = None) -> List[Optional[str]]:
+        """
+        读取记录中的感知哈希，缺失的解码图像补算并写回向量数据库
+        
+        Returns:
+            与 ids 一一对应的指纹，文件已不存在或无法解码的为 None
+        """
+        hashes = [metadata.get("phash") for metadata in metadatas]
+        missing = [i for i, value in enumerate(hashes) if not value and os.path.exists(metadatas[i]["file_path"])]
+        if not missing:
+            return hashes
         
-        # 格式化结果
+        def compute(index):
+            try:
+                image = decode_image(metadatas[index]["file_path"])
+            except Exception:
+                return None
+            try:
+                return perceptual_hash(image)
+            finally:
+                image.close()
+        
+        print(f"正在为 {len(missing)} 张图像计算感知哈希...")
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            for index, value in zip(missing, executor.map(compute, missing)):
+                hashes[index] = value
+        
+        computed = [i for i in missing if hashes[i]]
+        for start in range(0, len(computed), config.DB_WRITE_BATCH_SIZE):
+            batch = computed[start:start + config.DB_WRITE_BATCH_SIZE]
+            self.collection.update(ids=[ids[i] for i in batch], metadatas=[{"phash": hashes[i]} for i in batch])
+        return hashes
+    
+    def _format_results(self, results: Dict, index: int) -> List[Dict]:
+        """
+        格式化向量数据库的查询结果
+        
+        Args:
+            results: collection.query 的返回值
+            index: 第几个查询向量的结果
+            
+        Returns:
+            图像信息列表
+        """
         images = []
-        if results['ids'] and len(results['ids'][0]) > 0:
-            for i in range(len(results['ids'][0])):
+        if results['ids'] and len(results['ids'][index]) > 0:
+            for i in range(len(results['ids'][index])):
+                metadata = results['metadatas'][index][i]
                 img = {
-                    "file_name": results['metadatas'][0][i]['file_name'],
-                    "file_path": results['metadatas'][0][i]['file_path'],
-                    "distance": results['distances'][0][i] if 'distances' in results else None
+                    "file_name": metadata['file_name'],
+                    "file_path": metadata['file_path'],
+                    "distance": results['distances'][index][i] if 'distances' in results else None
                 }
+                if metadata.get('source_paper'):
+                    img["source_paper"] = metadata['source_paper']
+                    img["source_page"] = metadata.get('source_page')
                 images.append(img)
         
         return images
     
-    def batch_index(self, source_dir: str):
+    def _plan_directory(self, source_path: Path, recursive: bool, skip_unchanged_dirs: bool):
+        """
+        单遍扫描目录并对比索引清单，生成增量索引计划
+        
+        Returns:
+            (增量索引计划, 扫描器)；索引完成后应保存扫描器记录的目录状态
+        """
+        previous = self.manifest.load_dir_state("image", source_path) if skip_unchanged_dirs else None
+        scanner = DirectoryScanner(VALID_EXTENSIONS, recursive=recursive, previous_state=previous)
+        plan = self.manifest.plan("image", scanner.scan(source_path), self.model_key, root=source_path,
+                                  recursive=recursive, skipped_dirs=scanner.skipped_dirs)
+        self._apply_plan(plan)
+        return plan, scanner
+    
+    def batch_index(self, source_dir: str, batch_size: int = config.IMAGE_BATCH_SIZE,
+                    workers: Optional[int] = None, skip_unchanged_dirs: bool = False):
         """
         批量索引文件夹中的所有图像
         
         Args:
             source_dir: 源文件夹路径
+            batch_size: 每批编码的图像数
+            workers: 解码线程数
+            skip_unchanged_dirs: 跳过修改时间与上次扫描相同的目录
         """
         source_path = Path(source_dir)
         if not source_path.exists():
             raise FileNotFoundError(f"目录不存在: {source_dir}")
         
-        # 支持的图像格式
-        valid_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
-        image_files = []
-        for ext in valid_extensions:
-            image_files.extend(source_path.glob(f"*{ext}"))
-            image_files.extend(source_path.glob(f"*{ext.upper()}"))
-        
-        print(f"找到 {len(image_files)} 个图像文件")
+        # 扫描并对比索引清单，只处理新增或内容变化的文件
+        plan, scanner = self._plan_directory(source_path, False, skip_unchanged_dirs)
+        print(f"找到 {plan.scanned} 个图像文件")
+        print(f"新增或变化 {len(plan.new)} 个，未变化 {plan.unchanged} 个，"
+              f"移动 {len(plan.moved)} 个，删除 {len(plan.deleted)} 个")
         
-        success_count = 0
-        for image_file in image_files:
-            try:
-                self.add_image(str(image_file))
-                success_count += 1
-            except Exception as e:
-                print(f"处理文件 {image_file.name} 时出错: {e}")
+        hashes = dict(plan.new)
+        success_count = self.index_images(list(hashes), batch_size=batch_size, workers=workers, hashes=hashes)
+        self.manifest.save_dir_state("image", source_path, scanner.state)
         
-        print(f"批量索引完成，共处理 {success_count}/{len(image_files)} 个文件")
+        print(f"批量索引完成，共处理 {success_count}/{len(hashes)} 个文件")
     
-    def batch_process_images_dir(self, recursive: bool = True, source_dir: str = "images"):
+    def batch_process_images_dir(self, recursive: bool = True, source_dir: str = "images",
+                                 batch_size: int = config.IMAGE_BATCH_SIZE,
+                                 workers: Optional[int] = None, skip_unchanged_dirs: bool = False):
         """
         批量处理 ./images 目录中的所有图像
         
         Args:
             recursive: 是否递归处理子目录（默认True）
             source_dir: 源目录路径（默认 "images"，与 data 目录同级）
+            batch_size: 每批编码的图像数
+            workers: 解码线程数
+            skip_unchanged_dirs: 跳过修改时间与上次扫描相同的目录
         """
         source_path = Path(source_dir)
         if not source_path.exists():
             raise FileNotFoundError(f"图像目录不存在: {source_path}")
         
-        # 支持的图像格式
-        valid_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
-        image_files = []
-        
-        if recursive:
-            # 递归搜索所有子目录
-            for ext in valid_extensions:
-                image_files.extend(source_path.rglob(f"*{ext}"))
-                image_files.extend(source_path.rglob(f"*{ext.upper()}"))
-        else:
-            # 只搜索当前目录
-            for ext in valid_extensions:
-                image_files.extend(source_path.glob(f"*{ext}"))
-                image_files.extend(source_path.glob(f"*{ext.upper()}"))
-        
-        # 过滤掉已经索引的文件（通过检查向量数据库）
-        existing_files = set()
-        try:
-            all_docs = self.collection.get()
-            existing_files = {meta['file_path'] for meta in all_docs['metadatas']}
-        except:
-            pass
-        
-        # 只处理未索引的文件
-        new_files = [f for f in image_files if str(f) not in existing_files]
+        # 扫描并对比索引清单，只处理新增或内容变化的文件，同时处理移动和删除
+        plan, scanner = self._plan_directory(source_path, recursive, skip_unchanged_dirs)
+        hashes = dict(plan.new)
+        new_files = list(hashes)
         
-        print(f"在 {source_path} 目录中找到 {len(image_files)} 个图像文件")
-        if existing_files:
-            print(f"其中 {len(new_files)} 个文件尚未索引，将进行批量处理")
+        skipped = f"，跳过 {len(scanner.skipped_dirs)} 个未变化的目录" if scanner.skipped_dirs else ""
+        print(f"在 {source_path} 目录中找到 {plan.scanned} 个图像文件{skipped}")
+        print(f"其中 {len(new_files)} 个文件尚未索引或已变化，将进行批量处理"
+              f"（移动 {len(plan.moved)} 个，删除 {len(plan.deleted)} 个）")
         
         if not new_files:
+            self.manifest.save_dir_state("image", source_path, scanner.state)
             print("所有文件已索引，无需处理")
             return
         
-        success_count = 0
-        for image_file in new_files:
-            try:
-                self.add_image(str(image_file))
-                success_count += 1
-            except Exception as e:
-                print(f"处理文件 {image_file.name} 时出错: {e}")
+        success_count = self.index_images(new_files, batch_size=batch_size, workers=workers, hashes=hashes)
+        self.manifest.save_dir_state("image", source_path, scanner.state)
         
         print(f"批量处理完成，共处理 {success_count}/{len(new_files)} 个文件")
-
+    
+    def index_paper_figures(self, source_dir: str, batch_size: int = config.IMAGE_BATCH_SIZE,
+                            workers: Optional[int] = None, min_side: int = config.FIGURE_MIN_SIDE) -> int:
+        """
+        提取文件夹中PDF的插图并建立 CLIP 索引，使论文插图可以与图片一起检索
+        
+        插图保存在 FIGURES_DIR/<PDF内容哈希>/ 下，已提取过的PDF直接复用；
+        插图记录的元数据带有来源论文（source_paper）和页码（source_page）
+        
+        Args:
+            source_dir: 论文文件夹路径（递归扫描）
+            batch_size: 每批编码的图像数
+            workers: 并行提取插图的进程数（默认为CPU核数）
+            min_side: 短边小于该像素数的插图不提取
+            
+        Returns:
+            新索引的插图数
+        """
+        from .pdf_extract import extract_figures
+        
+        source_path = Path(source_dir)
+        if not source_path.exists():
+            raise FileNotFoundError(f"目录不存在: {source_dir}")
+        
+        pdf_files = list(scan_files(source_path, [".pdf"]))
+        targets = {pdf: Path(config.FIGURES_DIR) / file_digest(str(pdf))[:16] for pdf in pdf_files}
+        # 内容相同的PDF只提取一次
+        pending = list({directory: pdf for pdf, directory in targets.items()
+                        if not (directory / "figures.json").exists()}.values())
+        print(f"找到 {len(pdf_files)} 个PDF文件，其中 {len(pending)} 个需要提取插图")
+        
+        if pending:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {pdf: executor.submit(extract_figures, str(pdf), str(targets[pdf]), min_side)
+                           for pdf in pending}
+                for pdf, future in futures.items():
+                    try:
+                        figures = future.result()
+                    except Exception as e:
+                        print(f"提取 {pdf.name} 的插图时出错: {e}")
+                        continue
+                    # 提取完成后才写入插图列表，中断的PDF下次重新提取
+                    listing = [(os.path.basename(path), page) for path, page in figures]
+                    (targets[pdf] / "figures.json").write_text(json.dumps(listing), encoding="utf-8")
+        
+        extra_metadata = {}
+        for pdf, directory in targets.items():
+            listing_path = directory / "figures.json"
+            if not listing_path.exists():
+                continue
+            for name, page in json.loads(listing_path.read_text(encoding="utf-8")):
+                figure = directory / name
+                if self.manifest.get("image", figure) is None:
+                    extra_metadata[figure] = {"source_paper": str(pdf), "source_page": page}
+        
+        print(f"共 {len(extra_metadata)} 张新插图需要索引")
+        if not extra_metadata:
+            return 0
+        success_count = self.index_images(list(extra_metadata), batch_size=batch_size, workers=workers,
+                                          extra_metadata=extra_metadata)
+        print(f"插图索引完成，共处理 {success_count}/{len(extra_metadata)} 张")
+        return success_count
@@ -0,0 +1,174 @@
+"""
+推理后端模块
+为文本嵌入模型（MiniLM）和 CLIP 模型提供可选择的 CPU 推理后端：
+- torch: fp32 PyTorch（默认）
+- int8: 对 Linear 层做动态 int8 量化的 PyTorch，体积更小、CPU 上更快
+- onnx: ONNX Runtime（需要安装 sentence-transformers[onnx]，仅支持 Transformer 结构的文本模型）
+并提供与 fp32 向量的一致性检查和各后端的延迟/吞吐量基准测试
+"""
+import time
+import warnings
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import config
+
+
+INFERENCE_BACKENDS = ("torch", "int8", "onnx")
+
+# 一致性检查和基准测试使用的固定文本样本
+PARITY_TEXTS = [
+    "Attention is all you need: the Transformer architecture relies entirely on self-attention.",
+    "Deep residual learning for image recognition with ResNet-50.",
+    "BERT: pre-training of deep bidirectional transformers for language understanding.",
+    "Proximal policy optimization algorithms for reinforcement learning.",
+    "A survey of retrieval-augmented generation for large language models.",
+    "Convolutional neural networks for sentence classification.",
+    "Denoising diffusion probabilistic models generate high quality images.",
+    "Graph neural networks: a review of methods and applications.",
+    "基于深度学习的中文命名实体识别方法研究",
+    "注意力机制在机器翻译中的应用",
+    "海边的日落",
+    "一只可爱的小狗在草地上奔跑",
+    "Contrastive language-image pre-training learns transferable visual models.",
+    "Efficient estimation of word representations in vector space.",
+    "Scaling laws for neural language models.",
+    "Mastering the game of Go with deep neural networks and tree search.",
+]
+
+
+def load_model(model_name: str, backend: str = "torch", threads: Optional[int] = None):
+    """
+    按指定后端加载 SentenceTransformer 模型（均在 CPU 上运行的后端）
+    
+    Args:
+        model_name: 模型名称或本地路径
+        backend: 推理后端，见 INFERENCE_BACKENDS
+        threads: 算子内并行线程数，为 None 时使用库的默认值
+    
+    Returns:
+        SentenceTransformer 模型
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"不支持的推理后端: {backend}（可选: {', '.join(INFERENCE_BACKENDS)}）")
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    if threads:
+        torch.set_num_threads(threads)
+    
+    if backend == "onnx":
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("onnx 后端需要安装 ONNX Runtime 和 Optimum: pip install sentence-transformers[onnx]")
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        return SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                   model_kwargs={"provider": "CPUExecutionProvider",
+                                                 "session_options": session_options})
+    
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    
+    # 动态量化只支持 CPU，权重量化为 int8，激活在推理时按批量化
+    model = SentenceTransformer(model_name, device="cpu")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def parity_images(count: int = 8, size: int = 224) -> List:
+    """生成固定的合成图像样本（渐变与色块），用于 CLIP 后端的一致性检查"""
+    from PIL import Image
+    
+    rng = np.random.default_rng(0)
+    images = []
+    for index in range(count):
+        gradient = np.linspace(0, 255, size, dtype=np.float32)
+        channels = [np.outer(gradient, np.ones(size)), np.outer(np.ones(size), gradient),
+                    np.full((size, size), 255.0 * index / max(1, count - 1))]
+        array = np.stack(channels, axis=-1)
+        x, y = rng.integers(0, size // 2, size=2)
+        array[y:y + size // 3, x:x + size // 3] = rng.integers(0, 256, size=3)
+        images.append(Image.fromarray(array.astype(np.uint8)))
+    return images
+
+
+def cosine_parity(reference, candidate) -> Dict[str, float]:
+    """
+    逐行计算两组向量的余弦相似度
+    
+    Args:
+        reference: fp32 后端生成的向量，形状为 (样本数, 维度)
+        candidate: 待检查后端生成的向量
+    
+    Returns:
+        {"min": 最小相似度, "mean": 平均相似度}
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosines = (reference * candidate).sum(axis=1) / np.where(norms > 0, norms, 1)
+    return {"min": float(cosines.min()), "mean": float(cosines.mean())}
+
+
+def benchmark_backends(model_name: str, backends: List[str], samples: List,
+                       threads: Optional[int] = None, batch_size: int = config.ENCODE_BATCH_SIZE,
+                       repeats: int = 5, threshold: float = config.INFERENCE_PARITY_THRESHOLD) -> List[Dict]:
+    """
+    对比各推理后端的延迟、吞吐量以及与 fp32 向量的一致性
+    
+    Args:
+        model_name: 模型名称
+        backends: 待测试的后端列表
+        samples: 固定样本（文本或 PIL 图像）
+        threads: 算子内并行线程数
+        batch_size: 吞吐量测试的批大小
+        repeats: 单条延迟测试的重复次数（取中位数）
+        threshold: 最小余弦相似度阈值，低于该值视为不一致
+    
+    Returns:
+        每个后端一项：load_s（加载耗时）、latency_ms（单条编码延迟）、throughput（条/秒）、
+        parity_min / parity_mean（与 fp32 的余弦相似度）、passed；加载失败时只有 error
+    """
+    start = time.perf_counter()
+    reference_model = load_model(model_name, "torch", threads)
+    reference_load_s = time.perf_counter() - start
+    reference = reference_model.encode(samples, batch_size=batch_size)
+    
+    report = []
+    for backend in backends:
+        start = time.perf_counter()
+        try:
+            model = reference_model if backend == "torch" else load_model(model_name, backend, threads)
+        except Exception as e:
+            report.append({"backend": backend, "error": str(e)})
+            continue
+        load_s = reference_load_s if backend == "torch" else time.perf_counter() - start
+        
+        # 预热一次，避免首次调用的初始化开销计入延迟
+        model.encode(samples[:1])
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.encode(samples[:1])
+            latencies.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        embeddings = model.encode(samples, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        
+        parity = cosine_parity(reference, embeddings)
+        report.append({
+            "backend": backend,
+            "load_s": load_s,
+            "latency_ms": float(np.median(latencies)) * 1000,
+            "throughput": len(samples) / elapsed if elapsed > 0 else float("inf"),
+            "parity_min": parity["min"],
+            "parity_mean": parity["mean"],
+            "passed": parity["min"] >= threshold,
+        })
+    return report
@@ -0,0 +1,323 @@
+"""
+词法索引模块
+基于 SQLite 的 BM25 倒排索引，按文本块建立倒排表，用于精确匹配作者名、缩写、模型名等词项；
+查询只读取 SQLite，不需要加载嵌入模型，也不需要打开向量数据库。
+文本已保存在文本存储中的块只记录其ID，摘要从文本存储读取，不再保存第二份文本
+"""
+import json
+import math
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from . import config, metrics
+from .filters import dir_metadata, matches
+
+
+# 英文词项（保留 "resnet-50"、"gpt-4.5" 这类带连接符的整体，同时拆出各部分）与中日韩文字
+_TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:[-_.][0-9a-z]+)*|[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]+")
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]")
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    将文本切分为词项
+    
+    英文转为小写，带连接符的词同时保留整体与各部分；中日韩文字切分为相邻二字组
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if _CJK_PATTERN.match(token):
+            tokens.extend(token[i:i + 2] for i in range(max(1, len(token) - 1)))
+            continue
+        tokens.append(token)
+        parts = re.split(r"[-_.]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 倒排索引"""
+    
+    def __init__(self, db_path: str, text_store=None):
+        """
+        初始化词法索引
+        
+        Args:
+            db_path: SQLite 数据库文件路径
+            text_store: 文本存储，用于读取带有 item_id 的文本块的摘要
+        """
+        self.text_store = text_store
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS docs (
+                    doc_id TEXT PRIMARY KEY,
+                    file_path TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    topics TEXT NOT NULL,
+                    metadata TEXT NOT NULL DEFAULT '{}'
+                );
+                CREATE TABLE IF NOT EXISTS units (
+                    unit_id INTEGER PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    page INTEGER,
+                    length INTEGER NOT NULL,
+                    text BLOB NOT NULL,
+                    item_id TEXT
+                );
+                CREATE INDEX IF NOT EXISTS units_doc ON units (doc_id);
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    unit_id INTEGER NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, unit_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_unit ON postings (unit_id);
+                CREATE TABLE IF NOT EXISTS synced (
+                    name TEXT PRIMARY KEY
+                );
+                """
+            )
+            # 旧版本的 docs 表没有 metadata 列
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(docs)")]
+            if "metadata" not in columns:
+                self._conn.execute("ALTER TABLE docs ADD COLUMN metadata TEXT NOT NULL DEFAULT '{}'")
+            # 旧版本的 units 表没有 item_id 列，其中的文本块仍从 text 列读取
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(units)")]
+            if "item_id" not in columns:
+                self._conn.execute("ALTER TABLE units ADD COLUMN item_id TEXT")
+    
+    def is_synced(self) -> bool:
+        """是否已从向量数据库完成过一次全量回填"""
+        return self._conn.execute("SELECT 1 FROM synced WHERE name = 'documents'").fetchone() is not None
+    
+    def mark_synced(self):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO synced (name) VALUES ('documents')")
+    
+    @metrics.timed("lexical.write")
+    def upsert(self, doc_id: str, metadata: Dict, chunks: List[Dict]):
+        """
+        写入或替换一篇文档的倒排记录
+        
+        Args:
+            doc_id: 文档ID
+            metadata: 文档元数据（file_path、file_name、topics 及用于过滤的结构化字段）
+            chunks: 文本块列表，每项包含 text 和 page；
+                带有 item_id（文本存储中的记录ID）的块不在词法索引中保存文本
+        """
+        with self._lock, self._conn:
+            self._delete(doc_id)
+            self._conn.execute(
+                "INSERT INTO docs (doc_id, file_path, file_name, topics, metadata) VALUES (?, ?, ?, ?, ?)",
+                (doc_id, metadata["file_path"], metadata["file_name"], metadata.get("topics", ""),
+                 json.dumps(metadata, ensure_ascii=False))
+            )
+            for chunk in chunks:
+                counts = Counter(tokenize(chunk["text"]))
+                if not counts:
+                    continue
+                item_id = chunk.get("item_id")
+                unit_id = self._conn.execute(
+                    "INSERT INTO units (doc_id, page, length, text, item_id) VALUES (?, ?, ?, ?, ?)",
+                    (doc_id, chunk.get("page"), sum(counts.values()),
+                     b"" if item_id else zlib.compress(chunk["text"].encode("utf-8")), item_id)
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO postings (term, unit_id, tf) VALUES (?, ?, ?)",
+                    [(term, unit_id, tf) for term, tf in counts.items()]
+                )
+    
+    def remove(self, doc_ids: Iterable[str]):
+        """删除文档的倒排记录"""
+        with self._lock, self._conn:
+            for doc_id in doc_ids:
+                self._delete(doc_id)
+    
+    def remove_paths(self, paths: Iterable):
+        """按文件路径删除文档"""
+        paths = [str(path) for path in paths]
+        doc_ids = [row[0] for path in paths for row in self._conn.execute(
+            "SELECT doc_id FROM docs WHERE file_path = ?", (path,)
+        )]
+        self.remove(doc_ids)
+    
+    def update_path(self, doc_id: str, path: Path):
+        """更新文档的文件路径"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT metadata FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+            metadata = {**json.loads(row[0]), "file_path": str(path), "file_name": path.name,
+                        **dir_metadata(path)} if row else {}
+            self._conn.execute(
+                "UPDATE docs SET file_path = ?, file_name = ?, metadata = ? WHERE doc_id = ?",
+                (str(path), path.name, json.dumps(metadata, ensure_ascii=False), doc_id)
+            )
+    
+    def _delete(self, doc_id: str):
+        unit_ids = [(row[0],) for row in self._conn.execute("SELECT unit_id FROM units WHERE doc_id = ?", (doc_id,))]
+        self._conn.executemany("DELETE FROM postings WHERE unit_id = ?", unit_ids)
+        self._conn.execute("DELETE FROM units WHERE doc_id = ?", (doc_id,))
+        self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+    
+    @metrics.timed("lexical.search")
+    def search(self, query: str, top_k: int = 5, where: Optional[Dict] = None) -> List[Dict]:
+        """
+        BM25 检索，按文档聚合（取文档中得分最高的文本块）
+        
+        文本块数不少于 LEXICAL_DF_MIN_UNITS 时，跳过出现在超过 LEXICAL_MAX_DF_RATIO 比例文本块中的词项，
+        常见词不再读取几乎整张倒排表
+        
+        Args:
+            query: 查询文本
+            top_k: 返回的文档数
+            where: 元数据过滤条件（与向量检索相同的 where 子句），在本地按文档元数据检查
+        
+        Returns:
+            文档列表，格式与向量检索结果一致，score 为 BM25 得分
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            total, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM units").fetchone()
+            if not total:
+                return []
+            
+            frequencies = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({', '.join('?' * len(terms))}) GROUP BY term",
+                terms
+            ))
+            terms = [term for term in terms if term in frequencies]
+            if total >= config.LEXICAL_DF_MIN_UNITS:
+                limit = total * config.LEXICAL_MAX_DF_RATIO
+                terms = ([term for term in terms if frequencies[term] <= limit]
+                         or sorted(terms, key=frequencies.get)[:1])
+            
+            scores: Dict[int, float] = {}
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT postings.unit_id, postings.tf, units.length FROM postings "
+                    "JOIN units ON units.unit_id = postings.unit_id WHERE postings.term = ?", (term,)
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+                for unit_id, tf, length in rows:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[unit_id] = scores.get(unit_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            
+            best: Dict[str, tuple] = {}
+            allowed: Dict[str, bool] = {}
+            for unit_id, score in sorted(scores.items(), key=lambda item: -item[1]):
+                doc_id, page, text, item_id = self._conn.execute(
+                    "SELECT doc_id, page, text, item_id FROM units WHERE unit_id = ?", (unit_id,)
+                ).fetchone()
+                if where and doc_id not in allowed:
+                    metadata = self._conn.execute("SELECT metadata FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+                    allowed[doc_id] = metadata is not None and matches(json.loads(metadata[0]), where)
+                if where and not allowed[doc_id]:
+                    continue
+                if doc_id not in best:
+                    best[doc_id] = (score, page, text, item_id)
+                    if len(best) >= top_k:
+                        break
+            
+            item_ids = [item_id for _, _, _, item_id in best.values() if item_id]
+            stored = self.text_store.get(item_ids) if item_ids and self.text_store else {}
+            documents = []
+            for doc_id, (score, page, text, item_id) in best.items():
+                file_path, file_name, topics = self._conn.execute(
+                    "SELECT file_path, file_name, topics FROM docs WHERE doc_id = ?", (doc_id,)
+                ).fetchone()
+                text = stored.get(item_id, "") if item_id else zlib.decompress(text).decode("utf-8")
+                documents.append({
+                    "file_name": file_name,
+                    "file_path": file_path,
+                    "topics": topics,
+                    "distance": None,
+                    "score": score,
+                    "page": page,
+                    "snippet": text[:200] + "..." if len(text) > 200 else text
+                })
+        return documents
+    
+    def close(self):
+        self._conn.close()
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], top_k: int, k: int = config.RRF_K) -> List[Dict]:
+    """
+    倒数排名融合：文档得分为其在各路结果中 1 / (k + 排名) 之和
+    
+    同一文件以最先出现的结果为准（保留其摘要和页码），score 为融合得分
+    
+    Args:
+        rankings: 多路检索结果，每路按相关度从高到低排列
+        top_k: 返回的文档数
+        k: 平滑常数
+    
+    Returns:
+        融合后的文档列表
+    """
+    fused: Dict[str, Dict] = {}
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = doc["file_path"]
+            fused.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused, key=lambda key: -scores[key])[:top_k]
+    return [{**fused[key], "score": scores[key]} for key in ordered]
+
+
+def sync_from_collections(lexical_index: LexicalIndex, collection, chunk_collection, text_store=None,
+                          page_size: int = config.DB_WRITE_BATCH_SIZE):
+    """
+    从向量数据库分页回填词法索引（旧版本建立的索引只需执行一次）
+    
+    块级索引的文档使用文本块集合中的块文本，其余文档使用文档集合中保存的文本；
+    从文本存储读取的文本只记录其ID
+    
+    Args:
+        lexical_index: 词法索引
+        collection: 文档集合
+        chunk_collection: 文本块集合
+        text_store: 文本单独存放时的文本存储（记录中没有文本时从中读取）
+        page_size: 每页读取的记录数
+    """
+    def units(page):
+        """记录的 (文本, 文本存储中的ID)，文本保存在记录中时ID为 None"""
+        documents = page["documents"] or [None] * len(page["ids"])
+        stored = text_store.get(item_id for item_id, text in zip(page["ids"], documents)
+                                if text is None) if text_store else {}
+        return [(stored[item_id], item_id) if text is None and item_id in stored else (text or "", None)
+                for item_id, text in zip(page["ids"], documents)]
+    
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas", "documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for doc_id, metadata, (text, item_id) in zip(page["ids"], page["metadatas"], units(page)):
+            chunks = []
+            if metadata.get("chunk_count"):
+                records = chunk_collection.get(where={"doc_id": doc_id}, include=["metadatas", "documents"])
+                chunks = [{"text": chunk_text, "page": chunk_meta.get("page"), "item_id": chunk_id}
+                          for chunk_meta, (chunk_text, chunk_id) in zip(records["metadatas"], units(records))]
+            lexical_index.upsert(doc_id, metadata, chunks or [{"text": text, "page": None, "item_id": item_id}])
+        offset += len(page["ids"])
+    lexical_index.mark_synced()
@@ -0,0 +1,302 @@
+"""
+索引清单模块
+基于 SQLite 记录每个已索引文件的 (路径, 大小, 修改时间, 内容哈希, 模型)，
+用于生成稳定的内容ID，并在重复索引时只处理新增或变化的文件
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    流式计算文件内容哈希（BLAKE2b，128 位）
+    
+    Args:
+        path: 文件路径
+        chunk_size: 每次读取的字节数
+    
+    Returns:
+        32 位十六进制哈希字符串
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    """清单中的一条文件记录"""
+    path: str
+    size: int
+    mtime: float
+    content_hash: str
+    model: str
+    item_id: str
+
+
+@dataclass
+class IndexPlan:
+    """一次增量索引需要执行的操作"""
+    # 需要（重新）提取和嵌入的文件: (路径, 内容哈希)
+    new: List[Tuple[Path, str]] = field(default_factory=list)
+    # 内容未变但路径变化的文件: (旧记录, 新路径)
+    moved: List[Tuple[ManifestEntry, Path]] = field(default_factory=list)
+    # 已不存在、需要清理的记录
+    deleted: List[ManifestEntry] = field(default_factory=list)
+    # 列举后、读取前已消失的文件（由删除检测处理）
+    vanished: List[Path] = field(default_factory=list)
+    # 无需处理的文件数
+    unchanged: int = 0
+    # 本次扫描到的文件数
+    scanned: int = 0
+
+
+class Manifest:
+    """索引清单"""
+    
+    def __init__(self, db_path: str):
+        """
+        初始化索引清单
+        
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS files (
+                    kind TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    PRIMARY KEY (kind, path)
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS files_hash ON files (kind, content_hash)"
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS scan_dirs (
+                    kind TEXT NOT NULL,
+                    root TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    mtime REAL NOT NULL,
+                    subdirs TEXT NOT NULL,
+                    PRIMARY KEY (kind, root, path)
+                )"""
+            )
+    
+    @staticmethod
+    def normalize(path) -> str:
+        """清单中统一使用绝对路径作为键"""
+        return os.path.abspath(str(path))
+    
+    def get(self, kind: str, path) -> Optional[ManifestEntry]:
+        """按路径查询记录"""
+        row = self._conn.execute(
+            "SELECT path, size, mtime, content_hash, model, item_id FROM files WHERE kind = ? AND path = ?",
+            (kind, self.normalize(path))
+        ).fetchone()
+        return ManifestEntry(*row) if row else None
+    
+    def find_by_hash(self, kind: str, content_hash: str) -> List[ManifestEntry]:
+        """按内容哈希查询记录（同一内容可能对应多个路径）"""
+        rows = self._conn.execute(
+            "SELECT path, size, mtime, content_hash, model, item_id FROM files WHERE kind = ? AND content_hash = ?",
+            (kind, content_hash)
+        ).fetchall()
+        return [ManifestEntry(*row) for row in rows]
+    
+    def entries_under(self, kind: str, root, recursive: bool = True) -> List[ManifestEntry]:
+        """列出某个目录下的所有记录"""
+        root = self.normalize(root).rstrip(os.sep) + os.sep
+        rows = self._conn.execute(
+            "SELECT path, size, mtime, content_hash, model, item_id FROM files "
+            "WHERE kind = ? AND substr(path, 1, ?) = ?",
+            (kind, len(root), root)
+        ).fetchall()
+        entries = [ManifestEntry(*row) for row in rows]
+        if not recursive:
+            entries = [e for e in entries if os.path.dirname(e.path) == root.rstrip(os.sep)]
+        return entries
+    
+    def record(self, kind: str, path, content_hash: str, model: str, item_id: str):
+        """写入或更新一条记录（大小和修改时间取自当前文件）"""
+        self.record_many(kind, [(path, content_hash, item_id)], model)
+    
+    def record_many(self, kind: str, items: Iterable[Tuple[object, str, str]], model: str):
+        """
+        批量写入记录
+        
+        Args:
+            kind: 记录类型（"document" 或 "image"）
+            items: (路径, 内容哈希, 条目ID) 列表
+            model: 生成嵌入所用的模型标识
+        """
+        rows = []
+        for path, content_hash, item_id in items:
+            stat = os.stat(path)
+            rows.append((kind, self.normalize(path), stat.st_size, stat.st_mtime,
+                         content_hash, model, item_id))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (kind, path, size, mtime, content_hash, model, item_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def remove(self, kind: str, paths: Iterable):
+        """删除记录"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM files WHERE kind = ? AND path = ?",
+                [(kind, self.normalize(path)) for path in paths]
+            )
+    
+    def find_by_item(self, kind: str, item_id: str) -> List[ManifestEntry]:
+        """查询仍引用某个条目ID的所有记录"""
+        rows = self._conn.execute(
+            "SELECT path, size, mtime, content_hash, model, item_id FROM files WHERE kind = ? AND item_id = ?",
+            (kind, item_id)
+        ).fetchall()
+        return [ManifestEntry(*row) for row in rows]
+    
+    def load_dir_state(self, kind: str, root) -> Dict[str, Tuple[float, List[str]]]:
+        """读取上次扫描 root 时记录的目录状态 {目录: (修改时间, [子目录名])}"""
+        rows = self._conn.execute(
+            "SELECT path, mtime, subdirs FROM scan_dirs WHERE kind = ? AND root = ?",
+            (kind, self.normalize(root))
+        )
+        return {path: (mtime, json.loads(subdirs)) for path, mtime, subdirs in rows}
+    
+    def save_dir_state(self, kind: str, root, state: Dict[str, Tuple[float, List[str]]]):
+        """用本次扫描的目录状态替换 root 下的记录"""
+        root = self.normalize(root)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM scan_dirs WHERE kind = ? AND root = ?", (kind, root))
+            self._conn.executemany(
+                "INSERT INTO scan_dirs (kind, root, path, mtime, subdirs) VALUES (?, ?, ?, ?, ?)",
+                [(kind, root, path, mtime, json.dumps(subdirs)) for path, (mtime, subdirs) in state.items()]
+            )
+    
+    def plan(self, kind: str, files: Iterable, model: str, root=None,
+             recursive: bool = True, skipped_dirs: Iterable[str] = ()) -> IndexPlan:
+        """
+        对比清单与当前文件，生成增量索引计划
+        
+        - 路径、大小、修改时间和模型都未变化的文件直接跳过，不读取内容
+        - 大小或修改时间变化时计算内容哈希，内容未变只刷新记录
+        - 内容与某条已失效路径的记录相同时视为移动，只更新路径
+        - root 下清单中存在但磁盘上已不存在的文件视为删除（跳过列举的目录除外）
+        - 列举后、读取前被删除或改名的文件记入 vanished 并跳过，不中断整个计划
+        
+        Args:
+            kind: 记录类型
+            files: 本次扫描到的文件
+            model: 当前使用的模型标识，变化时需要重新嵌入
+            root: 扫描的根目录，提供时才会检测删除
+            recursive: 扫描是否包含子目录
+            skipped_dirs: 扫描时未列举文件的目录，其中的记录不参与删除检测
+        
+        Returns:
+            增量索引计划
+        """
+        plan = IndexPlan()
+        seen = set()
+        refreshed = []
+        moved_sources = set()
+        
+        for path in files:
+            path = Path(path)
+            key = self.normalize(path)
+            if key in seen:
+                continue
+            seen.add(key)
+            plan.scanned += 1
+            
+            try:
+                stat = path.stat()
+                entry = self.get(kind, key)
+                if (entry and entry.model == model and entry.size == stat.st_size
+                        and entry.mtime == stat.st_mtime):
+                    plan.unchanged += 1
+                    continue
+                content_hash = file_digest(str(path))
+            except FileNotFoundError:
+                # 编辑器的临时文件改名、快速移动等：文件已不在原路径，其记录交给删除检测
+                seen.discard(key)
+                plan.scanned -= 1
+                plan.vanished.append(path)
+                continue
+            
+            if entry and entry.model == model and entry.content_hash == content_hash:
+                refreshed.append((path, content_hash, entry.item_id))
+                plan.unchanged += 1
+                continue
+            
+            source = None
+            if not entry:
+                for candidate in self.find_by_hash(kind, content_hash):
+                    if (candidate.model == model and candidate.path not in moved_sources
+                            and not os.path.exists(candidate.path)):
+                        source = candidate
+                        break
+            if source:
+                moved_sources.add(source.path)
+                plan.moved.append((source, path))
+            else:
+                plan.new.append((path, content_hash))
+        
+        if refreshed:
+            self.record_many(kind, refreshed, model)
+        
+        if root is not None:
+            skipped_dirs = set(skipped_dirs)
+            for entry in self.entries_under(kind, root, recursive):
+                if os.path.dirname(entry.path) in skipped_dirs:
+                    continue
+                if (entry.path not in seen and entry.path not in moved_sources
+                        and not os.path.exists(entry.path)):
+                    plan.deleted.append(entry)
+        return plan
+    
+    def plan_changes(self, kind: str, files: Iterable, checked: Iterable, model: str) -> IndexPlan:
+        """
+        按文件变化事件生成增量索引计划，只检查事件涉及的路径，不扫描整个目录
+        
+        Args:
+            kind: 记录类型
+            files: 新增、修改或移入的文件
+            checked: 需要检测删除的路径：已不存在的文件或目录（检查其下全部记录），
+                或仍存在的目录（只检查其直接包含的记录）；files 中已消失的文件同样检测
+            model: 当前使用的模型标识
+        
+        Returns:
+            增量索引计划（移动的文件在旧路径上的记录不计为删除）
+        """
+        plan = self.plan(kind, files, model)
+        excluded = {entry.path for entry, _ in plan.moved}
+        for path in [*checked, *plan.vanished]:
+            entry = self.get(kind, path)
+            entries = ([entry] if entry else []) + self.entries_under(kind, path, recursive=not os.path.isdir(path))
+            for entry in entries:
+                if entry.path not in excluded and not os.path.exists(entry.path):
+                    excluded.add(entry.path)
+                    plan.deleted.append(entry)
+        return plan
+    
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,181 @@
+"""
+性能指标模块
+轻量的阶段计时器与计数器，用于定位索引和查询的耗时分布（PDF提取、模型编码、数据库读写、
+图像解码、分类与放置等）。通过 --profile 参数或环境变量 AGENT_PROFILE=1 开启；
+关闭时计时器只做一次布尔判断，几乎没有开销
+"""
+import functools
+import os
+import threading
+import time
+from typing import Dict
+
+
+_enabled = os.environ.get("AGENT_PROFILE", "") not in ("", "0")
+_lock = threading.Lock()
+# 阶段名 -> [调用次数, 总耗时, 最长耗时]
+_timers: Dict[str, list] = {}
+_counters: Dict[str, float] = {}
+
+
+def enable(flag: bool = True):
+    """开启或关闭指标收集"""
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def record(name: str, seconds: float, calls: int = 1):
+    """记录一次（或多次合计的）阶段耗时"""
+    if not _enabled:
+        return
+    with _lock:
+        entry = _timers.get(name)
+        if entry is None:
+            _timers[name] = [calls, seconds, seconds]
+        else:
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+
+def incr(name: str, value: float = 1):
+    """累加计数器（如编码的条数、写入的记录数）"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str):
+    """
+    阶段计时上下文管理器
+    
+    示例:
+        with metrics.timer("text.encode"):
+            embeddings = model.encode(texts)
+    """
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name: str):
+    """阶段计时装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def call_timed(func, *args):
+    """
+    在子进程中执行函数并返回 (结果, 耗时)
+    
+    子进程中记录的指标无法回到主进程，进程池任务改为提交该函数，由主进程调用 record 记录耗时
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def reset():
+    """清空已收集的指标"""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def snapshot() -> Dict[str, Dict]:
+    """
+    当前指标
+    
+    Returns:
+        {"timers": {阶段: {"calls", "total_s", "mean_ms", "max_ms"}}, "counters": {名称: 值}}
+    """
+    with _lock:
+        timers = {
+            name: {"calls": calls, "total_s": total, "mean_ms": total / calls * 1000 if calls else 0.0,
+                   "max_ms": longest * 1000}
+            for name, (calls, total, longest) in sorted(_timers.items())
+        }
+        counters = dict(sorted(_counters.items()))
+    return {"timers": timers, "counters": counters}
+
+
+def format_table() -> str:
+    """按总耗时降序输出阶段耗时汇总表"""
+    data = snapshot()
+    if not data["timers"] and not data["counters"]:
+        return "没有收集到性能指标"
+    lines = [f"{'阶段':<24}{'次数':>8}{'总耗时(s)':>12}{'平均(ms)':>12}{'最长(ms)':>12}"]
+    for name, row in sorted(data["timers"].items(), key=lambda item: -item[1]["total_s"]):
+        lines.append(f"{name:<24}{row['calls']:>8}{row['total_s']:>12.3f}{row['mean_ms']:>12.2f}{row['max_ms']:>12.2f}")
+    for name, value in data["counters"].items():
+        lines.append(f"{name:<24}{value:>8g}")
+    return "\n".join(lines)
+
+
+def to_prometheus(prefix: str = "agent") -> str:
+    """Prometheus 文本格式"""
+    data = snapshot()
+    lines = [
+        f"# HELP {prefix}_stage_calls_total 阶段调用次数",
+        f"# TYPE {prefix}_stage_calls_total counter",
+    ]
+    lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {row["calls"]}' for name, row in data["timers"].items()]
+    lines += [
+        f"# HELP {prefix}_stage_seconds_total 阶段累计耗时（秒）",
+        f"# TYPE {prefix}_stage_seconds_total counter",
+    ]
+    lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {row["total_s"]:.6f}'
+              for name, row in data["timers"].items()]
+    lines += [
+        f"# HELP {prefix}_stage_seconds_max 阶段单次最长耗时（秒）",
+        f"# TYPE {prefix}_stage_seconds_max gauge",
+    ]
+    lines += [f'{prefix}_stage_seconds_max{{stage="{name}"}} {row["max_ms"] / 1000:.6f}'
+              for name, row in data["timers"].items()]
+    lines += [
+        f"# HELP {prefix}_events_total 计数器",
+        f"# TYPE {prefix}_events_total counter",
+    ]
+    lines += [f'{prefix}_events_total{{name="{name}"}} {value:g}' for name, value in data["counters"].items()]
+    return "\n".join(lines) + "\n"
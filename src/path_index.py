@@ -0,0 +1,177 @@
+"""
+路径索引模块
+用一个轻量 SQLite 表镜像向量数据库中每条记录的文件路径和主题，
+使成员判断为索引查找、文件列表可以分页流式读取，而无需从 Chroma 中取出整个集合
+"""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from . import config
+
+
+class PathIndex:
+    """路径索引"""
+    
+    def __init__(self, db_path: str):
+        """
+        初始化路径索引
+        
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS items (
+                    kind TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    PRIMARY KEY (kind, item_id)
+                );
+                CREATE INDEX IF NOT EXISTS items_path ON items (kind, path);
+                CREATE TABLE IF NOT EXISTS item_topics (
+                    kind TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    PRIMARY KEY (kind, item_id, topic)
+                );
+                CREATE INDEX IF NOT EXISTS item_topics_topic ON item_topics (kind, topic);
+                CREATE TABLE IF NOT EXISTS synced (
+                    kind TEXT PRIMARY KEY
+                );
+                """
+            )
+    
+    def is_synced(self, kind: str) -> bool:
+        """该类型是否已与向量数据库完成过一次全量同步"""
+        return self._conn.execute("SELECT 1 FROM synced WHERE kind = ?", (kind,)).fetchone() is not None
+    
+    def mark_synced(self, kind: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO synced (kind) VALUES (?)", (kind,))
+    
+    def upsert(self, kind: str, records: Iterable[Dict]):
+        """
+        写入或更新记录
+        
+        Args:
+            kind: 记录类型（"document" 或 "image"）
+            records: 每项包含 item_id、path，可选 topics（逗号分隔的字符串）
+        """
+        records = list(records)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO items (kind, item_id, path) VALUES (?, ?, ?)",
+                [(kind, r["item_id"], str(r["path"])) for r in records]
+            )
+            self._conn.executemany(
+                "DELETE FROM item_topics WHERE kind = ? AND item_id = ?",
+                [(kind, r["item_id"]) for r in records]
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO item_topics (kind, item_id, topic) VALUES (?, ?, ?)",
+                [(kind, r["item_id"], topic.strip())
+                 for r in records for topic in (r.get("topics") or "").split(",") if topic.strip()]
+            )
+    
+    def update_path(self, kind: str, item_id: str, path):
+        """更新记录的文件路径"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE items SET path = ? WHERE kind = ? AND item_id = ?", (str(path), kind, item_id)
+            )
+    
+    def remove_ids(self, kind: str, item_ids: Iterable[str]):
+        """按条目ID删除记录"""
+        rows = [(kind, item_id) for item_id in item_ids]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM items WHERE kind = ? AND item_id = ?", rows)
+            self._conn.executemany("DELETE FROM item_topics WHERE kind = ? AND item_id = ?", rows)
+    
+    def remove_paths(self, kind: str, paths: Iterable):
+        """按文件路径删除记录"""
+        paths = [str(path) for path in paths]
+        item_ids = [row[0] for path in paths for row in self._conn.execute(
+            "SELECT item_id FROM items WHERE kind = ? AND path = ?", (kind, path)
+        )]
+        self.remove_ids(kind, item_ids)
+    
+    def contains(self, kind: str, path) -> bool:
+        """文件是否已被索引"""
+        row = self._conn.execute(
+            "SELECT 1 FROM items WHERE kind = ? AND path = ? LIMIT 1", (kind, str(path))
+        ).fetchone()
+        return row is not None
+    
+    def count(self, kind: str, topic: Optional[str] = None) -> int:
+        """统计记录数，可按主题过滤"""
+        if topic:
+            sql, params = "SELECT COUNT(*) FROM item_topics WHERE kind = ? AND topic = ?", (kind, topic)
+        else:
+            sql, params = "SELECT COUNT(*) FROM items WHERE kind = ?", (kind,)
+        return self._conn.execute(sql, params).fetchone()[0]
+    
+    def iter_paths(self, kind: str, topic: Optional[str] = None, limit: Optional[int] = None,
+                   offset: int = 0) -> Iterator[str]:
+        """
+        按路径顺序流式列出已索引的文件
+        
+        Args:
+            kind: 记录类型
+            topic: 只列出该主题下的文件
+            limit: 最多返回的条数
+            offset: 跳过的条数（用于分页）
+        """
+        if topic:
+            sql = ("SELECT items.path FROM items JOIN item_topics "
+                   "ON items.kind = item_topics.kind AND items.item_id = item_topics.item_id "
+                   "WHERE items.kind = ? AND item_topics.topic = ? ORDER BY items.path LIMIT ? OFFSET ?")
+            params = (kind, topic, -1 if limit is None else limit, offset)
+        else:
+            sql = "SELECT path FROM items WHERE kind = ? ORDER BY path LIMIT ? OFFSET ?"
+            params = (kind, -1 if limit is None else limit, offset)
+        for (path,) in self._conn.execute(sql, params):
+            yield path
+    
+    def iter_topic_paths(self, kind: str, topic: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """按 (主题, 路径) 顺序流式列出带主题的记录，可只列出某个主题"""
+        sql = ("SELECT item_topics.topic, items.path FROM items JOIN item_topics "
+               "ON items.kind = item_topics.kind AND items.item_id = item_topics.item_id "
+               "WHERE items.kind = ?")
+        params = [kind]
+        if topic:
+            sql += " AND item_topics.topic = ?"
+            params.append(topic)
+        yield from self._conn.execute(sql + " ORDER BY item_topics.topic, items.path", params)
+    
+    def close(self):
+        self._conn.close()
+
+
+def sync_from_collection(path_index: PathIndex, kind: str, collection,
+                         page_size: int = config.DB_WRITE_BATCH_SIZE):
+    """
+    从向量数据库集合分页回填路径索引（旧版本建立的索引只需执行一次）
+    
+    Args:
+        path_index: 路径索引
+        kind: 记录类型
+        collection: Chroma 集合
+        page_size: 每页读取的记录数
+    """
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        path_index.upsert(kind, [
+            {"item_id": item_id, "path": metadata["file_path"], "topics": metadata.get("topics", "")}
+            for item_id, metadata in zip(page["ids"], page["metadatas"])
+        ])
+        offset += len(page["ids"])
+    path_index.mark_synced(kind)
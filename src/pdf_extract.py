@@ -0,0 +1,205 @@
+"""
+PDF文本提取模块
+按页提取PDF文本，提供两种可插拔的提取模式：
+- fast: 使用 PDFium（pypdfium2，pdfplumber 的依赖）直接读取文本层，速度快
+- precise: 使用 pdfplumber 做版面分析，较慢但对复杂排版更准确
+两种模式失败时都回退到 PyPDF2；页数较多的PDF可按页段拆分到多个进程并行提取
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import config
+
+
+def _extract_pdfium(pdf_path: str, start: int, end: Optional[int]) -> List[str]:
+    """使用 PDFium 提取 [start, end) 页的文本"""
+    import pypdfium2 as pdfium
+    
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        pages = []
+        for index in range(start, len(pdf) if end is None else min(end, len(pdf))):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_range().replace("\r\n", "\n"))
+            textpage.close()
+            page.close()
+        return pages
+    finally:
+        pdf.close()
+
+
+def _extract_pdfplumber(pdf_path: str, start: int, end: Optional[int]) -> List[str]:
+    """使用 pdfplumber 提取 [start, end) 页的文本"""
+    import pdfplumber
+    
+    with pdfplumber.open(pdf_path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages[start:end]]
+
+
+def _extract_pypdf2(pdf_path: str, start: int, end: Optional[int]) -> List[str]:
+    """使用 PyPDF2 提取 [start, end) 页的文本"""
+    import PyPDF2
+    
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [page.extract_text() or "" for page in pdf_reader.pages[start:end]]
+
+
+# 各提取模式依次尝试的后端
+BACKENDS: Dict[str, List[Tuple[str, Callable[[str, int, Optional[int]], List[str]]]]] = {
+    "fast": [("PDFium", _extract_pdfium), ("PyPDF2", _extract_pypdf2)],
+    "precise": [("pdfplumber", _extract_pdfplumber), ("PyPDF2", _extract_pypdf2)],
+}
+
+
+def extract_pages(pdf_path: str, mode: str = config.PDF_EXTRACT_MODE, start: int = 0,
+                  end: Optional[int] = None) -> List[str]:
+    """
+    逐页提取PDF文本
+    
+    Args:
+        pdf_path: PDF文件路径
+        mode: 提取模式（"fast" 或 "precise"）
+        start: 起始页（从0开始）
+        end: 结束页（不包含），为 None 时提取到最后一页
+    
+    Returns:
+        每页的文本列表（无文本的页为空字符串），提取失败时返回空列表
+    """
+    if mode not in BACKENDS:
+        raise ValueError(f"未知的PDF提取模式: {mode}（可选: {', '.join(BACKENDS)}）")
+    
+    backends = BACKENDS[mode]
+    for position, (name, backend) in enumerate(backends):
+        try:
+            return backend(pdf_path, start, end)
+        except Exception as e:
+            if position + 1 < len(backends):
+                print(f"使用{name}提取失败，尝试{backends[position + 1][0]}: {e}")
+            else:
+                print(f"PDF文本提取失败: {e}")
+    return []
+
+
+def page_count(pdf_path: str) -> int:
+    """读取PDF页数（不提取文本），失败时返回 0"""
+    try:
+        import pypdfium2 as pdfium
+        
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    except Exception:
+        pass
+    try:
+        import PyPDF2
+        
+        with open(pdf_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+    except Exception:
+        return 0
+
+
+def pdf_year(pdf_path: str) -> Optional[int]:
+    """从PDF元数据的创建日期（"D:YYYYMMDD..."）读取年份，缺失或无法解析时返回 None"""
+    try:
+        import pypdfium2 as pdfium
+        
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            metadata = pdf.get_metadata_dict()
+        finally:
+            pdf.close()
+    except Exception:
+        return None
+    for key in ("CreationDate", "ModDate"):
+        match = re.match(r"(?:D:)?(\d{4})", metadata.get(key) or "")
+        if match and 1900 < int(match.group(1)) < 2200:
+            return int(match.group(1))
+    return None
+
+
+def page_ranges(total_pages: int, pages_per_task: int = config.PDF_PAGES_PER_TASK) -> List[Tuple[int, Optional[int]]]:
+    """
+    将页码划分为若干 [start, end) 页段
+    
+    页数未知（为 0）或不超过 pages_per_task 时返回整篇一个页段
+    """
+    if total_pages <= pages_per_task or pages_per_task <= 0:
+        return [(0, None)]
+    return [(start, min(start + pages_per_task, total_pages))
+            for start in range(0, total_pages, pages_per_task)]
+
+
+def extract_pages_parallel(pdf_path: str, mode: str = config.PDF_EXTRACT_MODE,
+                           workers: int = 1) -> List[str]:
+    """
+    按页段将单个PDF拆分到多个进程并行提取
+    
+    页数不超过 config.PDF_PAGES_PER_TASK 或 workers 为 1 时在当前进程中提取
+    
+    Args:
+        pdf_path: PDF文件路径
+        mode: 提取模式
+        workers: 进程数
+    
+    Returns:
+        每页的文本列表
+    """
+    ranges = page_ranges(page_count(pdf_path)) if workers > 1 else [(0, None)]
+    if len(ranges) == 1:
+        return extract_pages(pdf_path, mode)
+    
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        parts = executor.map(extract_pages, *zip(*[(pdf_path, mode, start, end) for start, end in ranges]))
+        return [page for part in parts for page in part]
+
+
+def join_pages(pages: List[str]) -> str:
+    """将逐页文本拼接为完整文本"""
+    return "\n".join(page for page in pages if page).strip()
+
+
+def extract_figures(pdf_path: str, output_dir: str, min_side: int = config.FIGURE_MIN_SIDE) -> List[Tuple[str, int]]:
+    """
+    提取PDF中嵌入的位图插图，保存为 PNG
+    
+    只提取原始像素尺寸的短边不小于 min_side 的图像，跳过图标、公式等小图
+    
+    Args:
+        pdf_path: PDF文件路径
+        output_dir: 插图的保存目录
+        min_side: 最小短边像素数
+    
+    Returns:
+        [(插图路径, 页码)]，页码从 1 开始
+    """
+    import pypdfium2 as pdfium
+    import pypdfium2.raw as pdfium_c
+    
+    os.makedirs(output_dir, exist_ok=True)
+    figures = []
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            objects = page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE], max_depth=2)
+            for number, image in enumerate(objects, 1):
+                if min(image.get_px_size()) < min_side:
+                    continue
+                path = os.path.join(output_dir, f"p{index + 1}_{number}.png")
+                try:
+                    image.get_bitmap().to_pil().save(path)
+                except Exception as e:
+                    print(f"提取 {os.path.basename(pdf_path)} 第 {index + 1} 页的插图时出错: {e}")
+                    continue
+                figures.append((path, index + 1))
+            page.close()
+    finally:
+        pdf.close()
+    return figures
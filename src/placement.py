@@ -0,0 +1,111 @@
+"""
+文件放置模块
+将论文放入主题目录时按配置选择放置方式，避免同一论文在多个主题目录中被完整复制多份：
+- auto: 依次尝试 reflink、hardlink，都不支持时复制
+- reflink: 写时复制克隆（Btrfs/XFS 等），不占用额外空间且与原文件相互独立
+- hardlink: 硬链接，与原文件共享同一份数据
+- symlink: 符号链接，指向原文件的绝对路径
+- copy: 完整复制
+- virtual: 不创建文件，主题只记录在元数据中，需要时用 materialize-topics 生成目录视图
+所有方式都先写入临时文件再原子替换目标；目标已是同一文件时直接跳过，重复执行不写入任何数据
+"""
+import os
+import shutil
+from pathlib import Path
+
+PLACEMENT_MODES = ("auto", "reflink", "hardlink", "symlink", "copy", "virtual")
+
+# Linux 上 ioctl(FICLONE) 的请求码
+_FICLONE = 0x40049409
+
+
+def place_file(source, dest, mode: str = "auto") -> str:
+    """
+    将文件放置到目标路径
+    
+    Args:
+        source: 源文件路径
+        dest: 目标文件路径
+        mode: 放置方式，见 PLACEMENT_MODES
+    
+    Returns:
+        实际执行的操作："reflink"、"hardlink"、"symlink"、"copy"、"exists"（已是最新，跳过）
+        或 "virtual"（未创建文件）
+    """
+    if mode not in PLACEMENT_MODES:
+        raise ValueError(f"未知的放置方式: {mode}（可选: {', '.join(PLACEMENT_MODES)}）")
+    if mode == "virtual":
+        return "virtual"
+    
+    source, dest = Path(source), Path(dest)
+    if _is_current(source, dest, mode):
+        return "exists"
+    
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    attempts = {
+        "auto": ("reflink", "hardlink", "copy"),
+        "reflink": ("reflink", "copy"),
+        "hardlink": ("hardlink", "copy"),
+        "symlink": ("symlink",),
+        "copy": ("copy",),
+    }[mode]
+    
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    for position, action in enumerate(attempts):
+        try:
+            _PLACERS[action](source, tmp)
+            os.replace(tmp, dest)
+            return action
+        except (OSError, ImportError):
+            _unlink(tmp)
+            if position + 1 == len(attempts):
+                raise
+    return "exists"
+
+
+def _is_current(source: Path, dest: Path, mode: str) -> bool:
+    """目标是否已是源文件的最新放置结果"""
+    if not os.path.lexists(dest):
+        return False
+    if mode == "symlink":
+        return dest.is_symlink() and os.readlink(dest) == str(source.resolve())
+    if dest.is_symlink():
+        return False
+    try:
+        if os.path.samefile(source, dest):
+            return True
+        src_stat, dest_stat = source.stat(), dest.stat()
+    except OSError:
+        return False
+    # 复制（包括 reflink）时保留了修改时间，大小和修改时间一致即视为相同
+    return src_stat.st_size == dest_stat.st_size and src_stat.st_mtime == dest_stat.st_mtime
+
+
+def _reflink(source: Path, tmp: Path):
+    import fcntl
+    
+    with open(source, 'rb') as src, open(tmp, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+    shutil.copystat(source, tmp)
+
+
+def _hardlink(source: Path, tmp: Path):
+    os.link(source, tmp)
+
+
+def _symlink(source: Path, tmp: Path):
+    os.symlink(source.resolve(), tmp)
+
+
+def _copy(source: Path, tmp: Path):
+    shutil.copy2(source, tmp)
+
+
+def _unlink(path: Path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+_PLACERS = {"reflink": _reflink, "hardlink": _hardlink, "symlink": _symlink, "copy": _copy}
@@ -0,0 +1,155 @@
+"""
+查询向量缓存模块
+按 (模型名称, 规范化后的查询) 缓存查询向量：内存中为 LRU，可选的磁盘层基于 SQLite，
+重复查询无需再进行模型前向计算；更换模型后键自然不同，旧缓存不会被误用
+"""
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import config
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询文本：Unicode NFKC 并合并连续空白"""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+class QueryCache:
+    """查询向量缓存"""
+    
+    def __init__(self, model_name: str, capacity: int = config.QUERY_CACHE_SIZE,
+                 disk_path: Optional[str] = config.QUERY_CACHE_PATH,
+                 disk_capacity: int = config.QUERY_CACHE_DISK_SIZE):
+        """
+        初始化查询向量缓存
+        
+        Args:
+            model_name: 生成向量的模型名称（缓存键的一部分）
+            capacity: 内存中最多缓存的查询数
+            disk_path: 磁盘缓存的 SQLite 文件路径，为空时不使用磁盘层
+            disk_capacity: 磁盘中每个模型最多缓存的查询数
+        """
+        self.model_name = model_name
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    """CREATE TABLE IF NOT EXISTS query_embeddings (
+                        model TEXT NOT NULL,
+                        query TEXT NOT NULL,
+                        embedding BLOB NOT NULL,
+                        last_used REAL NOT NULL,
+                        PRIMARY KEY (model, query)
+                    )"""
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS query_embeddings_used ON query_embeddings (model, last_used)"
+                )
+    
+    def encode(self, queries: List[str], encode_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        返回查询向量，未命中的查询合并为一次 encode_fn 调用
+        
+        Args:
+            queries: 查询文本列表
+            encode_fn: 批量编码函数
+        
+        Returns:
+            与 queries 一一对应的查询向量列表
+        """
+        keys = [normalize_query(query) for query in queries]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    continue
+                embedding = self._memory.get(key)
+                if embedding is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = embedding
+                    self.hits += 1
+        
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self._conn is not None:
+            from_disk = self._load(missing)
+            self.disk_hits += len(from_disk)
+            found.update(from_disk)
+            self._remember(from_disk)
+            missing = [key for key in missing if key not in from_disk]
+        
+        if missing:
+            self.misses += len(missing)
+            computed = dict(zip(missing, encode_fn(missing)))
+            found.update(computed)
+            self._remember(computed)
+            if self._conn is not None:
+                self._store(computed)
+        return [found[key] for key in keys]
+    
+    def stats(self) -> Dict[str, int]:
+        """命中统计"""
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "size": len(self._memory)}
+    
+    def _remember(self, embeddings: Dict[str, List[float]]):
+        """写入内存层并按 LRU 淘汰"""
+        with self._lock:
+            for key, embedding in embeddings.items():
+                self._memory[key] = embedding
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+    
+    def _load(self, keys: List[str]) -> Dict[str, List[float]]:
+        """从磁盘层读取，并刷新最近使用时间"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT embedding FROM query_embeddings WHERE model = ? AND query = ?",
+                    (self.model_name, key)
+                ).fetchone()
+                if row:
+                    found[key] = np.frombuffer(row[0], dtype=np.float32).tolist()
+            if found:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE query_embeddings SET last_used = ? WHERE model = ? AND query = ?",
+                        [(time.time(), self.model_name, key) for key in found]
+                    )
+        return found
+    
+    def _store(self, embeddings: Dict[str, List[float]]):
+        """写入磁盘层，超出容量时淘汰最久未使用的记录"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO query_embeddings (model, query, embedding, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model_name, key, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+                 for key, embedding in embeddings.items()]
+            )
+            self._conn.execute(
+                "DELETE FROM query_embeddings WHERE model = ? AND query NOT IN ("
+                "SELECT query FROM query_embeddings WHERE model = ? ORDER BY last_used DESC LIMIT ?)",
+                (self.model_name, self.model_name, self.disk_capacity)
+            )
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
@@ -0,0 +1,116 @@
+"""
+目录扫描模块
+基于 os.scandir 的单遍目录遍历，替代按扩展名多次 glob 的方式：
+扩展名大小写不敏感、结果去重、惰性产出，并可跳过修改时间未变的目录
+"""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class DirectoryScanner:
+    """目录扫描器"""
+    
+    def __init__(self, extensions: Iterable[str], recursive: bool = True,
+                 previous_state: Optional[Dict[str, Tuple[float, List[str]]]] = None):
+        """
+        初始化目录扫描器
+        
+        Args:
+            extensions: 需要匹配的扩展名（如 ".jpg"），大小写不敏感
+            recursive: 是否递归扫描子目录
+            previous_state: 上次扫描记录的目录状态 {绝对路径: (修改时间, [子目录名])}；
+                提供时跳过修改时间未变的目录中的文件列举，只沿记录的子目录继续向下
+        """
+        self.extensions = {ext.lower() for ext in extensions}
+        self.recursive = recursive
+        self.previous_state = previous_state
+        # 本次扫描访问到的目录状态，扫描结束后可保存供下次使用
+        self.state: Dict[str, Tuple[float, List[str]]] = {}
+        # 本次扫描中因修改时间未变而跳过文件列举的目录（绝对路径）
+        self.skipped_dirs: Set[str] = set()
+    
+    def scan(self, root) -> Iterator[Path]:
+        """
+        惰性遍历目录，产出匹配的文件路径
+        
+        同一个文件（同一 inode，例如大小写不敏感的挂载点或硬链接）只产出一次；
+        不跟随指向目录的符号链接，避免循环
+        
+        Args:
+            root: 根目录
+        """
+        seen = set()
+        stack = [str(root)]
+        while stack:
+            directory = stack.pop()
+            key = os.path.abspath(directory)
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                continue
+            
+            cached = self.previous_state.get(key) if self.previous_state else None
+            if cached and cached[0] == mtime:
+                # 目录的直接条目没有增删（目录修改时间不变），不再列举其中的文件
+                subdirs = cached[1]
+                self.skipped_dirs.add(key)
+            else:
+                files, subdirs = self._list_directory(directory, seen)
+                yield from files
+            self.state[key] = (mtime, subdirs)
+            if self.recursive:
+                stack.extend(os.path.join(directory, name) for name in reversed(subdirs))
+    
+    def _list_directory(self, directory: str, seen: set):
+        """列出一个目录中匹配的文件和子目录名"""
+        files: List[Path] = []
+        subdirs: List[str] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    
+                    if os.path.splitext(entry.name)[1].lower() not in self.extensions:
+                        continue
+                    
+                    key = self._identity(entry)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    files.append(Path(entry.path))
+        except OSError as e:
+            print(f"无法读取目录 {directory}: {e}")
+        files.sort()
+        subdirs.sort()
+        return files, subdirs
+    
+    @staticmethod
+    def _identity(entry: os.DirEntry):
+        """文件的唯一标识：优先使用 (设备号, inode)，不可用时使用规范化后的真实路径"""
+        try:
+            inode = entry.inode()
+            if inode:
+                return entry.stat().st_dev, inode
+        except OSError:
+            pass
+        return os.path.normcase(os.path.realpath(entry.path))
+
+
+def scan_files(root, extensions: Iterable[str], recursive: bool = True) -> Iterator[Path]:
+    """
+    惰性扫描目录中匹配扩展名的文件（不使用目录状态缓存）
+    
+    Args:
+        root: 根目录
+        extensions: 需要匹配的扩展名，大小写不敏感
+        recursive: 是否递归扫描子目录
+    """
+    return DirectoryScanner(extensions, recursive=recursive).scan(root)
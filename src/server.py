@@ -0,0 +1,249 @@
+"""
+常驻查询服务模块
+在本地 HTTP 端口上常驻文献/图像管理器，保持模型与向量数据库处于加载状态，
+并将并发到达的查询合并为批量 encode 调用
+"""
+import json
+import queue
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+from . import config, metrics, unified_search
+
+
+class QueryBatcher:
+    """查询合并器：将短时间内到达的查询合并为一次批量编码"""
+    
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch: int = config.DAEMON_MAX_BATCH,
+                 max_wait_ms: float = config.DAEMON_MAX_WAIT_MS):
+        """
+        初始化查询合并器
+        
+        Args:
+            encode_fn: 批量编码函数，输入文本列表，返回向量列表
+            max_batch: 单批最多合并的查询数
+            max_wait_ms: 收到第一个查询后等待更多查询的最长时间（毫秒）
+        """
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def submit(self, query: str) -> Future:
+        """
+        提交一个查询，返回其查询向量的 Future
+        
+        Args:
+            query: 查询文本
+        """
+        future = Future()
+        self._queue.put((query, future))
+        return future
+    
+    def encode(self, query: str) -> List[float]:
+        """提交查询并等待其向量"""
+        return self.submit(query).result()
+    
+    def _run(self):
+        """后台线程：收集一批查询后统一编码"""
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get(timeout=self.max_wait))
+            except queue.Empty:
+                pass
+            
+            queries = [query for query, _ in batch]
+            try:
+                embeddings = self.encode_fn(queries)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+
+class QueryService:
+    """查询服务：持有常驻的管理器并处理各类请求"""
+    
+    def __init__(self, doc_manager=None, img_manager=None):
+        """
+        初始化查询服务
+        
+        Args:
+            doc_manager: 文献管理器（为 None 时不提供论文查询）
+            img_manager: 图像管理器（为 None 时不提供图像查询）
+        """
+        self.doc_manager = doc_manager
+        self.img_manager = img_manager
+        self.doc_batcher = QueryBatcher(doc_manager.encode_queries) if doc_manager else None
+        self.img_batcher = QueryBatcher(img_manager.encode_queries) if img_manager else None
+    
+    def handle(self, command: str, payload: Dict) -> Dict:
+        """
+        处理一个请求
+        
+        Args:
+            command: 请求的命令名（与 CLI 命令同名）
+            payload: 请求参数
+        
+        Returns:
+            响应内容
+        """
+        if command == "search-paper":
+            self._require(self.doc_manager, command)
+            query, top_k, mode = payload["query"], payload.get("top_k", 5), payload.get("mode", "vector")
+            where = payload.get("where")
+            if mode == "lexical":
+                return {"results": self.doc_manager.lexical_index.search(query, top_k=top_k, where=where)}
+            embedding = self.doc_batcher.encode(query)
+            if mode == "hybrid":
+                return {"results": self.doc_manager.search_hybrid(query, embedding, top_k=top_k, where=where)}
+            return {"results": self.doc_manager.search_by_embedding(embedding, top_k=top_k, where=where)}
+        if command == "list-papers":
+            self._require(self.doc_manager, command)
+            query, where = payload.get("query"), payload.get("where")
+            if query:
+                embedding = self.doc_batcher.encode(query)
+                files = [doc['file_path'] for doc in
+                         self.doc_manager.search_by_embedding(embedding, top_k=10, where=where)]
+            else:
+                files = self.doc_manager.list_files(where=where)
+            return {"files": files}
+        if command == "search-image":
+            self._require(self.img_manager, command)
+            embedding = self.img_batcher.encode(payload["query"])
+            results = self.img_manager.search_by_embedding(embedding, top_k=payload.get("top_k", 5),
+                                                           where=payload.get("where"))
+            return {"results": results}
+        if command == "search-similar":
+            self._require(self.img_manager, command)
+            results = self.img_manager.search_similar(payload["path"], top_k=payload.get("top_k", 5),
+                                                      where=payload.get("where"))
+            return {"results": results}
+        if command == "search":
+            types = payload.get("types") or list(unified_search.SEARCH_TYPES)
+            if "paper" in types:
+                self._require(self.doc_manager, command)
+            if "image" in types:
+                self._require(self.img_manager, command)
+            # 两类查询分别经过各自的合并器，与其他并发请求一起批量编码
+            results = unified_search.search(
+                payload["query"], top_k=payload.get("top_k", 5), where=payload.get("where"),
+                doc_manager=self.doc_manager if "paper" in types else None,
+                img_manager=self.img_manager if "image" in types else None,
+                encoders={"paper": self.doc_batcher and self.doc_batcher.encode,
+                          "image": self.img_batcher and self.img_batcher.encode}
+            )
+            return {"results": results}
+        if command == "search-batch":
+            # 整批查询已在客户端合并，直接一次批量编码，不经过合并器
+            queries, top_k, where = payload["queries"], payload.get("top_k", 5), payload.get("where")
+            if payload.get("type", "paper") == "image":
+                self._require(self.img_manager, command)
+                return {"results": self.img_manager.search_batch(queries, top_k=top_k, where=where)}
+            self._require(self.doc_manager, command)
+            mode = payload.get("mode", "vector")
+            return {"results": self.doc_manager.search_batch(queries, top_k=top_k, mode=mode, where=where)}
+        raise KeyError(f"未知命令: {command}")
+    
+    def commands(self) -> List[str]:
+        """返回当前服务支持的命令列表"""
+        commands = []
+        if self.doc_manager:
+            commands.extend(["search-paper", "list-papers"])
+        if self.img_manager:
+            commands.extend(["search-image", "search-similar"])
+        if self.doc_manager or self.img_manager:
+            commands.extend(["search", "search-batch"])
+        return commands
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """各管理器查询向量缓存的命中统计"""
+        stats = {}
+        if self.doc_manager:
+            stats["papers"] = self.doc_manager.query_cache.stats()
+        if self.img_manager:
+            stats["images"] = self.img_manager.query_cache.stats()
+        return stats
+    
+    @staticmethod
+    def _require(manager, command: str):
+        if manager is None:
+            raise KeyError(f"服务未加载该命令所需的管理器: {command}")
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """HTTP 请求处理：POST /<command>，请求与响应均为 JSON"""
+    
+    service: QueryService = None
+    
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "commands": self.service.commands(),
+                             "query_cache": self.service.cache_stats()})
+        elif self.path == "/metrics":
+            self._send_text(200, metrics.to_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+        elif self.path == "/metrics.json":
+            self._send(200, {"enabled": metrics.is_enabled(), **metrics.snapshot()})
+        else:
+            self._send(404, {"error": f"未知路径: {self.path}"})
+    
+    def do_POST(self):
+        command = self.path.strip("/")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            self._send(200, self.service.handle(command, payload))
+        except KeyError as e:
+            self._send(404, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+    
+    def _send(self, status: int, body: Dict):
+        self._send_text(status, json.dumps(body, ensure_ascii=False), "application/json; charset=utf-8")
+    
+    def _send_text(self, status: int, text: str, content_type: str):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        # 不逐条输出访问日志
+        pass
+
+
+def serve(service: QueryService, host: str = config.DAEMON_HOST, port: int = config.DAEMON_PORT):
+    """
+    启动查询服务并阻塞运行
+    
+    Args:
+        service: 查询服务实例
+        host: 监听地址（默认仅本机）
+        port: 监听端口
+    """
+    handler = type("RequestHandler", (_RequestHandler,), {"service": service})
+    server_class = type("QueryHTTPServer", (ThreadingHTTPServer,), {
+        "daemon_threads": True,
+        # 允许更多并发连接排队，避免高并发时连接被重置
+        "request_queue_size": 128,
+    })
+    server = server_class((host, port), handler)
+    print(f"查询服务已启动: http://{host}:{port}  支持命令: {', '.join(service.commands())}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("查询服务已停止")
+    finally:
+        server.server_close()
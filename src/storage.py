@@ -0,0 +1,444 @@
+"""
+存储层模块
+文献管理器与图像管理器共享的向量数据库访问层：
+- 同一进程内每个数据库目录只打开一个 PersistentClient（一个 SQLite 连接、一份缓存、一个 HNSW 加载器）
+- 集合统一使用 config 中的 HNSW 参数创建，已有集合同步可调整的查询参数
+- 写缓冲把多批小写入合并为大批量 upsert，写入后再执行登记的回调（如记录索引清单）
+- compact 在大量删除后重建 HNSW 索引并回收磁盘空间
+- 集合可按 config.VECTOR_STORES 改用 NumPy 向量存储（src/vector_store.py），切换后端时自动迁移已有记录
+"""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from . import config, metrics
+
+
+# 重建集合时使用的临时集合名后缀
+_COMPACT_SUFFIX = "__compact"
+
+# NumPy 向量存储在数据库目录下的子目录
+NUMPY_DIR = "numpy"
+
+_clients: Dict[str, object] = {}
+_numpy_collections: Dict[tuple, object] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(db_path: str):
+    """
+    获取数据库目录对应的客户端，同一进程内只创建一次
+    
+    Args:
+        db_path: 向量数据库路径
+    """
+    key = os.path.abspath(db_path)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            import chromadb
+            from chromadb.config import Settings
+            
+            client = chromadb.PersistentClient(
+                path=db_path,
+                settings=Settings(anonymized_telemetry=False)
+            )
+            _clients[key] = client
+    return client
+
+
+def hnsw_configuration() -> Dict:
+    """创建集合时使用的 HNSW 参数"""
+    return {
+        "space": "cosine",
+        "max_neighbors": config.HNSW_M,
+        "ef_construction": config.HNSW_CONSTRUCTION_EF,
+        "ef_search": config.HNSW_SEARCH_EF,
+        "batch_size": config.HNSW_BATCH_SIZE,
+        "sync_threshold": config.HNSW_SYNC_THRESHOLD,
+    }
+
+
+def store_kind(name: str) -> str:
+    """集合使用的向量存储后端（"chroma" 或 "numpy"）"""
+    return config.VECTOR_STORES.get(name, config.VECTOR_STORE)
+
+
+def numpy_path(db_path: str, name: str) -> str:
+    """集合的 NumPy 向量存储目录"""
+    return os.path.join(db_path, NUMPY_DIR, name)
+
+
+def numpy_collection_names(db_path: str) -> List[str]:
+    """数据库目录中已有的 NumPy 向量存储集合"""
+    directory = os.path.join(db_path, NUMPY_DIR)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(entry.name for entry in os.scandir(directory)
+                  if os.path.exists(os.path.join(entry.path, "records.sqlite3")))
+
+
+def get_collection(db_path: str, name: str):
+    """
+    获取或创建集合
+    
+    M 与构建时的 ef 只在创建集合时生效（修改后运行 compact 重建）；
+    查询时的 ef 与同步阈值对已有集合同样生效，与配置不同时更新。
+    集合的后端与已有记录所在的后端不同时，先把记录迁移到当前后端
+    
+    Args:
+        db_path: 向量数据库路径
+        name: 集合名
+    """
+    if store_kind(name) == "numpy":
+        return _get_numpy_collection(db_path, name)
+    
+    from chromadb.errors import NotFoundError
+    
+    client = get_client(db_path)
+    try:
+        collection = client.get_collection(name)
+    except NotFoundError:
+        collection = _recover(client, name) or client.create_collection(
+            name, configuration={"hnsw": hnsw_configuration()}
+        )
+    
+    current = (collection.configuration or {}).get("hnsw") or {}
+    wanted = {"ef_search": config.HNSW_SEARCH_EF, "sync_threshold": config.HNSW_SYNC_THRESHOLD}
+    changed = {key: value for key, value in wanted.items() if current.get(key) != value}
+    if changed:
+        collection.modify(configuration={"hnsw": changed})
+    
+    if name in numpy_collection_names(db_path):
+        from .vector_store import NumpyCollection
+        
+        source = NumpyCollection(numpy_path(db_path, name), name)
+        try:
+            _migrate(source, collection, "NumPy", "Chroma")
+        finally:
+            source.close()
+        shutil.rmtree(numpy_path(db_path, name), ignore_errors=True)
+    return collection
+
+
+def _get_numpy_collection(db_path: str, name: str):
+    """获取 NumPy 向量存储集合，同一进程内只打开一次；新建时迁移 Chroma 中的同名集合"""
+    from .vector_store import NumpyCollection
+    
+    key = (os.path.abspath(db_path), name)
+    with _clients_lock:
+        collection = _numpy_collections.get(key)
+        if collection is not None:
+            return collection
+        created = name not in numpy_collection_names(db_path)
+        collection = NumpyCollection(numpy_path(db_path, name), name, dtype=config.VECTOR_STORE_DTYPE)
+        _numpy_collections[key] = collection
+    
+    if created and name in _chroma_collection_names(db_path):
+        client = get_client(db_path)
+        try:
+            _migrate(client.get_collection(name), collection, "Chroma", "NumPy")
+        except BaseException:
+            # 迁移未完成时删除新建的存储，下次打开时重新迁移
+            with _clients_lock:
+                _numpy_collections.pop(key, None)
+            collection.close()
+            shutil.rmtree(numpy_path(db_path, name), ignore_errors=True)
+            raise
+        client.delete_collection(name)
+    return collection
+
+
+def _chroma_collection_names(db_path: str) -> List[str]:
+    """直接读取 chroma.sqlite3 中的集合名，避免为检查迁移而加载 Chroma"""
+    database = os.path.join(db_path, "chroma.sqlite3")
+    if not os.path.exists(database):
+        return []
+    with sqlite3.connect(database, timeout=30) as conn:
+        return [row[0] for row in conn.execute("SELECT name FROM collections")]
+
+
+def _migrate(source, target, source_kind: str, target_kind: str,
+             page_size: int = config.DB_WRITE_BATCH_SIZE):
+    """逐页把集合中的记录复制到另一个后端"""
+    total = source.count()
+    if total == 0:
+        return
+    print(f"正在把集合 {source.name} 的 {total} 条记录从 {source_kind} 迁移到 {target_kind}...")
+    for offset in range(0, total, page_size):
+        page = source.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        if len(page["ids"]) == 0:
+            break
+        target.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                      documents=page["documents"], metadatas=page["metadatas"])
+
+
+def _recover(client, name: str):
+    """compact 在删除旧集合后、重命名新集合前中断时，把重建好的临时集合改回原名"""
+    from chromadb.errors import NotFoundError
+    
+    try:
+        collection = client.get_collection(name + _COMPACT_SUFFIX)
+    except NotFoundError:
+        return None
+    collection.modify(name=name)
+    return collection
+
+
+@metrics.timed("db.write")
+def bulk_upsert(collection, ids: List[str], embeddings, documents: Optional[List[str]],
+                metadatas: List[Dict], max_batch: int = config.DB_WRITE_BATCH_SIZE):
+    """
+    按数据库允许的最大批量分段写入多条记录
+    
+    embeddings 可以是 NumPy 矩阵或向量列表（不需要先转换为 Python 列表）；documents 为 None 时不保存文档文本
+    """
+    metrics.incr("db.write_records", len(ids))
+    for start in range(0, len(ids), max_batch):
+        end = start + max_batch
+        collection.upsert(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            documents=documents[start:end] if documents is not None else None,
+            metadatas=metadatas[start:end]
+        )
+
+
+class WriteBuffer:
+    """
+    写缓冲
+    
+    按集合累积待写入的记录（同一ID只保留最后一次写入），累计达到 max_records 条时
+    以大批量 upsert 写入；写入成功后按登记顺序执行回调，保证索引清单等记录
+    不会先于向量记录落盘（中断时未写入的文件会在下次运行时重新索引）
+    """
+    
+    def __init__(self, max_records: int = config.WRITE_BUFFER_RECORDS):
+        self.max_records = max(1, max_records)
+        # 集合名 -> (集合, {ID: (向量, 文档, 元数据)})
+        self._pending: Dict[str, tuple] = {}
+        self._callbacks: List[Callable[[], None]] = []
+    
+    @property
+    def pending(self) -> int:
+        """尚未写入的记录数"""
+        return sum(len(records) for _, records in self._pending.values())
+    
+    def upsert(self, collection, ids: List[str], embeddings, documents: Optional[List[str]],
+               metadatas: List[Dict]):
+        """加入待写入的记录，缓冲已满时立即写入"""
+        _, records = self._pending.setdefault(collection.name, (collection, {}))
+        if documents is None:
+            documents = [None] * len(ids)
+        for record in zip(ids, embeddings, documents, metadatas):
+            records[record[0]] = record[1:]
+        if self.pending >= self.max_records:
+            self.flush()
+    
+    def after_flush(self, callback: Callable[[], None]):
+        """登记在已缓冲的记录写入后执行的回调；没有待写入的记录时立即执行"""
+        if self._pending:
+            self._callbacks.append(callback)
+        else:
+            callback()
+    
+    def flush(self):
+        """写入所有缓冲的记录并执行回调；写入失败时丢弃缓冲内容和回调"""
+        import numpy as np
+        
+        pending, self._pending = self._pending, {}
+        callbacks, self._callbacks = self._callbacks, []
+        for collection, records in pending.values():
+            ids = list(records)
+            documents = [records[i][1] for i in ids]
+            bulk_upsert(
+                collection,
+                ids=ids,
+                embeddings=np.asarray([records[i][0] for i in ids], dtype=np.float32),
+                documents=None if all(document is None for document in documents) else documents,
+                metadatas=[records[i][2] for i in ids]
+            )
+        for callback in callbacks:
+            callback()
+
+
+def compact(db_path: str, names: Optional[List[str]] = None,
+            page_size: int = config.DB_WRITE_BATCH_SIZE) -> List[Dict]:
+    """
+    重建集合的索引
+    
+    删除记录时 HNSW 图中只做标记，大量删除后图中残留的节点会拖慢查询、占用磁盘。
+    逐页把记录复制到按当前配置新建的临时集合，删除旧集合后改回原名，
+    再清理旧集合遗留的索引文件并整理 SQLite 文件；
+    NumPy 向量存储的集合则重写向量文件，去掉已删除的行，并转换为 VECTOR_STORE_DTYPE 指定的精度
+    
+    重建期间不应有其他进程（如查询服务）读写该数据库
+    
+    Args:
+        db_path: 向量数据库路径
+        names: 要重建的集合名（默认为全部集合）
+        page_size: 每次复制的记录数
+    
+    Returns:
+        每个集合一项：name、count（记录数）、seconds（耗时）
+    """
+    numpy_names = numpy_collection_names(db_path)
+    report = []
+    for name in [name for name in names or numpy_names if name in numpy_names]:
+        start = time.perf_counter()
+        count = _get_numpy_collection(db_path, name).compact(dtype=config.VECTOR_STORE_DTYPE)
+        report.append({"name": name, "count": count, "seconds": time.perf_counter() - start})
+    
+    chroma_names = [name for name in names if name not in numpy_names] if names else None
+    if chroma_names or (names is None and _chroma_collection_names(db_path)):
+        report.extend(_compact_chroma(db_path, chroma_names, page_size))
+    
+    remove_orphan_segments(db_path)
+    vacuum(db_path)
+    return report
+
+
+def _compact_chroma(db_path: str, names: Optional[List[str]], page_size: int) -> List[Dict]:
+    """重建 Chroma 集合的 HNSW 索引"""
+    client = get_client(db_path)
+    existing = [collection.name for collection in client.list_collections()]
+    for name in existing:
+        # 上次重建中断遗留的临时集合
+        if name.endswith(_COMPACT_SUFFIX) and name[:-len(_COMPACT_SUFFIX)] not in existing:
+            _recover(client, name[:-len(_COMPACT_SUFFIX)])
+    existing = [collection.name for collection in client.list_collections()]
+    for name in existing:
+        if name.endswith(_COMPACT_SUFFIX):
+            client.delete_collection(name)
+    
+    report = []
+    for name in names or [name for name in existing if not name.endswith(_COMPACT_SUFFIX)]:
+        start = time.perf_counter()
+        source = client.get_collection(name)
+        metadata = {key: value for key, value in (source.metadata or {}).items()
+                    if not key.startswith("hnsw:")}
+        target = client.create_collection(name + _COMPACT_SUFFIX, metadata=metadata or None,
+                                          configuration={"hnsw": hnsw_configuration()})
+        count = 0
+        total = source.count()
+        for offset in range(0, total, page_size):
+            page = source.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+            if len(page["ids"]) == 0:
+                break
+            target.add(ids=page["ids"], embeddings=page["embeddings"],
+                       documents=page["documents"], metadatas=page["metadatas"])
+            count += len(page["ids"])
+        client.delete_collection(name)
+        target.modify(name=name)
+        report.append({"name": name, "count": count, "seconds": time.perf_counter() - start})
+    return report
+
+
+def remove_orphan_segments(db_path: str) -> int:
+    """删除数据库目录中已不属于任何集合的 HNSW 索引目录，返回删除的目录数"""
+    database = os.path.join(db_path, "chroma.sqlite3")
+    if not os.path.exists(database):
+        return 0
+    with sqlite3.connect(database, timeout=30) as conn:
+        segments = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    
+    removed = 0
+    for entry in os.scandir(db_path):
+        if not entry.is_dir() or entry.name in segments:
+            continue
+        try:
+            uuid.UUID(entry.name)
+        except ValueError:
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def vacuum(db_path: str):
+    """整理数据库目录中的 SQLite 文件（向量数据库、索引清单、路径索引、词法索引），回收已删除记录的空间"""
+    for name in sorted(os.listdir(db_path)):
+        if name.endswith(".sqlite3"):
+            conn = sqlite3.connect(os.path.join(db_path, name), timeout=30)
+            try:
+                conn.execute("VACUUM")
+            except sqlite3.OperationalError as e:
+                print(f"整理 {name} 时出错: {e}")
+            finally:
+                conn.close()
+
+
+def footprint(db_path: str) -> List[Dict]:
+    """
+    统计数据库目录的磁盘占用（直接读取文件，不加载 Chroma）
+    
+    Chroma 集合的占用为其 HNSW 索引目录，加上按记录数分摊的 chroma.sqlite3（元数据、文本与写前日志）；
+    NumPy 集合为其向量文件与旁路表；其余为数据库目录中的索引清单、路径索引、词法索引、文本存储等文件
+    
+    Args:
+        db_path: 向量数据库路径
+    
+    Returns:
+        每个组成部分一项：name、backend（集合的后端，文件为 None）、dtype（向量精度）、
+        count（记录数，文件为 None）、bytes
+    """
+    import numpy as np
+    
+    items = []
+    database = os.path.join(db_path, "chroma.sqlite3")
+    shared = sum(os.path.getsize(os.path.join(db_path, name)) for name in os.listdir(db_path)
+                 if name.startswith("chroma.sqlite3"))
+    collections: Dict[str, Dict] = {}
+    if os.path.exists(database):
+        with sqlite3.connect(database, timeout=30) as conn:
+            segments = conn.execute(
+                "SELECT collections.name, segments.id, segments.scope FROM collections "
+                "JOIN segments ON segments.collection = collections.id"
+            ).fetchall()
+            counts = dict(conn.execute("SELECT segment_id, COUNT(*) FROM embeddings GROUP BY segment_id"))
+        for name, segment_id, scope in segments:
+            item = collections.setdefault(
+                name, {"name": name, "backend": "chroma", "dtype": "float32", "count": 0, "bytes": 0}
+            )
+            if scope == "VECTOR":
+                item["bytes"] += directory_size(os.path.join(db_path, segment_id))
+            else:
+                item["count"] += counts.get(segment_id, 0)
+    total = sum(item["count"] for item in collections.values())
+    for item in collections.values():
+        if total:
+            item["bytes"] += shared * item["count"] // total
+        items.append(item)
+    if shared and not total:
+        items.append({"name": "chroma.sqlite3", "backend": None, "dtype": None, "count": None, "bytes": shared})
+    
+    for name in numpy_collection_names(db_path):
+        path = numpy_path(db_path, name)
+        with sqlite3.connect(os.path.join(path, "records.sqlite3"), timeout=30) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        vectors = os.path.join(path, "vectors.npy")
+        dtype = str(np.load(vectors, mmap_mode="r").dtype) if os.path.exists(vectors) else None
+        items.append({"name": name, "backend": "numpy", "dtype": dtype, "count": count,
+                      "bytes": directory_size(path)})
+    
+    for entry in sorted(os.scandir(db_path), key=lambda entry: entry.name):
+        if entry.is_file() and not entry.name.startswith("chroma.sqlite3"):
+            items.append({"name": entry.name, "backend": None, "dtype": None, "count": None,
+                          "bytes": entry.stat().st_size})
+    return items
+
+
+def directory_size(path: str) -> int:
+    """目录中所有文件的总字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
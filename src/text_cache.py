@@ -0,0 +1,55 @@
+"""
+PDF文本缓存模块
+按 (内容哈希, 提取模式) 缓存逐页提取的文本（zlib 压缩），
+重新分类或重新嵌入同一文件时无需再次解析PDF
+"""
+import json
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+
+class TextCache:
+    """PDF文本缓存"""
+    
+    def __init__(self, db_path: str):
+        """
+        初始化文本缓存
+        
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS pages (
+                    content_hash TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (content_hash, mode)
+                )"""
+            )
+    
+    def get(self, content_hash: str, mode: str) -> Optional[List[str]]:
+        """读取缓存的逐页文本，未命中时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM pages WHERE content_hash = ? AND mode = ?", (content_hash, mode)
+            ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+    
+    def put(self, content_hash: str, mode: str, pages: List[str]):
+        """写入逐页文本"""
+        data = zlib.compress(json.dumps(pages, ensure_ascii=False).encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (content_hash, mode, data) VALUES (?, ?, ?)",
+                (content_hash, mode, data)
+            )
+    
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,104 @@
+"""
+文本存储模块
+按记录ID保存论文正文和文本块（zlib 压缩），向量数据库中只保存向量和元数据，
+不再内联存放长文本（Chroma 也不再为其建立全文索引）
+"""
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+
+# SQLite 单条语句的参数个数上限内，每次按ID查询的条数
+_QUERY_BATCH = 500
+
+
+class TextStore:
+    """压缩文本存储"""
+    
+    def __init__(self, db_path: str):
+        """
+        初始化文本存储
+        
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS texts (
+                    item_id TEXT PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    data BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS texts_doc ON texts (doc_id);
+                """
+            )
+    
+    def put(self, records: Iterable[Tuple[str, str, str]]):
+        """
+        写入或替换文本
+        
+        Args:
+            records: (记录ID, 所属文档ID, 文本)，文档记录的所属文档ID即其自身
+        """
+        rows = [(item_id, doc_id, zlib.compress((text or "").encode("utf-8")))
+                for item_id, doc_id, text in records]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO texts (item_id, doc_id, data) VALUES (?, ?, ?)", rows)
+    
+    def get(self, item_ids: Iterable[str]) -> Dict[str, str]:
+        """按记录ID读取文本，不存在的ID不出现在结果中"""
+        item_ids = list(dict.fromkeys(item_ids))
+        texts = {}
+        with self._lock:
+            for start in range(0, len(item_ids), _QUERY_BATCH):
+                batch = item_ids[start:start + _QUERY_BATCH]
+                texts.update(
+                    (item_id, zlib.decompress(data).decode("utf-8"))
+                    for item_id, data in self._conn.execute(
+                        f"SELECT item_id, data FROM texts WHERE item_id IN ({', '.join('?' * len(batch))})", batch
+                    )
+                )
+        return texts
+    
+    def remove_docs(self, doc_ids: Iterable[str]):
+        """删除文档及其全部文本块的文本"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM texts WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids])
+    
+    def remove(self, item_ids: Iterable[str]):
+        """按记录ID删除文本"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM texts WHERE item_id = ?", [(item_id,) for item_id in item_ids])
+    
+    def stats(self) -> Dict[str, int]:
+        """记录数与压缩后的文本总字节数"""
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM texts").fetchone()
+        return {"count": count, "bytes": size}
+    
+    def close(self):
+        self._conn.close()
+
+
+def fill_documents(results: Dict, text_store: "TextStore") -> Dict:
+    """
+    为查询结果补上单独存放的文档文本（原地修改并返回）
+    
+    Args:
+        results: collection.query 的返回值，documents 中为 None 的项从文本存储读取
+        text_store: 文本存储
+    """
+    documents: List[List] = results.get("documents") or [[None] * len(ids) for ids in results["ids"]]
+    missing = [item_id for ids, texts in zip(results["ids"], documents)
+               for item_id, text in zip(ids, texts) if text is None]
+    if missing:
+        stored = text_store.get(missing)
+        documents = [[stored.get(item_id, "") if text is None else text for item_id, text in zip(ids, texts)]
+                     for ids, texts in zip(results["ids"], documents)]
+    results["documents"] = documents
+    return results
@@ -0,0 +1,88 @@
+"""
+主题分类模块
+将主题标签嵌入为向量（经查询向量缓存，每个标签只编码一次），
+再用一次矩阵乘法计算一批文档向量与所有标签的余弦相似度完成分类
+"""
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import config
+
+
+class TopicClassifier:
+    """基于嵌入向量的主题分类器"""
+    
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]],
+                 template: str = config.TOPIC_LABEL_TEMPLATE,
+                 aliases: Optional[Dict[str, str]] = None):
+        """
+        初始化主题分类器
+        
+        Args:
+            encode_fn: 批量编码函数（应与文档使用同一模型）
+            template: 标签描述模板，{topic} 替换为主题全称
+            aliases: 主题缩写到全称的映射（如 "CV" -> "computer vision"），缩写直接嵌入效果较差
+        """
+        self.encode_fn = encode_fn
+        self.template = template
+        self.aliases = config.TOPIC_ALIASES if aliases is None else aliases
+    
+    def describe(self, topic: str) -> str:
+        """生成用于嵌入的主题描述"""
+        topic = topic.strip()
+        return self.template.format(topic=self.aliases.get(topic.upper(), topic))
+    
+    def label_embeddings(self, topics: List[str]) -> np.ndarray:
+        """主题标签的归一化向量矩阵，形状为 (主题数, 维度)"""
+        return _normalize(np.asarray(self.encode_fn([self.describe(t) for t in topics]), dtype=np.float32))
+    
+    def scores(self, doc_embeddings, topics: List[str]) -> np.ndarray:
+        """
+        计算文档与主题的余弦相似度
+        
+        Args:
+            doc_embeddings: 文档向量，形状为 (文档数, 维度)
+            topics: 主题列表
+        
+        Returns:
+            形状为 (文档数, 主题数) 的相似度矩阵
+        """
+        docs = _normalize(np.atleast_2d(np.asarray(doc_embeddings, dtype=np.float32)))
+        return docs @ self.label_embeddings(topics).T
+    
+    def classify(self, doc_embeddings, topics: List[str], threshold: float = config.TOPIC_THRESHOLD,
+                 top_n: int = config.TOPIC_TOP_N) -> List[List[str]]:
+        """
+        批量分类文档
+        
+        每篇文档取相似度不低于 threshold 的主题，按相似度从高到低最多保留 top_n 个；
+        没有主题达到阈值时归入相似度最高的主题
+        
+        Args:
+            doc_embeddings: 文档向量，形状为 (文档数, 维度)
+            topics: 主题列表
+            threshold: 相似度阈值
+            top_n: 每篇文档最多归入的主题数（0 表示不限）
+        
+        Returns:
+            每篇文档匹配的主题列表
+        """
+        if not topics or len(doc_embeddings) == 0:
+            return [[] for _ in range(len(doc_embeddings))]
+        scores = self.scores(doc_embeddings, topics)
+        order = np.argsort(-scores, axis=1)
+        if top_n > 0:
+            order = order[:, :top_n]
+        
+        matched = []
+        for row, ranked in zip(scores, order):
+            selected = [topics[i].strip() for i in ranked if row[i] >= threshold]
+            matched.append(selected or [topics[ranked[0]].strip()])
+        return matched
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """按行做 L2 归一化"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
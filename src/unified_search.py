@@ -0,0 +1,159 @@
+"""
+跨模态统一检索模块
+同一个查询并发检索论文集合（文本模型向量空间）和图像集合（CLIP 向量空间），
+两个空间的相似度不可直接比较，先按各集合的分数校准转换为标准分，再合并为一个排序列表
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import config, metrics
+
+
+# 校准用的通用查询：覆盖论文与图片的常见主题，与库中记录的相似度分布作为该集合的背景分布
+CALIBRATION_QUERIES = [
+    "deep learning for computer vision",
+    "natural language processing with transformers",
+    "reinforcement learning agents",
+    "a chart comparing experimental results",
+    "network architecture diagram",
+    "a photo of a person outdoors",
+    "a city street at night",
+    "a cat sitting on a sofa",
+    "food on a plate",
+    "mountains and a lake",
+    "基于深度学习的图像识别方法",
+    "机器翻译中的注意力机制",
+    "实验结果对比表格",
+    "海边的日落",
+    "一只小狗在草地上奔跑",
+    "城市夜景",
+]
+
+SEARCH_TYPES = ("paper", "image")
+
+_calibration_lock = threading.Lock()
+
+
+def calibrate(collection, encode_fn: Callable[[List[str]], List[List[float]]],
+              sample_size: int = config.SEARCH_CALIBRATION_SAMPLE) -> Dict:
+    """
+    估计集合的背景相似度分布
+    
+    从集合中均匀抽样若干页向量，计算与校准查询的余弦相似度，取均值和标准差
+    
+    Args:
+        collection: 向量集合
+        encode_fn: 该集合所用模型的批量查询编码函数
+        sample_size: 抽样的向量数
+    
+    Returns:
+        {"count": 校准时的记录数, "mean": 均值, "std": 标准差}
+    """
+    count = collection.count()
+    pages = 4
+    page_size = max(1, min(sample_size, count) // pages)
+    vectors = []
+    for offset in sorted({int(count * i / pages) for i in range(pages)}):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        if len(page["ids"]) > 0:
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    if not vectors:
+        return {"count": count, "mean": 0.0, "std": 1.0}
+    
+    vectors = np.concatenate(vectors)
+    queries = np.asarray(encode_fn(CALIBRATION_QUERIES), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    similarities = queries @ vectors.T
+    return {"count": count, "mean": float(similarities.mean()), "std": float(max(similarities.std(), 1e-6))}
+
+
+def get_calibration(db_path: str, collection, model_name: str,
+                    encode_fn: Callable[[List[str]], List[List[float]]]) -> Dict:
+    """
+    读取集合的分数校准，没有记录、模型不同或记录数变化超过 SEARCH_CALIBRATION_DRIFT 时重新校准
+    
+    校准结果按集合名保存在向量数据库目录的 CALIBRATION_FILE 中
+    
+    Args:
+        db_path: 向量数据库路径
+        collection: 向量集合
+        model_name: 该集合所用模型的标识（模型名称加推理后端）
+        encode_fn: 该模型的批量查询编码函数
+    """
+    path = os.path.join(db_path, config.CALIBRATION_FILE)
+    with _calibration_lock:
+        try:
+            with open(path, encoding="utf-8") as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            saved = {}
+        entry = saved.get(collection.name)
+        count = collection.count()
+        if (entry is not None and entry.get("model") == model_name
+                and abs(count - entry["count"]) <= config.SEARCH_CALIBRATION_DRIFT * max(entry["count"], 1)):
+            return entry
+        
+        with metrics.timer("search.calibrate"):
+            entry = {"model": model_name, **calibrate(collection, encode_fn)}
+        saved[collection.name] = entry
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(saved, file, ensure_ascii=False, indent=2)
+        os.replace(temporary, path)
+        return entry
+
+
+def calibrated_score(similarity: float, calibration: Dict) -> float:
+    """相似度高出集合背景分布均值多少个标准差"""
+    return (similarity - calibration["mean"]) / calibration["std"]
+
+
+def search(query: str, top_k: int = 5, where: Optional[Dict] = None, doc_manager=None, img_manager=None,
+           encoders: Optional[Dict[str, Callable[[str], List[float]]]] = None) -> List[Dict]:
+    """
+    跨模态统一检索
+    
+    论文和图像的查询编码与检索在两个线程中并发执行（两个模型各自加载、各自推理），
+    各自取 top_k 后按校准分数合并排序
+    
+    Args:
+        query: 查询文本
+        top_k: 合并后返回的结果数
+        where: 元数据过滤条件（两个集合共用，只有一方具有的字段会过滤掉另一方的全部结果）
+        doc_manager: 文献管理器（为 None 时不检索论文）
+        img_manager: 图像管理器（为 None 时不检索图像）
+        encoders: 按类型（"paper"、"image"）指定的单条查询编码函数，默认使用管理器的 encode_queries
+    
+    Returns:
+        结果列表，每项为原始结果加上 type、similarity 和 score（校准分数），按 score 降序
+    """
+    encoders = encoders or {}
+    managers = {kind: manager for kind, manager in (("paper", doc_manager), ("image", img_manager)) if manager}
+    
+    def run(kind: str) -> List[Dict]:
+        manager = managers[kind]
+        encode = encoders.get(kind) or (lambda text: manager.encode_queries([text])[0])
+        with metrics.timer(f"search.{kind}"):
+            results = manager.search_by_embedding(encode(query), top_k=top_k, where=where)
+            if not results:
+                return []
+            calibration = get_calibration(manager.db_path, manager.search_collection(), manager.model_key,
+                                          manager.encode_queries)
+        for result in results:
+            result["type"] = kind
+            result["similarity"] = 1 - result["distance"]
+            result["score"] = calibrated_score(result["similarity"], calibration)
+        return results
+    
+    with ThreadPoolExecutor(max_workers=max(1, len(managers))) as executor:
+        futures = [executor.submit(run, kind) for kind in managers]
+        merged = [result for future in futures for result in future.result()]
+    merged.sort(key=lambda result: result["score"], reverse=True)
+    return merged[:top_k]
+
@@ -0,0 +1,457 @@
+"""
+NumPy 向量存储模块
+以内存映射的 .npy 矩阵保存归一化向量（float32、float16 或 int8 标量量化），以 SQLite 旁路文件保存 ID、文档和元数据，
+提供与 Chroma 集合相同的常用接口（get / query / upsert / update / delete / count）。
+查询时对整个矩阵做一次矩阵乘法并用 argpartition 取 top-k，结果是精确的余弦近邻
+（int8 先在量化矩阵上取候选，再用 float16 副本重新打分）；
+打开集合只需映射文件和读取ID列表，适合数万条规模的库
+"""
+import json
+import os
+import sqlite3
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from . import config
+
+# .npy 文件头的固定长度（字节），追加行时原地改写文件头中的行数
+_HEADER_SIZE = 128
+# float16 / int8 矩阵按块转换为 float32 后计算，每块的行数
+_SCORE_BLOCK_ROWS = 65536
+# 向量文件：float32 / float16 集合只有 vectors.npy；int8 集合另有每行的缩放系数和用于重新打分的 float16 副本。
+# 追加时 vectors.npy 最后写入，其文件头中的行数即为各文件共同的有效行数
+_VECTORS = "vectors.npy"
+_SCALES = "scales.npy"
+_RESCORE = "rescore.npy"
+_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def _write_header(file, dtype: np.dtype, shape: tuple):
+    """写入 .npy 1.0 格式的文件头，填充到固定长度以便原地更新行数"""
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape})
+    header = header.ljust(_HEADER_SIZE - 11) + "\n"
+    file.seek(0)
+    file.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+
+def _write_rows(path: Path, values: np.ndarray, first_row: int):
+    """从 first_row 行开始写入 values（覆盖其后残留的行）并更新文件头中的行数"""
+    values = np.ascontiguousarray(values)
+    with open(path, "r+b" if path.exists() else "w+b") as file:
+        file.seek(_HEADER_SIZE + first_row * (values.nbytes // len(values)))
+        file.write(values.tobytes())
+        _write_header(file, values.dtype, (first_row + len(values),) + values.shape[1:])
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _where_sql(where: Dict, params: List) -> str:
+    """把 Chroma where 子句转换为旁路表上的 SQL 条件（基于 json_extract）"""
+    clauses = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(_where_sql(clause, params) for clause in condition) + ")")
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        field = "json_extract(metadata, ?)"
+        for operator, value in condition.items():
+            params.append('$."' + key.replace('"', '\\"') + '"')
+            if operator in ("$in", "$nin"):
+                params.extend(value)
+                negate = "NOT " if operator == "$nin" else ""
+                clauses.append(f"{field} {negate}IN ({', '.join('?' * len(value))})")
+            elif operator in _OPERATORS:
+                params.append(value)
+                clauses.append(f"{field} {_OPERATORS[operator]} ?")
+            else:
+                raise ValueError(f"numpy 向量存储不支持的过滤运算符: {operator}")
+    return " AND ".join(clauses) or "1"
+
+
+class NumpyCollection:
+    """
+    内存映射矩阵上的向量集合
+    
+    - 向量按行追加到 vectors.npy，删除只在旁路表中移除记录（留下的空行由 compact 回收）
+    - 已存在的ID在原行上覆盖
+    - 其他进程写入后，通过 SQLite 的 data_version 检测并重新映射
+    """
+    
+    def __init__(self, path: str, name: str, dtype: str = "float32"):
+        """
+        打开或创建集合
+        
+        Args:
+            path: 集合目录
+            name: 集合名
+            dtype: 新建集合时向量的存储精度（"float32"、"float16" 或 "int8"），
+                已有集合沿用文件中的精度（compact 时可转换）
+        """
+        self.name = name
+        self.metadata = None
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.path / _VECTORS
+        self.dtype = np.dtype(dtype)
+        self._conn = sqlite3.connect(str(self.path / "records.sqlite3"), check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS records (
+                    row INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    document TEXT,
+                    metadata TEXT NOT NULL DEFAULT '{}'
+                );
+                """
+            )
+        self._version = None
+        self._load()
+    
+    def _load(self):
+        """映射向量文件并读取ID列表"""
+        self._version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._map()
+        self._rows: Dict[str, int] = dict(
+            (item_id, row) for row, item_id in self._conn.execute("SELECT row, id FROM records")
+        )
+        self._alive = np.zeros(self.rows, dtype=bool)
+        if self._rows:
+            self._alive[list(self._rows.values())] = True
+    
+    def _map(self):
+        """以只读方式映射向量文件"""
+        self._matrix = None
+        arrays = {}
+        if self.vectors_path.exists():
+            self._matrix = np.load(str(self.vectors_path), mmap_mode="r")
+            self.dtype = self._matrix.dtype
+            arrays[_VECTORS] = self._matrix
+            for name in self._file_names()[:-1]:
+                arrays[name] = np.load(str(self.path / name), mmap_mode="r")
+        # 整体替换而不原地修改，查询可以在锁外使用取到的快照
+        self._arrays = arrays
+    
+    def _file_names(self, dtype: Optional[np.dtype] = None) -> List[str]:
+        """该精度的集合使用的向量文件（vectors.npy 在最后）"""
+        return ([_SCALES, _RESCORE] if (dtype or self.dtype) == np.int8 else []) + [_VECTORS]
+    
+    def _encode(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        """把归一化的 float32 向量转换为各向量文件中的行"""
+        if self.dtype != np.int8:
+            return {_VECTORS: vectors.astype(self.dtype)}
+        # 每行按最大绝对值对称量化到 [-127, 127]，缩放系数单独保存
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        return {
+            _SCALES: scales.astype(np.float32),
+            _RESCORE: vectors.astype(np.float16),
+            _VECTORS: np.rint(vectors / scales[:, None]).astype(np.int8),
+        }
+    
+    @staticmethod
+    def _decode(arrays: Dict[str, np.ndarray], rows) -> np.ndarray:
+        """读取若干行的 float32 向量（int8 集合读取 float16 副本）"""
+        source = arrays.get(_RESCORE, arrays.get(_VECTORS))
+        return np.asarray(source[rows], dtype=np.float32)
+    
+    def _refresh(self):
+        """其他进程提交过写入时重新加载"""
+        if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._version:
+            self._load()
+    
+    @property
+    def rows(self) -> int:
+        """向量文件中的行数（包含已删除的行）"""
+        return 0 if self._matrix is None else len(self._matrix)
+    
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+    
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+    
+    def upsert(self, ids: List[str], embeddings, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict]] = None):
+        """写入记录：已存在的ID在原行覆盖向量、替换文档和元数据，其余追加到文件末尾"""
+        if not len(ids):
+            return
+        vectors = _normalize(embeddings)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        # 同一次写入中重复的ID以最后一条为准
+        latest = {item_id: index for index, item_id in enumerate(ids)}
+        
+        with self._lock:
+            # 以旁路表的写事务作为跨进程的写锁，保证追加的行号不冲突
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                if self.dim is not None and vectors.shape[1] != self.dim:
+                    raise ValueError(f"向量维度不匹配: 集合 {self.name} 为 {self.dim}，写入的为 {vectors.shape[1]}")
+                existing = [(self._rows[item_id], index) for item_id, index in latest.items() if item_id in self._rows]
+                new = [(item_id, index) for item_id, index in latest.items() if item_id not in self._rows]
+                
+                if existing:
+                    self._overwrite([row for row, _ in existing], vectors[[index for _, index in existing]])
+                first_row = self.rows
+                if new:
+                    self._append(vectors[[index for _, index in new]])
+                    self._map()
+                
+                self._conn.executemany(
+                    "UPDATE records SET document = ?, metadata = ? WHERE row = ?",
+                    [(documents[index], json.dumps(metadatas[index] or {}, ensure_ascii=False), row)
+                     for row, index in existing]
+                )
+                self._conn.executemany(
+                    "INSERT INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(first_row + offset, item_id, documents[index],
+                      json.dumps(metadatas[index] or {}, ensure_ascii=False))
+                     for offset, (item_id, index) in enumerate(new)]
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                self._load()
+                raise
+            # 本连接的提交不会改变 data_version，直接更新内存中的行号
+            for offset, (item_id, _) in enumerate(new):
+                self._rows[item_id] = first_row + offset
+            self._alive = np.concatenate([self._alive, np.ones(self.rows - len(self._alive), dtype=bool)])
+    
+    add = upsert
+    
+    def _append(self, vectors: np.ndarray):
+        """在各向量文件的有效行之后追加行并更新文件头中的行数"""
+        first_row = self.rows
+        self._matrix = None
+        self._arrays = {}
+        for name, values in self._encode(vectors).items():
+            _write_rows(self.path / name, values, first_row)
+    
+    def _overwrite(self, rows: List[int], vectors: np.ndarray):
+        """在原行上覆盖向量"""
+        for name, values in self._encode(vectors).items():
+            array = np.load(str(self.path / name), mmap_mode="r+")
+            array[rows] = values
+            array.flush()
+            del array
+    
+    def update(self, ids: List[str], embeddings=None, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict]] = None):
+        """更新已有记录：元数据与原有元数据合并，不存在的ID忽略"""
+        with self._lock:
+            self._refresh()
+            records = self._fetch(
+                f"id IN ({', '.join('?' * len(ids))})", list(ids)
+            )
+            by_id = {record[1]: record for record in records}
+            updates = []
+            for index, item_id in enumerate(ids):
+                if item_id not in by_id:
+                    continue
+                row, _, document, metadata = by_id[item_id]
+                if metadatas is not None:
+                    metadata = {**metadata, **(metadatas[index] or {})}
+                if documents is not None:
+                    document = documents[index]
+                updates.append((document, json.dumps(metadata, ensure_ascii=False), row))
+            if embeddings is not None:
+                vectors = _normalize(embeddings)
+                found = [index for index, item_id in enumerate(ids) if item_id in by_id]
+                if found:
+                    self._overwrite([by_id[ids[index]][0] for index in found], vectors[found])
+            with self._conn:
+                self._conn.executemany("UPDATE records SET document = ?, metadata = ? WHERE row = ?", updates)
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        """删除记录（向量行留在文件中，compact 时回收）"""
+        condition, params = self._condition(ids, where)
+        with self._lock:
+            self._refresh()
+            with self._conn:
+                deleted = self._conn.execute(f"SELECT row, id FROM records WHERE {condition}", params).fetchall()
+                self._conn.execute(f"DELETE FROM records WHERE {condition}", params)
+            # 复制后再修改，不影响正在使用旧掩码的查询
+            alive = self._alive.copy()
+            for row, item_id in deleted:
+                self._rows.pop(item_id, None)
+                alive[row] = False
+            self._alive = alive
+    
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Sequence[str] = ("metadatas", "documents")) -> Dict:
+        """按ID或元数据条件读取记录（按写入顺序），返回格式与 Chroma 的 get 相同"""
+        condition, params = self._condition(ids, where)
+        if limit is not None or offset:
+            condition += " ORDER BY row LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+        else:
+            condition += " ORDER BY row"
+        with self._lock:
+            self._refresh()
+            records = self._fetch(condition, params)
+            arrays = self._arrays
+        return {
+            "ids": [record[1] for record in records],
+            "documents": [record[2] for record in records] if "documents" in include else None,
+            "metadatas": [record[3] for record in records] if "metadatas" in include else None,
+            "embeddings": (self._decode(arrays, [record[0] for record in records])
+                           if records else np.empty((0, self.dim or 0), dtype=np.float32))
+            if "embeddings" in include else None,
+        }
+    
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances")) -> Dict:
+        """
+        精确的余弦 top-k 查询，返回格式与 Chroma 的 query 相同（distances 为 1 - 余弦相似度）
+        
+        所有查询向量与整个矩阵做一次矩阵乘法，再按行用 argpartition 取前 n_results 个；
+        int8 集合先取 n_results * VECTOR_RESCORE_OVERSAMPLE 个候选，再用 float16 副本重新打分
+        """
+        queries = _normalize(query_embeddings)
+        with self._lock:
+            self._refresh()
+            arrays, alive = self._arrays, self._alive
+            if where:
+                condition, params = self._condition(None, where)
+                allowed = np.zeros(self.rows, dtype=bool)
+                rows = [row for (row,) in self._conn.execute(f"SELECT row FROM records WHERE {condition}", params)]
+                allowed[rows] = True
+            else:
+                allowed = alive
+        
+        results = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        candidates = int(allowed.sum())
+        k = min(n_results, candidates)
+        if k <= 0:
+            for key in results:
+                results[key] = [[] for _ in range(len(queries))]
+            return results
+        
+        scores = self._scores(arrays, queries)
+        scores[:, ~allowed] = -np.inf
+        rescore = _RESCORE in arrays
+        shortlist = min(candidates, k * max(1, config.VECTOR_RESCORE_OVERSAMPLE)) if rescore else k
+        hits = []
+        for query, row_scores in zip(queries, scores):
+            top = np.argpartition(-row_scores, shortlist - 1)[:shortlist]
+            similarities = self._decode(arrays, top) @ query if rescore else row_scores[top]
+            order = np.argsort(-similarities)[:k]
+            hits.append((top[order], similarities[order]))
+        
+        with self._lock:
+            needed = sorted({int(row) for top, _ in hits for row in top})
+            records = {record[0]: record for record in self._fetch(
+                f"row IN ({', '.join('?' * len(needed))})", needed
+            )}
+        for top, similarities in hits:
+            top = [(int(row), float(similarity)) for row, similarity in zip(top, similarities) if int(row) in records]
+            results["ids"].append([records[row][1] for row, _ in top])
+            results["distances"].append([1 - similarity for _, similarity in top])
+            results["documents"].append([records[row][2] for row, _ in top])
+            results["metadatas"].append([records[row][3] for row, _ in top])
+        return results
+    
+    @staticmethod
+    def _scores(arrays: Dict[str, np.ndarray], queries: np.ndarray) -> np.ndarray:
+        """查询向量与所有行的余弦相似度（int8 集合为量化后的近似值），形状为 (查询数, 行数)"""
+        matrix, scales = arrays[_VECTORS], arrays.get(_SCALES)
+        if matrix.dtype == np.float32:
+            return queries @ np.asarray(matrix).T
+        scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), _SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + _SCORE_BLOCK_ROWS], dtype=np.float32)
+            block_scores = queries @ block.T
+            if scales is not None:
+                block_scores *= scales[start:start + len(block)]
+            scores[:, start:start + len(block)] = block_scores
+        return scores
+    
+    def compact(self, dtype: Optional[str] = None) -> int:
+        """
+        重写向量文件，去掉已删除的行并重新编号
+        
+        Args:
+            dtype: 与当前精度不同时同时转换为该精度
+        
+        Returns:
+            保留的记录数
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._load()
+                records = self._conn.execute("SELECT row, id, document, metadata FROM records ORDER BY row").fetchall()
+                rows = [record[0] for record in records]
+                target = np.dtype(dtype) if dtype else self.dtype
+                if len(rows) == self.rows and target == self.dtype:
+                    self._conn.rollback()
+                    return len(rows)
+                vectors = self._decode(self._arrays, rows) if rows else None
+                old_files = self._file_names()
+                self.dtype = target
+                self._matrix = None
+                self._arrays = {}
+                new_files = []
+                if vectors is not None:
+                    for name, values in self._encode(vectors).items():
+                        temporary = self.path / (name + ".tmp")
+                        with open(temporary, "w+b") as file:
+                            _write_header(file, values.dtype, values.shape)
+                            file.write(np.ascontiguousarray(values).tobytes())
+                        os.replace(temporary, self.path / name)
+                        new_files.append(name)
+                for name in set(old_files) - set(new_files):
+                    if (self.path / name).exists():
+                        (self.path / name).unlink()
+                self._conn.execute("DELETE FROM records")
+                self._conn.executemany(
+                    "INSERT INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(new_row, item_id, document, metadata)
+                     for new_row, (_, item_id, document, metadata) in enumerate(records)]
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.execute("VACUUM")
+            self._load()
+            return len(records)
+    
+    def _condition(self, ids: Optional[List[str]], where: Optional[Dict]):
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"id IN ({', '.join('?' * len(ids))})")
+            params.extend(ids)
+        if where:
+            clauses.append(_where_sql(where, params))
+        return " AND ".join(clauses) or "1", params
+    
+    def _fetch(self, condition: str, params: List) -> List[tuple]:
+        return [
+            (row, item_id, document, json.loads(metadata))
+            for row, item_id, document, metadata in self._conn.execute(
+                f"SELECT row, id, document, metadata FROM records WHERE {condition}", params
+            )
+        ]
+    
+    def close(self):
+        self._matrix = None
+        self._conn.close()
@@ -0,0 +1,333 @@
+"""
+目录监听模块
+监听论文/图像目录中的文件变化，去抖合并后交给管理器按变化涉及的路径增量索引，不再重新扫描整个目录。
+Linux 上通过 ctypes 直接使用 inotify，inotify 不可用（其他平台、监听数达到上限等）时改为按文件大小和修改时间轮询
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import config
+from .scanner import scan_files
+
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+# struct inotify_event 的固定部分：wd、mask、cookie、len，其后是 len 字节的文件名
+EVENT_HEADER = struct.Struct("iIII")
+
+# 事件：(监听目标, 路径, 路径为目录时是否递归列举其中的文件)；路径为 None 表示事件丢失，需要重新扫描整个目标
+Event = Tuple["WatchTarget", Optional[str], bool]
+
+
+@dataclass(eq=False)
+class WatchTarget:
+    """
+    监听目标
+    
+    Attributes:
+        kind: 目标名称（用于输出）
+        root: 监听的根目录
+        extensions: 关心的文件扩展名（小写）
+        recursive: 是否监听子目录
+        handler: 处理一批变化的回调，参数为 (新增或修改的文件, 需要检测删除的路径)
+        catch_up: 全量增量扫描的回调（不跳过修改时间未变的目录，原地改写的文件同样处理），启动时和事件丢失时调用
+    """
+    kind: str
+    root: Path
+    extensions: Iterable[str]
+    recursive: bool
+    handler: Callable[[List[Path], List[str]], None]
+    catch_up: Optional[Callable[[], None]] = None
+    
+    def matches(self, path: str) -> bool:
+        """文件扩展名是否需要处理"""
+        return os.path.splitext(path)[1].lower() in self.extensions
+
+
+class InotifyWatcher:
+    """基于 inotify 的监听器（仅 Linux）"""
+    
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "当前平台不支持 inotify")
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        # 监听描述符 -> (监听目标, 目录路径)
+        self._watches: Dict[int, Tuple[WatchTarget, str]] = {}
+    
+    def add(self, target: WatchTarget):
+        """监听目标的根目录（递归目标同时监听全部子目录）"""
+        self._add_tree(target, os.path.abspath(target.root))
+    
+    def _add_tree(self, target: WatchTarget, directory: str):
+        self._add_watch(target, directory)
+        if target.recursive:
+            for parent, subdirs, _ in os.walk(directory):
+                for name in subdirs:
+                    self._add_watch(target, os.path.join(parent, name))
+    
+    def _add_watch(self, target: WatchTarget, directory: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if code in (errno.ENOENT, errno.ENOTDIR):
+                # 目录在监听前已被删除，其删除事件由上级目录报告
+                return
+            raise OSError(code, os.strerror(code), directory)
+        # 同一目录（同一 inode）重复添加时返回原描述符，这里只更新其路径
+        self._watches[wd] = (target, directory)
+    
+    def _remove_tree(self, directory: str):
+        """目录被移出监听范围后，移除它及其子目录的监听"""
+        prefix = directory + os.sep
+        for wd, (_, path) in list(self._watches.items()):
+            if path == directory or path.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+    
+    def read(self, timeout: Optional[float] = None) -> List[Event]:
+        """
+        等待并读取事件
+        
+        Args:
+            timeout: 最长等待秒数，None 表示一直等待
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        
+        events: List[Event] = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += EVENT_HEADER.size + length
+                events.extend(self._handle(wd, mask, os.fsdecode(name)))
+        return events
+    
+    def _handle(self, wd: int, mask: int, name: str) -> List[Event]:
+        """把一个 inotify 事件转换为监听事件"""
+        if mask & IN_Q_OVERFLOW:
+            # 内核事件队列溢出，期间的变化已丢失
+            return [(target, None, False) for target in {target for target, _ in self._watches.values()}]
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return []
+        entry = self._watches.get(wd)
+        if entry is None:
+            return []
+        target, directory = entry
+        
+        if mask & IN_MOVE_SELF:
+            # 移动到监听范围内时新位置已由 IN_MOVED_TO 重新登记，路径仍然存在
+            if not os.path.isdir(directory):
+                self._remove_tree(directory)
+            return []
+        if mask & IN_DELETE_SELF:
+            return []
+        
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if not target.recursive:
+                return []
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self._add_tree(target, path)
+                except OSError as e:
+                    print(f"无法监听目录 {path}: {e}（其中的变化将在下次全量扫描时处理）")
+            return [(target, path, True)]
+        if mask & IN_CREATE or not target.matches(name):
+            # 新建的文件等写入完成（IN_CLOSE_WRITE）后再处理
+            return []
+        return [(target, path, False)]
+    
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """
+    轮询监听器
+    
+    定期列举目录并比较每个文件的大小和修改时间，新增、原地改写、移入和消失的文件都会返回；
+    每次扫描都要读取全部文件的状态，只在 inotify 不可用时使用
+    """
+    
+    def __init__(self, interval: float = config.WATCH_POLL_INTERVAL):
+        """
+        初始化轮询监听器
+        
+        Args:
+            interval: 扫描间隔（秒）
+        """
+        self.interval = interval
+        # [监听目标, 上次扫描的文件状态 {绝对路径: (大小, 修改时间)}]
+        self._targets: List[list] = []
+        self._next_scan = time.monotonic() + interval
+    
+    def add(self, target: WatchTarget):
+        self._targets.append([target, self._snapshot(target)])
+    
+    @staticmethod
+    def _snapshot(target: WatchTarget) -> Dict[str, Tuple[int, float]]:
+        """目标中全部匹配文件的大小和修改时间"""
+        snapshot = {}
+        for path in scan_files(target.root, target.extensions, recursive=target.recursive):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[os.path.abspath(path)] = (stat.st_size, stat.st_mtime)
+        return snapshot
+    
+    def read(self, timeout: Optional[float] = None) -> List[Event]:
+        """
+        等待到下一次扫描并返回新增、变化或已消失的文件
+        
+        Args:
+            timeout: 最长等待秒数，早于下一次扫描时间时到时返回空列表
+        """
+        delay = max(0.0, self._next_scan - time.monotonic())
+        if timeout is not None and timeout < delay:
+            time.sleep(timeout)
+            return []
+        time.sleep(delay)
+        self._next_scan = time.monotonic() + self.interval
+        
+        events: List[Event] = []
+        for item in self._targets:
+            target, previous = item
+            current = self._snapshot(target)
+            events.extend((target, path, False) for path, state in current.items() if previous.get(path) != state)
+            events.extend((target, path, False) for path in previous if path not in current)
+            item[1] = current
+        return events
+    
+    def close(self):
+        pass
+
+
+def _dispatch(target: WatchTarget, paths: Dict[str, bool]):
+    """把一批变化的路径整理为 (文件列表, 删除检测路径) 交给目标的回调"""
+    files: List[Path] = []
+    checked: List[str] = []
+    for path, recursive in sorted(paths.items()):
+        if os.path.isdir(path):
+            files.extend(scan_files(path, target.extensions, recursive=recursive))
+            checked.append(path)
+        elif os.path.isfile(path):
+            files.append(Path(path))
+        else:
+            checked.append(path)
+    target.handler(files, checked)
+
+
+def _run_safely(target: WatchTarget, action: Callable, *args):
+    """执行回调，出错时只输出错误，不中断监听"""
+    try:
+        action(*args)
+    except Exception as e:
+        print(f"[{target.kind}] 处理变化时出错: {e}")
+
+
+def watch(targets: List[WatchTarget], use_polling: bool = False,
+          debounce: float = config.WATCH_DEBOUNCE_SECONDS,
+          max_delay: float = config.WATCH_MAX_DELAY_SECONDS,
+          poll_interval: float = config.WATCH_POLL_INTERVAL, initial_scan: bool = True):
+    """
+    监听目录并持续增量更新索引，直到被中断（Ctrl+C）
+    
+    先开始监听再执行启动扫描，扫描期间发生的变化不会丢失；
+    事件在最后一次变化后静默 debounce 秒（连续变化时最长 max_delay 秒）后按目标合并处理
+    
+    Args:
+        targets: 监听目标
+        use_polling: 强制使用轮询方式
+        debounce: 去抖时间（秒）
+        max_delay: 连续有变化时最长等待时间（秒）
+        poll_interval: 轮询间隔（秒）
+        initial_scan: 启动时先执行一次全量增量扫描，补上未监听期间的变化
+    """
+    watcher = None
+    if not use_polling:
+        try:
+            watcher = InotifyWatcher()
+            for target in targets:
+                watcher.add(target)
+        except OSError as e:
+            if watcher is not None:
+                watcher.close()
+            watcher = None
+            print(f"无法使用 inotify（{e}），改用轮询方式监听")
+    if watcher is None:
+        watcher = PollingWatcher(poll_interval)
+        for target in targets:
+            watcher.add(target)
+    
+    mode = "inotify" if isinstance(watcher, InotifyWatcher) else f"轮询，间隔 {poll_interval:g}s"
+    print(f"开始监听（{mode}）: " + "，".join(f"{target.kind} {target.root}" for target in targets))
+    try:
+        if initial_scan:
+            for target in targets:
+                if target.catch_up:
+                    _run_safely(target, target.catch_up)
+        
+        pending: Dict[WatchTarget, Dict[str, bool]] = {}
+        rescan = set()
+        first = last = 0.0
+        while True:
+            timeout = None
+            if pending or rescan:
+                timeout = max(0.0, min(last + debounce, first + max_delay) - time.monotonic())
+            events = watcher.read(timeout)
+            now = time.monotonic()
+            for target, path, recursive in events:
+                if not pending and not rescan:
+                    first = now
+                last = now
+                if path is None:
+                    rescan.add(target)
+                else:
+                    paths = pending.setdefault(target, {})
+                    paths[path] = paths.get(path, False) or recursive
+            
+            if (pending or rescan) and now >= min(last + debounce, first + max_delay):
+                batch, pending = pending, {}
+                lost, rescan = rescan, set()
+                for target in targets:
+                    if target in lost and target.catch_up:
+                        _run_safely(target, target.catch_up)
+                    elif target in batch:
+                        _run_safely(target, _dispatch, target, batch[target])
+    finally:
+        watcher.close()